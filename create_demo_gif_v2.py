@@ -4,9 +4,65 @@ Create an animated GIF demo for RunPod Idle Pod Monitor
 Version 2: Better aspect ratio handling and focus on important content
 """
 
+import hashlib
+import inspect
+import os
+import shutil
+import subprocess
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont, ImageOps
+from functools import lru_cache
 from pathlib import Path
 
+FONT_PATH = "/System/Library/Fonts/Helvetica.ttc"
+
+# Solid background canvases keyed by (size, color); copied per frame
+_BG_TEMPLATES = {}
+
+def _canvas(size, color):
+    """Return a fresh solid-color RGB canvas copied from a cached template"""
+    key = (tuple(size), tuple(color))
+    template = _BG_TEMPLATES.get(key)
+    if template is None:
+        template = Image.new('RGB', size, color)
+        _BG_TEMPLATES[key] = template
+    return template.copy()
+
+@lru_cache(maxsize=32)
+def _font(size):
+    """Load the slide font at the given size once, falling back to PIL's default"""
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except OSError:
+        return ImageFont.load_default()
+
+def _font_fingerprint():
+    """Identify the font file in use so cached slides are invalidated when it changes"""
+    try:
+        stat = os.stat(FONT_PATH)
+        return f"{FONT_PATH}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        return "default"
+
+def _cached_slide(name, size, builder, cache_dir):
+    """
+    Return a text-only slide from the PNG cache, rendering it on a miss.
+    The cache key covers the builder's source, the size and the font file.
+    """
+    key_src = f"{inspect.getsource(builder)}|{size}|{_font_fingerprint()}"
+    key = hashlib.sha1(key_src.encode()).hexdigest()[:12]
+    cache_file = Path(cache_dir) / f"{name}_{size[0]}x{size[1]}_{key}.png"
+    
+    if cache_file.exists():
+        img = Image.open(cache_file)
+        img.load()
+        return img.convert('RGB')
+    
+    img = builder(size)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    img.save(cache_file)
+    return img
+
 def resize_and_pad(img, target_size=(1280, 720), bg_color=(240, 240, 240)):
     """
     Resize image to fit within target size while maintaining aspect ratio,
@@ -28,43 +84,56 @@ def resize_and_pad(img, target_size=(1280, 720), bg_color=(240, 240, 240)):
     # Resize image
     img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
     
-    # Create new image with padding
-    new_img = Image.new('RGB', target_size, bg_color)
+    # Create padded canvas as a single array fill
+    canvas = np.full((target_size[1], target_size[0], 3), bg_color, dtype=np.uint8)
     
     # Calculate position to center the resized image
     x = (target_size[0] - new_width) // 2
     y = (target_size[1] - new_height) // 2
     
-    # Paste resized image onto padded background
-    new_img.paste(img_resized, (x, y))
+    # Copy resized image into the padded canvas
+    canvas[y:y + new_height, x:x + new_width] = np.asarray(img_resized.convert('RGB'))
     
-    return new_img
+    return Image.fromarray(canvas)
 
-def crop_to_important_area(img_path, crop_area=None):
+def load_screenshot(img_path, target_size=(1280, 720)):
     """
-    Crop image to focus on the most important area
+    Open and fully decode a source screenshot once so several crops can share it
     """
     img = Image.open(img_path)
+    full_width = img.width
+    # Let the decoder produce a smaller intermediate where supported (JPEG);
+    # this is a no-op for PNG sources
+    img.draft('RGB', (target_size[0] * 2, target_size[1] * 2))
+    img.load()
+    img.info['full_width'] = full_width
+    return img
+
+def crop_to_important_area(img_or_path, crop_area=None, target_size=(1280, 720)):
+    """
+    Crop image to focus on the most important area.
+    Accepts a path or an image already returned by load_screenshot.
+    """
+    if isinstance(img_or_path, Image.Image):
+        img = img_or_path
+    else:
+        img = load_screenshot(img_or_path, target_size)
     
     if crop_area:
-        # Custom crop area provided (left, top, right, bottom)
-        img = img.crop(crop_area)
+        # Custom crop area provided (left, top, right, bottom), given in
+        # full-resolution coordinates
+        scale = img.width / img.info.get('full_width', img.width)
+        img = img.crop(tuple(int(v * scale) for v in crop_area))
     
     return img
 
 def create_title_slide(size=(1280, 720)):
     """Create a clean title slide"""
-    img = Image.new('RGB', size, color=(20, 30, 48))
+    img = _canvas(size, (20, 30, 48))
     draw = ImageDraw.Draw(img)
     
-    try:
-        title_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 52)
-        subtitle_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 26)
-        feature_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 24)
-    except:
-        title_font = ImageFont.load_default()
-        subtitle_font = ImageFont.load_default()
-        feature_font = ImageFont.load_default()
+    title_font = _font(52)
+    subtitle_font = _font(26)
     
     # Title
     title = "Idle Monitor for RunPod Pods"
@@ -94,15 +163,11 @@ def create_title_slide(size=(1280, 720)):
 
 def create_features_slide(size=(1280, 720)):
     """Create a clean features slide"""
-    img = Image.new('RGB', size, color=(25, 35, 55))
+    img = _canvas(size, (25, 35, 55))
     draw = ImageDraw.Draw(img)
     
-    try:
-        title_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 48)
-        feature_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 26)
-    except:
-        title_font = ImageFont.load_default()
-        feature_font = ImageFont.load_default()
+    title_font = _font(48)
+    feature_font = _font(26)
     
     title = "Key Features"
     title_bbox = draw.textbbox((0, 0), title, font=title_font)
@@ -145,19 +210,14 @@ def create_features_slide(size=(1280, 720)):
 
 def add_subtle_caption(img, caption):
     """Add a subtle caption overlay to the bottom of the image"""
-    draw = ImageDraw.Draw(img)
-    
-    try:
-        font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 32)
-    except:
-        font = ImageFont.load_default()
+    font = _font(32)
     
-    # Create semi-transparent overlay at bottom
+    # Darken the bottom strip in place; black at alpha 180 leaves 75/255 of each pixel
     overlay_height = 80
-    overlay = Image.new('RGBA', (img.width, overlay_height), (0, 0, 0, 180))
-    
-    # Paste overlay at bottom
-    img.paste(overlay, (0, img.height - overlay_height), overlay)
+    arr = np.array(img.convert('RGB'))
+    arr[-overlay_height:] = (arr[-overlay_height:].astype(np.uint16) * 75 // 255).astype(np.uint8)
+    img = Image.fromarray(arr)
+    draw = ImageDraw.Draw(img)
     
     # Add caption text
     caption_bbox = draw.textbbox((0, 0), caption, font=font)
@@ -168,6 +228,76 @@ def add_subtle_caption(img, caption):
     
     return img
 
+# Palette slot kept free of image colors and used to mark unchanged pixels
+TRANSPARENT_INDEX = 255
+
+def build_global_palette(frames):
+    """
+    Quantize all frames together once and return the palette image, so every
+    frame shares one global color table instead of being quantized separately.
+    Only 255 colors are used; TRANSPARENT_INDEX stays reserved.
+    """
+    width, height = frames[0].size
+    tall = Image.new('RGB', (width, height * len(frames)))
+    for i, frame in enumerate(frames):
+        tall.paste(frame, (0, i * height))
+    return tall.quantize(colors=TRANSPARENT_INDEX, method=Image.Quantize.MEDIANCUT)
+
+def dedupe_frames(pal_frames, palette):
+    """
+    Replace pixels that match the previous frame with the transparent index.
+    Long runs of one index compress far better under LZW; frames must be saved
+    with disposal=1 so the previous frame shows through.
+    """
+    colors = palette.getpalette()[:TRANSPARENT_INDEX * 3]
+    colors += [0, 0, 0] * (256 - len(colors) // 3)
+    
+    deduped = [pal_frames[0]]
+    prev = np.asarray(pal_frames[0])
+    for frame in pal_frames[1:]:
+        current = np.asarray(frame)
+        arr = current.copy()
+        arr[current == prev] = TRANSPARENT_INDEX
+        img = Image.fromarray(arr, mode='P')
+        img.putpalette(colors)
+        deduped.append(img)
+        prev = current
+    return deduped
+
+def optimize_with_gifsicle(path):
+    """Post-optimize a saved GIF in place with gifsicle, if it is installed"""
+    gifsicle = shutil.which("gifsicle")
+    if gifsicle is None:
+        return False
+    result = subprocess.run(
+        [gifsicle, "-O3", "--lossy=30", str(path), "-o", str(path)],
+        check=False,
+        capture_output=True
+    )
+    return result.returncode == 0
+
+def create_end_slide(size=(1280, 720)):
+    """Create the closing slide with GitHub info"""
+    img = _canvas(size, (15, 25, 40))
+    draw = ImageDraw.Draw(img)
+    
+    title_font = _font(48)
+    url_font = _font(28)
+    
+    title = "Get Started"
+    url = "github.com/justinwlin/Runpod-Idle-Pod-Monitor"
+    
+    title_bbox = draw.textbbox((0, 0), title, font=title_font)
+    title_x = (size[0] - (title_bbox[2] - title_bbox[0])) // 2
+    
+    url_bbox = draw.textbbox((0, 0), url, font=url_font)
+    url_x = (size[0] - (url_bbox[2] - url_bbox[0])) // 2
+    
+    draw.text((title_x, 280), title, fill=(255, 255, 255), font=title_font)
+    draw.text((url_x, 360), url, fill=(100, 180, 255), font=url_font)
+    
+    return img
+
 def create_demo_gif_v2():
     """Create the animated demo GIF with better proportions"""
     print("🎬 Creating RunPod Monitor Demo GIF (v2)...")
@@ -175,13 +305,14 @@ def create_demo_gif_v2():
     ppt_dir = Path("./ppt")
     output_file = ppt_dir / "runpod-monitor-demo.gif"
     output_file_small = ppt_dir / "runpod-monitor-demo-small.gif"
+    cache_dir = ppt_dir / ".cache"
     
     frames = []
     target_size = (1280, 720)  # 16:9 HD aspect ratio
     
     # Create title slide
     print("📝 Creating title slide...")
-    title_slide = create_title_slide(target_size)
+    title_slide = _cached_slide("title", target_size, create_title_slide, cache_dir)
     frames.append(title_slide)
     
     # Process dashboard
@@ -197,7 +328,7 @@ def create_demo_gif_v2():
     print("📸 Processing configuration.png...")
     config_path = ppt_dir / "configuration.png"
     if config_path.exists():
-        img = crop_to_important_area(config_path, (0, 0, 2344, 1000))  # Main config area
+        img = crop_to_important_area(config_path, (0, 0, 2344, 1000), target_size)  # Main config area
         img_processed = resize_and_pad(img, target_size, bg_color=(245, 245, 245))
         img_with_caption = add_subtle_caption(img_processed, "Threshold Configuration for Autostop or Monitoring")
         frames.append(img_with_caption)
@@ -206,76 +337,73 @@ def create_demo_gif_v2():
     print("📸 Processing metrics.png (pod metrics)...")
     metrics_path = ppt_dir / "metrics.png"
     if metrics_path.exists():
+        # Decode once; both frames are crops of the same screenshot
+        metrics_img = load_screenshot(metrics_path, target_size)
+        
         # First frame: Top statistics section
-        img = crop_to_important_area(metrics_path, (0, 0, 2352, 800))  # Active Pod Statistics
+        img = crop_to_important_area(metrics_img, (0, 0, 2352, 800), target_size)  # Active Pod Statistics
         img_processed = resize_and_pad(img, target_size, bg_color=(245, 245, 245))
         img_with_caption = add_subtle_caption(img_processed, "Metrics for Pods")
         frames.append(img_with_caption)
         
         # Second frame: Auto-stop predictions section
         print("📸 Processing metrics.png (autostop predictions)...")
-        img = crop_to_important_area(metrics_path, (0, 700, 2352, 1400))  # Auto-stop predictions area
+        img = crop_to_important_area(metrics_img, (0, 700, 2352, 1400), target_size)  # Auto-stop predictions area
         img_processed = resize_and_pad(img, target_size, bg_color=(245, 245, 245))
         img_with_caption = add_subtle_caption(img_processed, "Autostop Prediction and Monitoring")
         frames.append(img_with_caption)
     
     # Create features slide
     print("✨ Creating features slide...")
-    features_slide = create_features_slide(target_size)
+    features_slide = _cached_slide("features", target_size, create_features_slide, cache_dir)
     frames.append(features_slide)
     
     # Create end slide with GitHub info
     print("🎬 Creating end slide...")
-    end_slide = Image.new('RGB', target_size, color=(15, 25, 40))
-    draw = ImageDraw.Draw(end_slide)
-    
-    try:
-        title_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 48)
-        url_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 28)
-    except:
-        title_font = ImageFont.load_default()
-        url_font = ImageFont.load_default()
-    
-    title = "Get Started"
-    url = "github.com/justinwlin/Runpod-Idle-Pod-Monitor"
-    
-    title_bbox = draw.textbbox((0, 0), title, font=title_font)
-    title_x = (target_size[0] - (title_bbox[2] - title_bbox[0])) // 2
-    
-    url_bbox = draw.textbbox((0, 0), url, font=url_font)
-    url_x = (target_size[0] - (url_bbox[2] - url_bbox[0])) // 2
-    
-    draw.text((title_x, 280), title, fill=(255, 255, 255), font=title_font)
-    draw.text((url_x, 360), url, fill=(100, 180, 255), font=url_font)
-    
+    end_slide = _cached_slide("end", target_size, create_end_slide, cache_dir)
     frames.append(end_slide)
     
     # Save as animated GIF
     print("💾 Saving animated GIF...")
     if frames:
-        # Full size GIF with optimized settings
-        frames[0].save(
+        # Remap every frame onto one shared palette
+        global_palette = build_global_palette(frames)
+        pal_frames = [frame.quantize(palette=global_palette, dither=Image.Dither.NONE)
+                      for frame in frames]
+        gif_frames = dedupe_frames(pal_frames, global_palette)
+        
+        # Full size GIF; palette indices must stay stable for the transparent slot
+        gif_frames[0].save(
             output_file,
             save_all=True,
-            append_images=frames[1:],
+            append_images=gif_frames[1:],
             duration=2500,  # 2.5 seconds per frame
             loop=0,
-            optimize=True
+            optimize=False,
+            transparency=TRANSPARENT_INDEX,
+            disposal=1
         )
+        optimize_with_gifsicle(output_file)
         
         # Create smaller version for web
         print("📱 Creating smaller version for web...")
         small_size = (640, 360)
-        small_frames = [frame.resize(small_size, Image.Resampling.LANCZOS) for frame in frames]
+        # Downscale the already-quantized frames directly; nearest-neighbour
+        # keeps the shared palette, so nothing is quantized a second time
+        small_frames = [frame.resize(small_size, Image.Resampling.NEAREST) for frame in pal_frames]
+        small_frames = dedupe_frames(small_frames, global_palette)
         small_frames[0].save(
             output_file_small,
             save_all=True,
             append_images=small_frames[1:],
             duration=2500,
             loop=0,
-            optimize=True,
-            quality=85
+            optimize=False,
+            transparency=TRANSPARENT_INDEX,
+            disposal=1
         )
+        if optimize_with_gifsicle(output_file_small):
+            print("🗜️  Post-optimized with gifsicle")
         
         print("✅ Demo GIF created successfully!")
         print(f"📁 Output files:")
@@ -20,6 +20,12 @@ USAGE EXAMPLES:
     # Generate large dataset for stress testing (50 pods, 7 days)
     python3 generate_test_data.py --large
 
+    # Stream each pod to disk as it is generated (keeps memory flat)
+    python3 generate_test_data.py --large --streaming
+
+    # Compact column arrays instead of JSON (numba-accelerated if installed)
+    python3 generate_test_data.py --large --format npz
+
     # Custom interval (30 seconds instead of 60)
     python3 generate_test_data.py --interval 30
     
@@ -66,6 +72,10 @@ NOTES:
 - Provides statistics about which pods would be candidates for auto-stopping
 - File size and metric counts are displayed after generation
 - Supports generating months of data for stress testing data migration
+- Requires numpy; usage samples are drawn per pod as whole arrays
+- Uses orjson for the final dump when installed, stdlib json otherwise
+- --format npz writes compact per-pod column arrays instead of JSON; the
+  sampling kernel is JIT-compiled with numba when it is installed
 """
 
 import json
@@ -73,7 +83,86 @@ import os
 import random
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# Usage profiles, indexed by code in USAGE_RANGES
+PROFILE_CODES = {"idle": 0, "low": 1, "normal": 2, "high": 3, "spike": 4, "steady": 5}
+DEFAULT_PROFILE_CODE = 6
+
+# (low, high) sampling range for cpu, memory, gpu and gpu memory per profile
+USAGE_RANGES = np.array([
+    [[0, 1], [0, 1], [0, 1], [0, 5]],           # idle
+    [[1, 10], [5, 15], [1, 10], [5, 20]],       # low
+    [[20, 60], [20, 60], [30, 70], [40, 80]],   # normal (plus jitter)
+    [[70, 95], [60, 90], [75, 98], [70, 95]],   # high
+    [[5, 20], [10, 30], [5, 25], [20, 40]],     # spike, between spikes
+    [[15, 15], [25, 25], [0, 0], [30, 30]],     # steady
+    [[10, 50], [20, 60], [20, 60], [30, 70]],   # default
+], dtype=np.float64)
+SPIKE_RANGES = np.array([[60, 90], [50, 80], [70, 95], [60, 90]], dtype=np.float64)
+SPIKE_PROBABILITY = 0.2
+NORMAL_JITTER = 5.0  # +/- added to cpu and gpu for the normal profile
+
+# Columnar record layout used by --format npz
+STATUS_RUNNING = 0
+STATUS_EXITED = 1
+SOA_DTYPE = np.dtype([
+    ("epoch", "i8"),
+    ("cpu", "f4"),
+    ("mem", "f4"),
+    ("gpu", "f4"),
+    ("gmem", "f4"),
+    ("uptime", "i4"),
+    ("status", "u1"),
+])
+
+
+@njit(parallel=True, cache=True)
+def _fill_usage_kernel(code, ranges, spike_ranges, spike_probability, jitter,
+                       running, cpu, mem, gpu, gmem):
+    """Sample usage for every running row in parallel; stopped rows are zeroed."""
+    for i in prange(running.shape[0]):
+        if not running[i]:
+            cpu[i] = 0.0
+            mem[i] = 0.0
+            gpu[i] = 0.0
+            gmem[i] = 0.0
+            continue
+        r = ranges
+        if code == 4 and np.random.random() < spike_probability:
+            r = spike_ranges
+        c = np.random.uniform(r[0, 0], r[0, 1])
+        m = np.random.uniform(r[1, 0], r[1, 1])
+        g = np.random.uniform(r[2, 0], r[2, 1])
+        gm = np.random.uniform(r[3, 0], r[3, 1])
+        if code == 2:
+            c += np.random.uniform(-jitter, jitter)
+            g += np.random.uniform(-jitter, jitter)
+        cpu[i] = round(c, 2)
+        mem[i] = round(m, 2)
+        gpu[i] = round(g, 2)
+        gmem[i] = round(gm, 2)
 
 
 class TestDataGenerator:
@@ -118,21 +207,18 @@ class TestDataGenerator:
             "A100 80GB": 1.89,
             "H100": 3.99
         }
+        
+        self._rng = np.random.default_rng()
+        self._alphabet = np.frombuffer(b'abcdefghijklmnopqrstuvwxyz0123456789', dtype='S1')
     
-    def generate_pod_id(self) -> str:
-        """Generate a realistic pod ID."""
-        return ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=10))
+    def generate_pod_ids(self, n: int) -> List[str]:
+        """Generate n realistic pod IDs with a single RNG call."""
+        idx = self._rng.integers(0, len(self._alphabet), size=(n, 10))
+        return [self._alphabet[row].tobytes().decode() for row in idx]
     
-    def generate_metric_point(self, 
-                            pod_id: str, 
-                            pod_name: str,
-                            timestamp: datetime,
-                            uptime_seconds: int,
-                            gpu_config: Dict,
-                            profile: str = "normal",
-                            status: str = "RUNNING") -> Dict:
+    def _sample_usage(self, profile: str, n: int) -> Tuple[np.ndarray, ...]:
         """
-        Generate a single metric point.
+        Sample n usage points for a profile as (cpu, memory, gpu, gpu_memory) arrays.
         
         Profiles:
         - idle: Very low usage (0-1%)
@@ -142,102 +228,59 @@ class TestDataGenerator:
         - spike: Random spikes
         - steady: Constant usage
         """
+        rng = self._rng
+        code = PROFILE_CODES.get(profile, DEFAULT_PROFILE_CODE)
+        
+        cpu, mem, gpu, gmem = (rng.uniform(low, high, n) for low, high in USAGE_RANGES[code])
+        if code == PROFILE_CODES["normal"]:
+            cpu += rng.uniform(-NORMAL_JITTER, NORMAL_JITTER, n)
+            gpu += rng.uniform(-NORMAL_JITTER, NORMAL_JITTER, n)
+        elif code == PROFILE_CODES["spike"]:
+            # Random spikes - 20% chance of spike per sample
+            spikes = rng.random(n) < SPIKE_PROBABILITY
+            cpu, mem, gpu, gmem = (
+                np.where(spikes, rng.uniform(low, high, n), col)
+                for (low, high), col in zip(SPIKE_RANGES, (cpu, mem, gpu, gmem))
+            )
         
-        epoch = int(timestamp.timestamp())
+        # Round to 2 decimal places to match real data, in place per column
+        for col in (cpu, mem, gpu, gmem):
+            np.round(col, 2, out=col)
+        return cpu, mem, gpu, gmem
+    
+    @staticmethod
+    def generate_metric_point(timestamp: str,
+                              epoch: int,
+                              pod_id: str,
+                              pod_name: str,
+                              status: str,
+                              cost_per_hr: float,
+                              uptime_seconds: int,
+                              gpu_count: int,
+                              cpu_percent: float,
+                              memory_percent: float,
+                              gpu_percent: float,
+                              gpu_memory_percent: float) -> Dict:
+        """
+        Build a single metric point from pre-sampled values.
         
-        # Base metric structure
-        metric = {
-            "timestamp": timestamp.isoformat(),
+        Built as one flat literal so each sample costs a single dict allocation;
+        usage values come from _sample_usage.
+        """
+        return {
+            "timestamp": timestamp,
             "epoch": epoch,
             "pod_id": pod_id,
             "name": pod_name,
             "status": status,
-            "cost_per_hr": self.cost_map[gpu_config["type"]] * gpu_config["count"],
+            "cost_per_hr": cost_per_hr,
             "uptime_seconds": uptime_seconds,
-            "gpu_count": gpu_config["count"]
+            "gpu_count": gpu_count,
+            "cpu_percent": cpu_percent,
+            "memory_percent": memory_percent,
+            "gpu_percent": gpu_percent,
+            "gpu_memory_percent": gpu_memory_percent
         }
-        
-        # Generate usage based on profile
-        if status != "RUNNING":
-            # Pod is stopped
-            metric.update({
-                "cpu_percent": 0,
-                "memory_percent": 0,
-                "gpu_percent": 0,
-                "gpu_memory_percent": 0
-            })
-        elif profile == "idle":
-            # Very low usage - candidate for auto-stop
-            metric.update({
-                "cpu_percent": random.uniform(0, 1),
-                "memory_percent": random.uniform(0, 1),
-                "gpu_percent": random.uniform(0, 1),
-                "gpu_memory_percent": random.uniform(0, 5)
-            })
-        elif profile == "low":
-            # Low usage
-            metric.update({
-                "cpu_percent": random.uniform(1, 10),
-                "memory_percent": random.uniform(5, 15),
-                "gpu_percent": random.uniform(1, 10),
-                "gpu_memory_percent": random.uniform(5, 20)
-            })
-        elif profile == "normal":
-            # Normal usage
-            base_cpu = random.uniform(20, 60)
-            base_gpu = random.uniform(30, 70)
-            metric.update({
-                "cpu_percent": base_cpu + random.uniform(-5, 5),
-                "memory_percent": random.uniform(20, 60),
-                "gpu_percent": base_gpu + random.uniform(-5, 5),
-                "gpu_memory_percent": random.uniform(40, 80)
-            })
-        elif profile == "high":
-            # High usage
-            metric.update({
-                "cpu_percent": random.uniform(70, 95),
-                "memory_percent": random.uniform(60, 90),
-                "gpu_percent": random.uniform(75, 98),
-                "gpu_memory_percent": random.uniform(70, 95)
-            })
-        elif profile == "spike":
-            # Random spikes
-            if random.random() < 0.2:  # 20% chance of spike
-                metric.update({
-                    "cpu_percent": random.uniform(60, 90),
-                    "memory_percent": random.uniform(50, 80),
-                    "gpu_percent": random.uniform(70, 95),
-                    "gpu_memory_percent": random.uniform(60, 90)
-                })
-            else:
-                metric.update({
-                    "cpu_percent": random.uniform(5, 20),
-                    "memory_percent": random.uniform(10, 30),
-                    "gpu_percent": random.uniform(5, 25),
-                    "gpu_memory_percent": random.uniform(20, 40)
-                })
-        elif profile == "steady":
-            # Constant usage (no change detection test)
-            metric.update({
-                "cpu_percent": 15.0,
-                "memory_percent": 25.0,
-                "gpu_percent": 0.0,
-                "gpu_memory_percent": 30.0
-            })
-        else:
-            # Default to normal
-            metric.update({
-                "cpu_percent": random.uniform(10, 50),
-                "memory_percent": random.uniform(20, 60),
-                "gpu_percent": random.uniform(20, 60),
-                "gpu_memory_percent": random.uniform(30, 70)
-            })
-        
-        # Round to 2 decimal places to match real data
-        for key in ["cpu_percent", "memory_percent", "gpu_percent", "gpu_memory_percent"]:
-            metric[key] = round(metric[key], 2)
-        
-        return metric
     
     def generate_pod_history(self,
                            pod_id: str,
@@ -253,44 +296,119 @@ class TestDataGenerator:
         if gpu_config is None:
             gpu_config = random.choice(self.gpu_configs)
         
-        history = []
-        current_time = start_time
-        end_time = start_time + timedelta(hours=duration_hours)
-        uptime = 0
+        n = int(np.ceil(duration_hours * 3600 / interval_seconds))
+        if n <= 0:
+            return []
         
-        # Generate status sequence
-        status = "RUNNING"
+        offsets = np.arange(n, dtype=np.int64) * interval_seconds
+        epochs = (int(start_time.timestamp()) + offsets).tolist()
+        # Same format as datetime.isoformat(), which omits zero microseconds
+        times = np.datetime64(start_time, 'us') + offsets.astype('timedelta64[s]')
+        timestamps = np.datetime_as_string(times, unit='us' if start_time.microsecond else 's').tolist()
         
-        while current_time < end_time:
-            # Simulate restart if requested
-            if include_restart and uptime > 7200 and random.random() < 0.01:
-                uptime = 0  # Reset uptime on restart
-                print(f"Simulating restart for pod {pod_id} at {current_time}")
-            
-            # Generate metric point
-            metric = self.generate_metric_point(
-                pod_id=pod_id,
-                pod_name=pod_name,
-                timestamp=current_time,
-                uptime_seconds=uptime,
-                gpu_config=gpu_config,
-                profile=profile,
-                status=status
+        running, uptimes, restarts = self._simulate_lifecycle(n, interval_seconds, include_restart)
+        for i in restarts:
+            print(f"Simulating restart for pod {pod_id} at {timestamps[i]}")
+        
+        cpu, mem, gpu, gmem = self._sample_usage(profile, n)
+        for col in (cpu, mem, gpu, gmem):
+            col[~running] = 0
+        
+        cost_per_hr = self.cost_map[gpu_config["type"]] * gpu_config["count"]
+        gpu_count = gpu_config["count"]
+        statuses = np.where(running, "RUNNING", "EXITED").tolist()
+        
+        point = self.generate_metric_point
+        return [
+            point(ts, epoch, pod_id, pod_name, status, cost_per_hr, up, gpu_count, c, m, g, gm)
+            for ts, epoch, status, up, c, m, g, gm in zip(
+                timestamps, epochs, statuses, uptimes.tolist(),
+                cpu.tolist(), mem.tolist(), gpu.tolist(), gmem.tolist()
             )
-            
-            history.append(metric)
-            
-            # Advance time
-            current_time += timedelta(seconds=interval_seconds)
-            uptime += interval_seconds
-            
-            # Small chance of status change
-            if random.random() < 0.001:
-                status = "EXITED" if status == "RUNNING" else "RUNNING"
-                if status == "EXITED":
-                    uptime = 0
+        ]
+    
+    def _simulate_lifecycle(self, n: int, interval_seconds: int,
+                            include_restart: bool) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+        """
+        Simulate stop/start and restart events for n samples.
+        
+        Returns:
+            (running mask, uptime per sample, indices of simulated restarts)
+        """
+        rng = self._rng
+        steps = np.arange(n, dtype=np.int64)
+        
+        # Small chance of status change after each sample
+        toggles = rng.random(n) < 0.001
+        running = (np.concatenate(([0], np.cumsum(toggles)[:-1])) % 2) == 0
+        
+        # Uptime restarts from zero at the first sample and after each stop
+        run_starts = np.zeros(n, dtype=bool)
+        run_starts[0] = True
+        run_starts[1:] = (toggles & running)[:-1]
+        
+        # Restarts only happen once uptime exceeds two hours, which depends on
+        # earlier resets, so walk the (rare) candidate samples in order
+        restarts = []
+        if include_restart:
+            last_start = np.maximum.accumulate(np.where(run_starts, steps, 0))
+            last_restart = -1
+            for i in np.flatnonzero(rng.random(n) < 0.01).tolist():
+                if (i - max(last_start[i], last_restart)) * interval_seconds > 7200:
+                    restarts.append(i)
+                    last_restart = i
+            run_starts[restarts] = True
         
-        return history
+        uptimes = (steps - np.maximum.accumulate(np.where(run_starts, steps, 0))) * interval_seconds
+        return running, uptimes, restarts
+    
+    def generate_pod_history_soa(self,
+                                 start_time: datetime,
+                                 duration_hours: float,
+                                 interval_seconds: int = 60,
+                                 profile: str = "normal",
+                                 include_restart: bool = False) -> np.ndarray:
+        """
+        Generate a pod history as a structured array (see SOA_DTYPE).
+        
+        Usage sampling runs in the numba kernel when numba is installed and
+        falls back to the NumPy sampler otherwise.
+        """
+        n = int(np.ceil(duration_hours * 3600 / interval_seconds))
+        soa = np.empty(max(n, 0), dtype=SOA_DTYPE)
+        if n <= 0:
+            return soa
+        
+        running, uptimes, _ = self._simulate_lifecycle(n, interval_seconds, include_restart)
+        soa["epoch"] = int(start_time.timestamp()) + np.arange(n, dtype=np.int64) * interval_seconds
+        soa["uptime"] = uptimes
+        soa["status"] = np.where(running, STATUS_RUNNING, STATUS_EXITED)
+        
+        code = PROFILE_CODES.get(profile, DEFAULT_PROFILE_CODE)
+        if NUMBA_AVAILABLE:
+            _fill_usage_kernel(code, USAGE_RANGES[code], SPIKE_RANGES, SPIKE_PROBABILITY,
+                               NORMAL_JITTER, running,
+                               soa["cpu"], soa["mem"], soa["gpu"], soa["gmem"])
+        else:
+            for field, col in zip(("cpu", "mem", "gpu", "gmem"), self._sample_usage(profile, n)):
+                col[~running] = 0
+                soa[field] = col
+        
+        return soa
+    
+    def soa_to_history(self, soa: np.ndarray, pod_id: str, pod_name: str,
+                       gpu_config: Dict) -> List[Dict]:
+        """Materialize metric dicts from a structured history array."""
+        cost_per_hr = self.cost_map[gpu_config["type"]] * gpu_config["count"]
+        gpu_count = gpu_config["count"]
+        point = self.generate_metric_point
+        return [
+            point(datetime.fromtimestamp(epoch).isoformat(), epoch, pod_id, pod_name,
+                  "RUNNING" if status == STATUS_RUNNING else "EXITED",
+                  cost_per_hr, up, gpu_count,
+                  round(c, 2), round(m, 2), round(g, 2), round(gm, 2))
+            for epoch, c, m, g, gm, up, status in soa.tolist()
+        ]
     
     def generate_test_data(self,
                          num_pods: int = 5,
@@ -304,9 +422,30 @@ class TestDataGenerator:
             history_hours: Hours of history to generate per pod
             interval_seconds: Interval between metric points (default 60s)
         """
+        return dict(self.iter_test_data(num_pods, history_hours, interval_seconds))
+    
+    def iter_test_data(self,
+                       num_pods: int = 5,
+                       history_hours: float = 24,
+                       interval_seconds: int = 60) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Generate the test dataset one pod at a time.
+        
+        Yields (pod_id, pod_history) pairs so callers can write each pod out
+        before the next one is generated.
+        """
         
         print(f"Generating test data for {num_pods} pods with {history_hours} hours of history...")
         
+        for spec in self._iter_pod_specs(num_pods, history_hours):
+            pod_history = self.generate_pod_history(interval_seconds=interval_seconds, **spec)
+            
+            print(f"  Generated {len(pod_history)} metrics for pod {spec['pod_name']} (profile: {spec['profile']})")
+            yield spec["pod_id"], pod_history
+    
+    def _iter_pod_specs(self, num_pods: int, history_hours: float) -> Iterator[Dict]:
+        """Pick id, name, scenario, start time and GPU config for each pod."""
+        
         # Define test scenarios
         scenarios = [
             {"profile": "idle", "name_suffix": "idle", "duration_ratio": 1.0},
@@ -317,12 +456,9 @@ class TestDataGenerator:
         ]
         
         # Ensure we have at least one of each scenario
-        test_data = {}
         current_time = datetime.now()
         
-        for i in range(num_pods):
-            pod_id = self.generate_pod_id()
-            
+        for i, pod_id in enumerate(self.generate_pod_ids(num_pods)):
             # Select scenario
             if i < len(scenarios):
                 scenario = scenarios[i]
@@ -337,50 +473,154 @@ class TestDataGenerator:
             start_offset = random.uniform(0, history_hours * 0.1)  # Up to 10% variation
             start_time = current_time - timedelta(hours=history_hours - start_offset)
             
-            # Generate pod history
-            pod_history = self.generate_pod_history(
-                pod_id=pod_id,
-                pod_name=pod_name,
-                start_time=start_time,
-                duration_hours=history_hours * scenario['duration_ratio'],
+            yield {
+                "pod_id": pod_id,
+                "pod_name": pod_name,
+                "start_time": start_time,
+                "duration_hours": history_hours * scenario['duration_ratio'],
+                "profile": scenario['profile'],
+                "gpu_config": random.choice(self.gpu_configs),
+                "include_restart": random.random() < 0.2  # 20% chance of restart
+            }
+    
+    def save_test_data(self, test_data: Dict[str, List[Dict]], backup: bool = True):
+        """Save test data to file, optionally backing up existing data."""
+        
+        # Save new test data next to the target (timestamps are already ISO strings)
+        tmp_file = f"{self.metrics_file}.tmp"
+        if orjson is not None:
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps(test_data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(tmp_file, 'w') as f:
+                json.dump(test_data, f, indent=2)
+        
+        self._replace_output(tmp_file, self.metrics_file, backup)
+        
+        total_metrics = sum(len(metrics) for metrics in test_data.values())
+        self._print_save_summary(len(test_data), total_metrics)
+    
+    def save_test_data_streaming(self,
+                                 pods: Iterable[Tuple[str, List[Dict]]],
+                                 backup: bool = True,
+                                 tail_size: int = 60) -> Dict[str, List[Dict]]:
+        """
+        Write pods to the metrics file as they are generated.
+        
+        Produces the same {pod_id: [metric, ...]} JSON object as save_test_data
+        (without indentation), but only one pod's history is held in memory at
+        a time. The file is written next to the target and renamed into place
+        once complete.
+        
+        Returns:
+            The last tail_size metrics of each pod, for post-run reporting
+        """
+        dumps = orjson.dumps if orjson is not None else (lambda obj: json.dumps(obj).encode())
+        tmp_file = f"{self.metrics_file}.tmp"
+        tails = {}
+        total_metrics = 0
+        
+        with open(tmp_file, 'wb') as f:
+            f.write(b'{')
+            for index, (pod_id, pod_history) in enumerate(pods):
+                if index:
+                    f.write(b',')
+                f.write(b'\n' + dumps(pod_id) + b': ')
+                f.write(dumps(pod_history))
+                tails[pod_id] = pod_history[-tail_size:]
+                total_metrics += len(pod_history)
+            f.write(b'\n}\n')
+        
+        self._replace_output(tmp_file, self.metrics_file, backup)
+        
+        self._print_save_summary(len(tails), total_metrics)
+        return tails
+    
+    def save_test_data_npz(self,
+                           num_pods: int = 5,
+                           history_hours: float = 24,
+                           interval_seconds: int = 60,
+                           backup: bool = True,
+                           tail_size: int = 60) -> Dict[str, List[Dict]]:
+        """
+        Generate pods as structured arrays and save them to a .npz archive.
+        
+        Each pod is stored under its pod_id with SOA_DTYPE columns; names, costs
+        and GPU counts go into a JSON "__meta__" entry. No metric dicts are
+        built except the last tail_size per pod, returned for reporting.
+        """
+        print(f"Generating test data for {num_pods} pods with {history_hours} hours of history...")
+        
+        npz_file = os.path.splitext(self.metrics_file)[0] + ".npz"
+        arrays = {}
+        meta = {}
+        tails = {}
+        
+        for spec in self._iter_pod_specs(num_pods, history_hours):
+            pod_id, gpu_config = spec["pod_id"], spec["gpu_config"]
+            soa = self.generate_pod_history_soa(
+                start_time=spec["start_time"],
+                duration_hours=spec["duration_hours"],
                 interval_seconds=interval_seconds,
-                profile=scenario['profile'],
-                gpu_config=random.choice(self.gpu_configs),
-                include_restart=(random.random() < 0.2)  # 20% chance of restart
+                profile=spec["profile"],
+                include_restart=spec["include_restart"]
             )
-            
-            test_data[pod_id] = pod_history
-            print(f"  Generated {len(pod_history)} metrics for pod {pod_name} (profile: {scenario['profile']})")
+            arrays[pod_id] = soa
+            meta[pod_id] = {
+                "name": spec["pod_name"],
+                "cost_per_hr": self.cost_map[gpu_config["type"]] * gpu_config["count"],
+                "gpu_count": gpu_config["count"]
+            }
+            tails[pod_id] = self.soa_to_history(soa[-tail_size:], pod_id, spec["pod_name"], gpu_config)
+            print(f"  Generated {len(soa)} metrics for pod {spec['pod_name']} (profile: {spec['profile']})")
         
-        return test_data
+        tmp_file = f"{npz_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.savez_compressed(f, __meta__=np.array(json.dumps(meta)), **arrays)
+        self._replace_output(tmp_file, npz_file, backup)
+        
+        file_size = os.path.getsize(npz_file) / (1024 * 1024)  # MB
+        print(f"\nTest data saved to: {npz_file}")
+        print(f"File size: {file_size:.2f} MB")
+        print(f"Total pods: {len(arrays)}")
+        print(f"Total metric points: {sum(len(soa) for soa in arrays.values()):,}")
+        return tails
     
-    def save_test_data(self, test_data: Dict[str, List[Dict]], backup: bool = True):
-        """Save test data to file, optionally backing up existing data."""
+    def _replace_output(self, tmp_file: str, target: str, backup: bool):
+        """
+        Move a fully written temp file over target.
         
-        # Backup existing file if requested
-        if backup and os.path.exists(self.metrics_file):
-            backup_file = f"{self.metrics_file}.backup.{int(time.time())}"
-            os.rename(self.metrics_file, backup_file)
+        The existing target is first moved aside to a timestamped backup when
+        requested; both steps are renames, so a crash mid-write never leaves a
+        truncated target behind.
+        """
+        if backup and os.path.exists(target):
+            backup_file = f"{target}.backup.{int(time.time())}"
+            os.replace(target, backup_file)
             print(f"Backed up existing data to: {backup_file}")
         
-        # Save new test data
-        with open(self.metrics_file, 'w') as f:
-            json.dump(test_data, f, indent=2)
-        
-        # Calculate file size
+        os.replace(tmp_file, target)
+    
+    def _print_save_summary(self, total_pods: int, total_metrics: int):
+        """Print file size and counts for the saved metrics file."""
         file_size = os.path.getsize(self.metrics_file) / (1024 * 1024)  # MB
-        total_metrics = sum(len(metrics) for metrics in test_data.values())
         
         print(f"\nTest data saved to: {self.metrics_file}")
         print(f"File size: {file_size:.2f} MB")
-        print(f"Total pods: {len(test_data)}")
+        print(f"Total pods: {total_pods}")
         print(f"Total metric points: {total_metrics:,}")
     
     def generate_large_dataset(self,
                               num_pods: int = 50,
                               history_days: int = 7,
-                              interval_seconds: int = 60):
-        """Generate a large dataset for stress testing."""
+                              interval_seconds: int = 60,
+                              streaming: bool = False):
+        """
+        Generate a large dataset for stress testing.
+        
+        With streaming=True, returns the per-pod iterator from iter_test_data
+        instead of the materialized dict.
+        """
         
         print(f"\nGenerating LARGE test dataset:")
         print(f"  - Pods: {num_pods}")
@@ -388,13 +628,12 @@ class TestDataGenerator:
         print(f"  - Interval: {interval_seconds} seconds")
         print(f"  - Expected data points: ~{num_pods * (history_days * 24 * 3600 / interval_seconds):,.0f}")
         
-        test_data = self.generate_test_data(
+        generate = self.iter_test_data if streaming else self.generate_test_data
+        return generate(
             num_pods=num_pods,
             history_hours=history_days * 24,
             interval_seconds=interval_seconds
         )
-        
-        return test_data
 
 
 def main():
@@ -410,6 +649,10 @@ def main():
     parser.add_argument("--large", action="store_true", help="Generate large dataset (50 pods, 7 days)")
     parser.add_argument("--no-backup", action="store_true", help="Don't backup existing data")
     parser.add_argument("--data-dir", default="./data", help="Data directory path")
+    parser.add_argument("--format", choices=["json", "npz"], default="json",
+                        help="Output format; npz stores compact per-pod column arrays")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Write each pod to disk as it is generated (low memory, compact JSON)")
     
     args = parser.parse_args()
     
@@ -417,18 +660,38 @@ def main():
     generator = TestDataGenerator(data_dir=args.data_dir)
     
     # Generate data based on arguments
-    if args.large:
-        test_data = generator.generate_large_dataset()
+    if args.format == "npz":
+        if args.large:
+            num_pods, history_hours, interval_seconds = 50, 7 * 24, 60
+        else:
+            num_pods = args.pods
+            history_hours = args.days * 24 if args.days else args.hours
+            interval_seconds = args.interval
+        # Only the trailing metrics per pod are kept for the analysis below
+        test_data = generator.save_test_data_npz(
+            num_pods=num_pods,
+            history_hours=history_hours,
+            interval_seconds=interval_seconds,
+            backup=not args.no_backup
+        )
+    elif args.large:
+        test_data = generator.generate_large_dataset(streaming=args.streaming)
     else:
         history_hours = args.days * 24 if args.days else args.hours
-        test_data = generator.generate_test_data(
+        generate = generator.iter_test_data if args.streaming else generator.generate_test_data
+        test_data = generate(
             num_pods=args.pods,
             history_hours=history_hours,
             interval_seconds=args.interval
         )
     
-    # Save the data
-    generator.save_test_data(test_data, backup=not args.no_backup)
+    # Save the data (npz output is written while generating)
+    if args.format == "json":
+        if args.streaming:
+            # Only the trailing metrics per pod are kept for the analysis below
+            test_data = generator.save_test_data_streaming(test_data, backup=not args.no_backup)
+        else:
+            generator.save_test_data(test_data, backup=not args.no_backup)
     
     # Print some statistics about idle pods
     print("\nIdle detection analysis:")
@@ -439,8 +702,11 @@ def main():
         # Check last hour of metrics
         last_hour_metrics = [m for m in metrics[-60:] if m.get("status") == "RUNNING"]
         if last_hour_metrics:
-            avg_cpu = sum(m["cpu_percent"] for m in last_hour_metrics) / len(last_hour_metrics)
-            avg_gpu = sum(m["gpu_percent"] for m in last_hour_metrics) / len(last_hour_metrics)
+            count = len(last_hour_metrics)
+            cpu = np.fromiter((m["cpu_percent"] for m in last_hour_metrics), dtype=np.float64, count=count)
+            gpu = np.fromiter((m["gpu_percent"] for m in last_hour_metrics), dtype=np.float64, count=count)
+            avg_cpu = float(cpu.mean())
+            avg_gpu = float(gpu.mean())
             
             pod_name = metrics[-1]["name"]
             if avg_cpu <= 1 and avg_gpu <= 1:
@@ -1,13 +1,97 @@
 """
 Fast counter-based auto-stop tracking system.
 Maintains counters for each pod to track auto-stop conditions without scanning JSONL.
+
+Counter updates are appended as one-line deltas to a journal next to the
+snapshot file and folded back into the snapshot on cleanup or exit.
 """
 
-import json
+import atexit
+import hashlib
 import os
 import time
-from typing import Dict, Any, Optional, Tuple
+import weakref
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import fast_json, metric_files
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Need at least 3 data points (assuming 60s intervals) before auto-stopping
+MIN_DATA_POINTS = 3
+
+# Fold the journal into the snapshot after this many journaled updates or
+# once it grows past this size, so neither grows for the life of the process
+JOURNAL_COMPACT_UPDATES = 100
+JOURNAL_COMPACT_BYTES = 64 * 1024
+
+
+def _snapshot_hash(blob: bytes) -> int:
+    """Fast fingerprint of a serialized snapshot (xxhash if installed, else blake2b)."""
+    if xxhash is not None:
+        return xxhash.xxh64_intdigest(blob)
+    return int.from_bytes(hashlib.blake2b(blob, digest_size=8).digest(), 'little')
+
+
+# Trackers with a journal that still needs folding into the snapshot at exit
+_live_trackers = weakref.WeakSet()
+
+
+@atexit.register
+def _compact_live_trackers() -> None:
+    for tracker in list(_live_trackers):
+        tracker.compact()
+
+
+def compile_threshold_check(thresholds: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Build a predicate that checks whether a metric is below all thresholds.
+    The threshold values are baked into the generated source as constants,
+    so each call does only the metric lookups and comparisons.
+    
+    Args:
+        thresholds: Dict with max_cpu_percent, max_gpu_percent, max_memory_percent
+        
+    Returns:
+        Function taking a metric dict and returning True if below all thresholds
+    """
+    max_cpu = float(thresholds.get('max_cpu_percent', 1))
+    max_gpu = float(thresholds.get('max_gpu_percent', 1))
+    max_memory = float(thresholds.get('max_memory_percent', 1))
+    
+    src = (
+        "def is_below_threshold(metric):\n"
+        f"    return (metric.get('cpu_percent', 0) <= {max_cpu!r} and\n"
+        f"            metric.get('gpu_percent', 0) <= {max_gpu!r} and\n"
+        f"            metric.get('memory_percent', 0) <= {max_memory!r})\n"
+    )
+    # repr() of non-finite floats is 'inf'/'nan', so provide those names
+    namespace: Dict[str, Any] = {'inf': float('inf'), 'nan': float('nan')}
+    exec(src, namespace)
+    return namespace['is_below_threshold']
+
+
+def thresholds_fingerprint(thresholds: Dict[str, Any]) -> List[float]:
+    """
+    The threshold values counters depend on, as a JSON-serializable list
+    (defaults as in compile_threshold_check), for telling whether persisted
+    counters were computed under the same rule.
+    """
+    return [
+        float(thresholds.get('max_cpu_percent', 1)),
+        float(thresholds.get('max_gpu_percent', 1)),
+        float(thresholds.get('max_memory_percent', 1)),
+        float(thresholds.get('duration', 3600)),
+    ]
 
 
 class AutoStopTracker:
@@ -15,19 +99,43 @@ class AutoStopTracker:
     Tracks auto-stop conditions using counters for fast O(1) lookups.
     """
     
-    def __init__(self, data_dir: str = "./data", counter_file: str = "auto_stop_counters.json"):
+    def __init__(self, data_dir: str = "./data", counter_file: str = "auto_stop_counters.json",
+                 read_only: bool = False):
         """
         Initialize the auto-stop tracker.
         
         Args:
             data_dir: Directory to store counter file
             counter_file: Name of the counter file
+            read_only: Only load the snapshot and journal; changes stay in
+                memory and the files are never written (for readers in
+                another process than the monitor that owns them)
         """
         self.data_dir = data_dir
+        self.read_only = read_only
         self.counter_file = os.path.join(data_dir, counter_file)
+        self.journal_file = self.counter_file + '.log'
+        self._journal = None
+        self._journaled = 0  # Updates journaled since the last compact()
+        self._snapshot_hash: Optional[int] = None  # Hash of the last snapshot written
         self.counters: Dict[str, Dict[str, Any]] = {}
         self.thresholds: Dict[str, Any] = {}
-        self.excluded_pods: list = []
+        self.excluded_pods: set = set()
+        self._is_below = compile_threshold_check(self.thresholds)
+        self._fingerprint = thresholds_fingerprint(self.thresholds)
+        self._update_seq = 0
+        
+        # What the counters reflect, persisted in the journal: the threshold
+        # fingerprint they were computed under and the newest metric epoch seen
+        self._counted_under: Optional[List[float]] = None
+        self._last_epoch: Optional[float] = None
+        
+        # Column-wise mirror of the counters for a vectorized candidate sweep
+        # (numpy only): row index per pod, consecutive counts, first-below epochs
+        self._rows: Dict[str, int] = {}
+        self._row_pods: list = []
+        self._consec = None
+        self._first_below = None
         
         # Ensure data directory exists
         os.makedirs(data_dir, exist_ok=True)
@@ -36,24 +144,140 @@ class AutoStopTracker:
         self.load_counters()
     
     def load_counters(self) -> None:
-        """Load counters from file if it exists."""
+        """Load counters from the snapshot file, then replay the journal on top."""
         if os.path.exists(self.counter_file):
             try:
-                with open(self.counter_file, 'r') as f:
-                    self.counters = json.load(f)
-                print(f"📊 Loaded auto-stop counters for {len(self.counters)} pods")
+                self.counters = fast_json.load_file(self.counter_file)
             except Exception as e:
                 print(f"⚠️ Could not load counters: {e}")
                 self.counters = {}
+        
+        if os.path.exists(self.journal_file):
+            try:
+                with open(self.journal_file, 'rb') as f:
+                    for line in f:
+                        try:
+                            entry = fast_json.loads(line)
+                        except ValueError:
+                            continue  # Torn last line from a crash mid-append
+                        if 't' in entry:
+                            self._counted_under = entry['t']
+                        if entry.get('e') is not None:
+                            self._last_epoch = max(self._last_epoch or entry['e'], entry['e'])
+                        if 'p' not in entry:
+                            continue  # Header line written by compact()
+                        if entry['c'] is None:
+                            self.counters.pop(entry['p'], None)
+                        else:
+                            self.counters[entry['p']] = entry['c']
+            except Exception as e:
+                print(f"⚠️ Could not replay counter journal: {e}")
+        
+        self._rebuild_rows()
+        if self.counters:
+            print(f"📊 Loaded auto-stop counters for {len(self.counters)} pods")
     
-    def save_counters(self) -> None:
-        """Save counters to file."""
+    def _rebuild_rows(self) -> None:
+        """Rebuild the column mirror from self.counters."""
+        if np is None:
+            return
+        
+        self._row_pods = list(self.counters)
+        self._rows = {pod_id: i for i, pod_id in enumerate(self._row_pods)}
+        capacity = max(64, len(self._row_pods))
+        self._consec = np.zeros(capacity, dtype=np.int64)
+        self._first_below = np.zeros(capacity)
+        for i, pod_id in enumerate(self._row_pods):
+            self._sync_row(pod_id, i)
+    
+    def _sync_row(self, pod_id: str, row: Optional[int] = None) -> None:
+        """Copy one pod's counter into its column row (zeroed if the counter is gone)."""
+        if np is None:
+            return
+        
+        if row is None:
+            row = self._rows.get(pod_id)
+            if row is None:
+                if pod_id not in self.counters:
+                    return
+                row = self._rows[pod_id] = len(self._row_pods)
+                self._row_pods.append(pod_id)
+                if row == len(self._consec):
+                    self._consec = np.resize(self._consec, 2 * row)
+                    self._first_below = np.resize(self._first_below, 2 * row)
+        
+        counter = self.counters.get(pod_id)
+        if counter is None:
+            self._consec[row] = 0
+            self._first_below[row] = 0
+        else:
+            self._consec[row] = counter['consecutive_below_threshold']
+            self._first_below[row] = counter['first_below_epoch'] or 0
+    
+    def _journal_counter(self, pod_id: str) -> None:
+        """
+        Append the current state of one pod's counter to the journal.
+        A missing counter is written as a null tombstone.
+        
+        Args:
+            pod_id: The pod whose counter changed
+        """
+        self._sync_row(pod_id)
+        if self.read_only:
+            return
         try:
-            with open(self.counter_file, 'w') as f:
-                json.dump(self.counters, f, indent=2)
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'ab', buffering=1 << 16)
+                _live_trackers.add(self)
+            if self._counted_under != self._fingerprint:
+                # Counters are now being updated under these thresholds
+                self._counted_under = self._fingerprint
+                self._journal.write(fast_json.dumps_line({'t': self._counted_under}))
+            self._journal.write(fast_json.dumps_line({'p': pod_id, 'c': self.counters.get(pod_id), 'e': self._last_epoch}))
+        except Exception as e:
+            print(f"❌ Could not journal counter: {e}")
+            return
+        
+        self._journaled += 1
+        if self._journaled >= JOURNAL_COMPACT_UPDATES or self._journal.tell() >= JOURNAL_COMPACT_BYTES:
+            self.compact()
+    
+    def compact(self) -> None:
+        """
+        Atomically write the full snapshot and reset the journal to a single
+        header line recording the thresholds the counters were computed under
+        and the newest metric epoch they include. The snapshot write is
+        skipped when its contents haven't changed since the last one this
+        tracker wrote. Does nothing on a read-only tracker.
+        """
+        if self.read_only:
+            return
+        tmp_file = self.counter_file + '.tmp'
+        try:
+            blob = fast_json.dumps(self.counters)
+            blob_hash = _snapshot_hash(blob)
+            if blob_hash != self._snapshot_hash or not os.path.exists(self.counter_file):
+                with open(tmp_file, 'wb') as f:
+                    f.write(blob)
+                os.replace(tmp_file, self.counter_file)
+                self._snapshot_hash = blob_hash
+            
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._journaled = 0
+            # Truncated in place rather than replaced: another tracker on the
+            # same files keeps appending to this inode. A torn header only
+            # costs the next startup a rescan.
+            with open(self.journal_file, 'wb') as f:
+                f.write(fast_json.dumps_line({'t': self._counted_under, 'e': self._last_epoch}))
         except Exception as e:
             print(f"❌ Could not save counters: {e}")
     
+    def save_counters(self) -> None:
+        """Save counters to file (compacts the journal into the snapshot)."""
+        self.compact()
+    
     def set_thresholds(self, thresholds: Dict[str, Any], excluded_pods: list = None) -> None:
         """
         Set the auto-stop thresholds.
@@ -63,7 +287,32 @@ class AutoStopTracker:
             excluded_pods: List of pod IDs/names to exclude
         """
         self.thresholds = thresholds
-        self.excluded_pods = excluded_pods or []
+        self.excluded_pods = set(excluded_pods or [])
+        self._is_below = compile_threshold_check(thresholds)
+        self._fingerprint = thresholds_fingerprint(thresholds)
+    
+    def is_current_with(self, jsonl_path: str, thresholds: Dict[str, Any]) -> bool:
+        """
+        Check whether the persisted counters can stand in for a JSONL scan:
+        they were computed under the same thresholds and already include the
+        newest stored metric.
+        
+        Args:
+            jsonl_path: Path to the live JSONL metrics file
+            thresholds: Auto-stop thresholds the counters should reflect
+            
+        Returns:
+            True if the JSONL scan can be skipped
+        """
+        if self._counted_under != thresholds_fingerprint(thresholds) or self._last_epoch is None:
+            return False
+        
+        # Only the tail of the newest non-empty file is read
+        for path in reversed(metric_files.metric_file_paths(jsonl_path)):
+            newest = metric_files.edge_epochs(path)[1]
+            if newest is not None:
+                return self._last_epoch >= newest
+        return False
     
     def initialize_from_jsonl(self, jsonl_path: str, thresholds: Dict[str, Any]) -> None:
         """
@@ -71,38 +320,47 @@ class AutoStopTracker:
         Called once on startup to sync with existing metrics.
         
         Args:
-            jsonl_path: Path to the JSONL metrics file
+            jsonl_path: Path to the live JSONL metrics file (its daily
+                shards are read too)
             thresholds: Auto-stop thresholds to use
         """
-        if not os.path.exists(jsonl_path):
+        current_time = time.time()
+        cutoff_time = current_time - thresholds.get('duration', 3600)
+        
+        # The window may reach back into the previous days' files
+        if not (metric_files.metric_file_paths(jsonl_path, since=cutoff_time) or
+                metric_files.rolled_paths(jsonl_path, since=cutoff_time)):
             print("📊 No existing metrics to initialize from")
             return
         
+        # Persisted counters computed under these thresholds that already
+        # include the newest stored metric: the scan would only rebuild them
+        if self.is_current_with(jsonl_path, thresholds):
+            print(f"📊 Auto-stop counters are up to date with {jsonl_path}, skipping scan")
+            return
+        
         print("🔄 Initializing auto-stop counters from existing metrics...")
         
         # Group metrics by pod
         pod_metrics = {}
-        current_time = time.time()
-        cutoff_time = current_time - thresholds.get('duration', 3600)
         
         try:
-            with open(jsonl_path, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        metric = json.loads(line)
-                        pod_id = metric.get('pod_id')
-                        epoch = metric.get('epoch', 0)
-                        
-                        # Only consider recent metrics within the duration window
-                        if pod_id and epoch >= cutoff_time:
-                            if pod_id not in pod_metrics:
-                                pod_metrics[pod_id] = []
-                            pod_metrics[pod_id].append(metric)
+            # Only metrics within the duration window are read
+            for metric in metric_files.iter_metrics(jsonl_path, since=cutoff_time):
+                epoch = metric.get('epoch')
+                if epoch is not None and (self._last_epoch is None or epoch > self._last_epoch):
+                    self._last_epoch = epoch
+                pod_id = metric.get('pod_id')
+                if pod_id:
+                    if pod_id not in pod_metrics:
+                        pod_metrics[pod_id] = []
+                    pod_metrics[pod_id].append(metric)
         except Exception as e:
             print(f"❌ Error reading JSONL: {e}")
             return
         
         # Initialize counters based on recent metrics
+        is_below = compile_threshold_check(thresholds)
         for pod_id, metrics in pod_metrics.items():
             if not metrics:
                 continue
@@ -115,7 +373,7 @@ class AutoStopTracker:
             first_below_epoch = None
             
             for metric in reversed(metrics):  # Check from most recent backwards
-                if self._is_below_threshold(metric, thresholds):
+                if is_below(metric):
                     consecutive_count += 1
                     if first_below_epoch is None:
                         first_below_epoch = metric.get('epoch')
@@ -139,28 +397,11 @@ class AutoStopTracker:
                 'status': last_metric.get('status', 'UNKNOWN')
             }
         
+        self._counted_under = thresholds_fingerprint(thresholds)
+        self._rebuild_rows()
         self.save_counters()
         print(f"✅ Initialized counters for {len(self.counters)} pods")
     
-    def _is_below_threshold(self, metric: Dict[str, Any], thresholds: Dict[str, Any]) -> bool:
-        """
-        Check if a metric is below all thresholds.
-        
-        Args:
-            metric: The metric to check
-            thresholds: The threshold values
-            
-        Returns:
-            True if metric is below all thresholds
-        """
-        cpu = metric.get('cpu_percent', 0)
-        gpu = metric.get('gpu_percent', 0)
-        memory = metric.get('memory_percent', 0)
-        
-        return (cpu <= thresholds.get('max_cpu_percent', 1) and
-                gpu <= thresholds.get('max_gpu_percent', 1) and
-                memory <= thresholds.get('max_memory_percent', 1))
-    
     def update_counter(self, metric: Dict[str, Any]) -> None:
         """
         Update counter based on a new metric (called from post-write hook).
@@ -172,15 +413,22 @@ class AutoStopTracker:
         if not pod_id:
             return
         
+        epoch = metric.get('epoch')
+        if epoch is not None and (self._last_epoch is None or epoch > self._last_epoch):
+            self._last_epoch = epoch
+        
         # Skip excluded pods
         pod_name = metric.get('name', '')
         if pod_id in self.excluded_pods or pod_name in self.excluded_pods:
             # Remove counter for excluded pods
             if pod_id in self.counters:
                 del self.counters[pod_id]
+                self._journal_counter(pod_id)
             return
         
-        current_epoch = metric.get('epoch', time.time())
+        current_epoch = metric.get('epoch')
+        if current_epoch is None:
+            current_epoch = time.time()
         status = metric.get('status', 'UNKNOWN')
         
         # Only track RUNNING pods
@@ -188,10 +436,11 @@ class AutoStopTracker:
             # Reset counter for non-running pods
             if pod_id in self.counters:
                 del self.counters[pod_id]
+                self._journal_counter(pod_id)
             return
         
         # Check if metric is below threshold
-        is_below = self._is_below_threshold(metric, self.thresholds)
+        is_below = self._is_below(metric)
         
         if pod_id not in self.counters:
             # Initialize new counter
@@ -231,16 +480,20 @@ class AutoStopTracker:
             counter['pod_name'] = pod_name
             counter['status'] = status
         
-        # Periodically save counters (every 10 updates)
-        if sum(c.get('consecutive_below_threshold', 0) for c in self.counters.values()) % 10 == 0:
-            self.save_counters()
+        self._journal_counter(pod_id)
+        
+        # Push the journal buffer to disk every 10 updates
+        self._update_seq += 1
+        if self._update_seq % 10 == 0 and self._journal is not None:
+            self._journal.flush()
     
-    def check_auto_stop(self, pod_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    def check_auto_stop(self, pod_id: str, now: Optional[float] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
         """
         Fast O(1) check if a pod should be auto-stopped.
         
         Args:
             pod_id: The pod ID to check
+            now: Current Unix time (pass it in when checking many pods in a batch)
             
         Returns:
             Tuple of (should_stop, counter_info)
@@ -252,12 +505,12 @@ class AutoStopTracker:
         
         # Check if pod has been below threshold for the required duration
         if counter['consecutive_below_threshold'] > 0 and counter['first_below_epoch']:
-            duration_below = time.time() - counter['first_below_epoch']
+            if now is None:
+                now = time.time()
+            duration_below = now - counter['first_below_epoch']
             required_duration = self.thresholds.get('duration', 3600)
             
-            # Need at least 3 data points (assuming 60s intervals)
-            min_data_points = 3
-            if counter['consecutive_below_threshold'] >= min_data_points and duration_below >= required_duration:
+            if counter['consecutive_below_threshold'] >= MIN_DATA_POINTS and duration_below >= required_duration:
                 return True, counter
         
         return False, counter
@@ -269,9 +522,26 @@ class AutoStopTracker:
         Returns:
             Dict of pod_id -> counter info for pods that should be stopped
         """
+        now = time.time()
+        if np is not None and self._row_pods:
+            # One vectorized mask over all rows instead of a per-pod check
+            n = len(self._row_pods)
+            consec = self._consec[:n]
+            first_below = self._first_below[:n]
+            required_duration = self.thresholds.get('duration', 3600)
+            mask = ((consec >= MIN_DATA_POINTS) & (first_below > 0) &
+                    ((now - first_below) >= required_duration))
+            
+            # Rows can outlive counters deleted directly from the dict
+            return {
+                self._row_pods[i]: self.counters[self._row_pods[i]]
+                for i in np.flatnonzero(mask)
+                if self._row_pods[i] in self.counters
+            }
+        
         candidates = {}
         for pod_id in self.counters:
-            should_stop, counter = self.check_auto_stop(pod_id)
+            should_stop, counter = self.check_auto_stop(pod_id, now)
             if should_stop:
                 candidates[pod_id] = counter
         return candidates
@@ -285,7 +555,7 @@ class AutoStopTracker:
         """
         if pod_id in self.counters:
             del self.counters[pod_id]
-            self.save_counters()
+            self._journal_counter(pod_id)
     
     def get_counter_info(self, pod_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -319,4 +589,5 @@ class AutoStopTracker:
         
         if stale_pods:
             print(f"🧹 Cleaned up {len(stale_pods)} stale auto-stop counters")
+            self._rebuild_rows()
             self.save_counters()
\ No newline at end of file
@@ -1,27 +1,352 @@
+import array
+import atexit
+import bisect
+import contextlib
+import csv
+import io
 import json
+import mmap
 import os
+import queue
+import re
+import struct
+import sys
+import threading
 import time
-import csv
-import io
+import types
+import warnings
+import weakref
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
-from .metric_writer import MetricWriter
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from . import fast_json, metric_files, snapshot
 from .auto_stop_tracker import AutoStopTracker
+from .metric_writer import MetricWriter
+from .ring_buffer import RingBuffer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Plain (unescaped) pod_id values in a JSONL line, with or without spaces
+# around the colon; used to size per-pod lists before parsing
+_POD_ID_PATTERN = re.compile(rb'"pod_id"\s*:\s*"([^"\\]*)"')
+
+# Numeric metric fields mirrored into the per-pod ring buffer:
+# (column, metric key, value stored for an explicit null). Missing keys store 0,
+# matching the metric.get(key, 0) reads elsewhere; null readings become NaN so
+# they never pass a threshold comparison.
+COLUMN_FIELDS = (
+    ('epoch', 'epoch', 0),
+    ('cpu', 'cpu_percent', float('nan')),
+    ('gpu', 'gpu_percent', float('nan')),
+    ('mem', 'memory_percent', float('nan')),
+    ('gpu_mem', 'gpu_memory_percent', float('nan')),
+    ('uptime', 'uptime_seconds', 0),
+    ('cost', 'cost_per_hr', float('nan')),
+    ('gpu_count', 'gpu_count', 0),
+)
+
+
+def _usage_block(rows: Any) -> Any:
+    """
+    View the cpu, gpu and mem columns of ring_buffer.RECORD_DTYPE rows as one (n, 3) float
+    array without copying; they are adjacent f8 fields, so each row's three
+    readings sit 8 bytes apart.
+    """
+    cpu = rows['cpu']
+    return np.lib.stride_tricks.as_strided(cpu, shape=(len(rows), 3),
+                                           strides=(rows.strides[0], cpu.itemsize),
+                                           writeable=False)
+
+def _auto_stop_scan(usage: Any, running: Any, max_cpu: float, max_gpu: float,
+                    max_memory: float, detect_no_change: bool) -> Tuple[bool, bool]:
+    """
+    Single pass over an (n, 3) usage block (see _usage_block) for the
+    auto-stop check, stopping as soon as the outcome is settled. Compiled
+    with numba when it is installed; without it the broadcast numpy
+    comparisons are used instead.
+    
+    Returns:
+        Tuple of (threshold_met, no_change_detected); both False if any
+        sample is not running
+    """
+    threshold_met = True
+    no_change = detect_no_change
+    c0, g0, m0 = usage[0, 0], usage[0, 1], usage[0, 2]
+    for i in range(usage.shape[0]):
+        if not running[i]:
+            return False, False
+        c, g, m = usage[i, 0], usage[i, 1], usage[i, 2]
+        # Written as not (x <= limit) so NaN (null) readings fail, as in numpy
+        if threshold_met and not (c <= max_cpu and g <= max_gpu and m <= max_memory):
+            threshold_met = False
+        if no_change and not (c == c0 and g == g0 and m == m0):
+            no_change = False
+        if not threshold_met and not no_change:
+            return False, False  # Settled; a later stopped sample can't change it
+    return threshold_met, no_change
+
+
+if numba is not None:
+    _auto_stop_scan = numba.njit(cache=True)(_auto_stop_scan)
+
+
+# Retention units in seconds, and the 999-year value treated as "forever"
+RETENTION_UNIT_SECONDS = {
+    'hours': 3600,
+    'days': 24 * 3600,
+    'weeks': 7 * 24 * 3600,
+    'months': 30 * 24 * 3600,
+    'years': 365 * 24 * 3600,
+}
+FOREVER_RETENTION_SECONDS = 999 * RETENTION_UNIT_SECONDS['years']
+
+
+def _epoch_index(metrics: List[Dict], cutoff_time: float, right: bool = False) -> int:
+    """
+    Binary-search an epoch-ordered metric list for the first entry whose
+    'epoch' is >= cutoff_time (bisect_left on the epoch key), or > cutoff_time
+    with right=True (bisect_right).
+    
+    Args:
+        metrics: Metric dicts in append (epoch) order
+        cutoff_time: Unix timestamp to search for
+        right: Place the index after entries equal to cutoff_time
+        
+    Returns:
+        Index of the first metric to keep
+    """
+    epoch_get = dict.get
+    lo, hi = 0, len(metrics)
+    if right:
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if epoch_get(metrics[mid], "epoch", 0) <= cutoff_time:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if epoch_get(metrics[mid], "epoch", 0) < cutoff_time:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+# Fields of a metric point in the order add_metric writes them, with the value
+# used when a metric lacks the field (a missing pod_id falls back to the pod the
+# metric is grouped under). Also the CSV export columns.
+METRIC_FIELDS = (
+    ('timestamp', ''), ('epoch', 0), ('pod_id', None), ('name', ''), ('status', ''),
+    ('cost_per_hr', 0), ('uptime_seconds', 0), ('cpu_percent', 0), ('memory_percent', 0),
+    ('gpu_percent', 0), ('gpu_memory_percent', 0), ('gpu_count', 0),
+)
+
+
+def metric_timestamp(metric: Dict) -> str:
+    """
+    Get a metric's ISO timestamp, deriving it from 'epoch' (local time, as
+    add_metric does) for records that only carry the epoch.
+    
+    Args:
+        metric: Metric dict
+        
+    Returns:
+        ISO-8601 timestamp, or '' if the metric has neither field
+    """
+    timestamp = metric.get('timestamp')
+    if timestamp:
+        return timestamp
+    epoch = metric.get('epoch')
+    return datetime.fromtimestamp(epoch).isoformat() if epoch else ''
+
+
+# Local-time ISO prefix ('YYYY-MM-DDTHH:MM:SS') of the last second formatted
+_iso_second: Tuple[Optional[int], str] = (None, '')
+
+
+def _iso_timestamp(now: float) -> str:
+    """
+    Format a time.time() value like datetime.fromtimestamp(now).isoformat(),
+    building the datetime only once per second; every pod polled within the
+    same second shares the prefix and only the microseconds are formatted.
+    """
+    global _iso_second
+    # Round the fraction separately, as datetime does
+    second = int(now // 1)
+    micro = round((now - second) * 1_000_000)
+    if micro == 1_000_000:
+        second, micro = second + 1, 0
+    cached_second, prefix = _iso_second
+    if cached_second != second:
+        prefix = datetime.fromtimestamp(second).isoformat()
+        _iso_second = (second, prefix)  # One assignment, so threads never see a torn pair
+    return f"{prefix}.{micro:06d}" if micro else prefix
+
+
+def compile_row_extractor(fields: Tuple[Tuple[str, Any], ...]) -> Callable[[Dict, str], tuple]:
+    """
+    Build a function that reads the given fields of a metric into a tuple.
+    The field names and defaults are baked into the generated source, so a
+    row is one call with a single bound dict.get instead of a per-field loop.
+    
+    Args:
+        fields: (metric key, default) pairs in column order; 'pod_id'
+            defaults to the pod_id argument
+        
+    Returns:
+        Function taking (metric, pod_id) and returning the row tuple
+    """
+    special = {'pod_id': "get('pod_id', pod_id)"}
+    getters = ", ".join(special.get(key, f"get({key!r}, {default!r})") for key, default in fields)
+    src = (
+        "def extract_row(metric, pod_id):\n"
+        "    get = metric.get\n"
+        f"    return ({getters},)\n"
+    )
+    namespace: Dict[str, Any] = {}
+    exec(src, namespace)
+    return namespace['extract_row']
+
+
+# Pre-sized metric point that add_metric copies and fills in
+_METRIC_TEMPLATE = {key: default for key, default in METRIC_FIELDS}
+
+_csv_row = compile_row_extractor(METRIC_FIELDS)
+
+# CSV export header and a row template producing what csv.writer would for
+# rows whose fields need no quoting (its default '\r\n' line terminator)
+_CSV_HEADER = ','.join(key for key, _ in METRIC_FIELDS) + '\r\n'
+_CSV_LINE = ','.join(['%s'] * len(METRIC_FIELDS)) + '\r\n'
+_CSV_COMMAS = len(METRIC_FIELDS) - 1
+
+
+def _csv_text(metrics: List[Dict], pod_id: str) -> str:
+    """
+    Format metrics as CSV rows with one %-format per row. Rows that hold a
+    None (csv writes '') or a field with a comma, quote or line break go
+    through csv.writer instead, so the output is identical to writerows.
+    """
+    lines: List[str] = []
+    writer = csv.writer(types.SimpleNamespace(write=lines.append))
+    append = lines.append
+    line_fmt = _CSV_LINE
+    for metric in metrics:
+        row = _csv_row(metric, pod_id)
+        line = line_fmt % row
+        if (None in row or line.count(',') != _CSV_COMMAS or '"' in line or
+                '\n' in line[:-1] or '\r' in line[:-2]):
+            writer.writerow(row)
+        else:
+            append(line)
+    return ''.join(lines)
+
+
+def _copy_summary(summary: Dict) -> Dict:
+    """Copy a memoized summary deep enough that callers can edit its fields and nested dicts."""
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in summary.items()}
+
+
+# Trackers whose buffered metrics and summaries cache are saved at exit
+_live_trackers = weakref.WeakSet()
+
+
+@atexit.register
+def _save_live_trackers() -> None:
+    for tracker in list(_live_trackers):
+        tracker.save_data(wait=True)
 
 
 class DataTracker:
     """Tracks pod metrics over time and manages historical data."""
     
-    def __init__(self, data_dir: str = "./data", metrics_file: str = "pod_metrics.jsonl", use_metric_writer: bool = True, use_auto_stop_tracker: bool = True):
+    def __init__(self, data_dir: str = "./data", metrics_file: str = "pod_metrics.jsonl", use_metric_writer: bool = True, use_auto_stop_tracker: bool = True, use_ring_buffer: bool = True):
         self.data_dir = data_dir
         # Use JSONL format by default
         self.metrics_file = os.path.join(data_dir, metrics_file)
         self.data: Dict[str, List[Dict]] = {}
         
+        # Day of the live metrics file's rows and the epoch at which it ends;
+        # the first metric past that rotates the file into a daily shard
+        # (see metric_files). None until read from the file on first save.
+        self._live_day: Optional[str] = None
+        self._live_day_end = float('inf')
+        # Newest epoch in the live file; a metric more than
+        # metric_files.EPOCH_SLACK_SECONDS older (the clock was set back) also
+        # closes the file, so every file stays in epoch order
+        self._live_newest = float('-inf')
+        
+        # Append descriptor for writes without a MetricWriter, kept open across
+        # saves and closed whenever the live file is replaced or rotated
+        self._append_fd: Optional[int] = None
+        
+        # In-memory window of recent metrics per pod with a parallel sorted epoch
+        # array('q') (8 bytes per entry), so get_recent_metrics can bisect
+        # instead of re-reading pod files.
+        # _recent_since[pod_id] is the epoch from which the window is complete.
+        self._recent: Dict[str, List[Dict]] = {}
+        self._epochs: Dict[str, array.array] = {}
+        self._recent_since: Dict[str, float] = {}
+        self._recent_retention = 3600
+        self._pod_manager = None  # PodMetricsManager for cold-start reads
+        
+        # Latest known name per pod for the excluded-names safety check; unlike
+        # self.data it isn't dropped by retention cleanup
+        self._pod_names: Dict[str, str] = {}
+        
+        # Numeric columns of the recent window when numpy is available: one
+        # RingBuffer per pod, bounded by its capacity rather than trimmed. It is
+        # backed by data/rings/<pod_id>.ring, so the window is restored (rather
+        # than rebuilt over the next hour) after a restart and other processes
+        # can read it without parsing JSON; use_ring_buffer=False keeps it in
+        # anonymous memory instead
+        self.ring_dir = os.path.join(data_dir, 'rings') if use_ring_buffer else None
+        self._rings: Dict[str, RingBuffer] = {}
+        # The monitor thread appends to and closes rings while web requests
+        # read them; every ring access (including close) holds this lock, and
+        # reads copy out of the mapping so no numpy view outlives it
+        self._rings_lock = threading.Lock()
+        
         # Cache files for avoiding full data loads
         self.summaries_cache_file = os.path.join(data_dir, "pod_summaries_cache.json")
         self.summaries_cache = {}
         
+        # Write-behind state for the summaries cache: updates mark it dirty and
+        # it is flushed at most once per interval (plus once at exit via save_data)
+        self._cache_lock = threading.RLock()
+        self._cache_dirty = False
+        self._last_cache_flush = float('-inf')  # time.monotonic() of the last save
+        self._cache_flush_interval = 5.0
+        self._cache_flush_timer = None
+        
+        # save_data hands the cache write to a background writer thread through
+        # a single-slot queue; a request made while one is pending coalesces
+        # with it, since the writer always serializes the current state
+        self._save_q: queue.Queue = queue.Queue(maxsize=1)
+        self._save_thread: Optional[threading.Thread] = None
+        _live_trackers.add(self)
+        
+        # Built summaries are memoized per pod until a new metric marks the pod
+        # dirty, so repeated page loads don't recompute them
+        self._pod_summaries: Dict[str, Dict] = {}
+        self._list_summaries: Dict[str, Dict] = {}
+        self._summary_dirty: set = set()
+        # get_all_summaries keeps its assembled list too, valid while no pod
+        # changed (the version is bumped on every summary change) and the set
+        # of cached pods is the same (server.py deletes entries directly)
+        self._summary_version = 0
+        self._summary_list: Optional[Tuple[int, Any, List[Dict]]] = None
+        
         # Initialize MetricWriter if enabled
         self.use_metric_writer = use_metric_writer
         self.metric_writer = MetricWriter() if use_metric_writer else None
@@ -35,6 +360,7 @@ class DataTracker:
         
         # Run migration if needed (from JSON to JSONL)
         self.migrate_json_to_jsonl()
+        self.migrate_to_epoch_order()
         
         # Initialize empty data structure
         self.data = {}
@@ -85,24 +411,70 @@ class DataTracker:
         """Load pod summaries from cache file."""
         if os.path.exists(self.summaries_cache_file):
             try:
-                with open(self.summaries_cache_file, 'r') as f:
-                    self.summaries_cache = json.load(f)
+                self.summaries_cache = fast_json.load_file(self.summaries_cache_file)
+                # Caches written before the running means were incremental
+                # also stored the raw totals; the averages already match them
+                for cache in self.summaries_cache.values():
+                    for key in ('cpu', 'memory', 'gpu'):
+                        total = cache.pop(f'total_{key}', None)
+                        if total is not None and f'avg_{key}' not in cache:
+                            n = cache.get('total_metrics', 0)
+                            cache[f'avg_{key}'] = total / n if n else 0
             except Exception as e:
                 print(f"Warning: Could not load summaries cache: {e}")
                 self.summaries_cache = {}
         else:
             self.summaries_cache = {}
+        
+        # Memoized summaries were built from the previous cache contents
+        self._pod_summaries.clear()
+        self._list_summaries.clear()
+        self._summary_dirty.clear()
+        self._summary_version += 1
     
     def save_summaries_cache(self):
         """Save pod summaries to cache file."""
-        try:
-            with open(self.summaries_cache_file, 'w') as f:
-                json.dump(self.summaries_cache, f)
-        except Exception as e:
-            print(f"Warning: Could not save summaries cache: {e}")
+        with self._cache_lock:
+            try:
+                # Swapped in atomically so readers never see a partial file
+                fast_json.dump_atomic(self.summaries_cache, self.summaries_cache_file)
+                self._cache_dirty = False
+                self._last_cache_flush = time.monotonic()
+            except Exception as e:
+                print(f"Warning: Could not save summaries cache: {e}")
+    
+    def flush_summaries_cache(self):
+        """Save the summaries cache if it has unsaved updates."""
+        with self._cache_lock:
+            self._cache_flush_timer = None
+            if self._cache_dirty:
+                self.save_summaries_cache()
+    
+    def _schedule_cache_flush(self):
+        """
+        Hand a save to the background writer if the interval has passed,
+        otherwise arm a one-shot flush timer; the metric path never serializes
+        the cache itself.
+        """
+        elapsed = time.monotonic() - self._last_cache_flush
+        if elapsed >= self._cache_flush_interval:
+            self._request_background_save()
+        elif self._cache_flush_timer is None:
+            self._cache_flush_timer = threading.Timer(self._cache_flush_interval - elapsed,
+                                                      self.flush_summaries_cache)
+            self._cache_flush_timer.daemon = True
+            self._cache_flush_timer.start()
     
     def update_summary_cache(self, pod_id: str, metric_point: Dict):
         """Update the summary cache for a specific pod with latest metric."""
+        with self._cache_lock:
+            self._update_summary_cache(pod_id, metric_point)
+            self._summary_dirty.add(pod_id)
+            self._summary_version += 1
+            self._cache_dirty = True
+            self._schedule_cache_flush()
+    
+    def _update_summary_cache(self, pod_id: str, metric_point: Dict):
         if pod_id not in self.summaries_cache:
             self.summaries_cache[pod_id] = {
                 'pod_id': pod_id,
@@ -111,29 +483,19 @@ class DataTracker:
                 'latest_metric': None,
                 'avg_cpu': 0,
                 'avg_memory': 0,
-                'avg_gpu': 0,
-                'total_cpu': 0,
-                'total_memory': 0,
-                'total_gpu': 0
+                'avg_gpu': 0
             }
         
         cache = self.summaries_cache[pod_id]
         cache['total_metrics'] += 1
+        n = cache['total_metrics']
         cache['latest_metric'] = metric_point
         cache['name'] = metric_point.get('name', cache['name'])
         
-        # Update running averages
-        cache['total_cpu'] += metric_point.get('cpu_percent', 0)
-        cache['total_memory'] += metric_point.get('memory_percent', 0)
-        cache['total_gpu'] += metric_point.get('gpu_percent', 0)
-        
-        cache['avg_cpu'] = cache['total_cpu'] / cache['total_metrics']
-        cache['avg_memory'] = cache['total_memory'] / cache['total_metrics']
-        cache['avg_gpu'] = cache['total_gpu'] / cache['total_metrics']
-        
-        # Save cache periodically (every 10 metrics)
-        if cache['total_metrics'] % 10 == 0:
-            self.save_summaries_cache()
+        # Incremental (Welford) running means: no growing totals to lose precision
+        cache['avg_cpu'] += (metric_point.get('cpu_percent', 0) - cache['avg_cpu']) / n
+        cache['avg_memory'] += (metric_point.get('memory_percent', 0) - cache['avg_memory']) / n
+        cache['avg_gpu'] += (metric_point.get('gpu_percent', 0) - cache['avg_gpu']) / n
     
     def migrate_json_to_jsonl(self):
         """One-time migration from JSON to JSONL format."""
@@ -144,16 +506,21 @@ class DataTracker:
         if os.path.exists(json_file) and not os.path.exists(jsonl_file):
             print("📦 Migrating pod_metrics.json to JSONL format...")
             try:
-                with open(json_file, 'r') as f:
-                    old_data = json.load(f)
+                with open(json_file, 'rb') as f:
+                    old_data = fast_json.loads(f.read())
                 
-                # Write each metric as a separate line in JSONL
-                with open(jsonl_file, 'w') as f:
-                    for pod_id, metrics_list in old_data.items():
-                        for metric in metrics_list:
-                            # Ensure pod_id is in each metric
-                            metric['pod_id'] = pod_id
-                            f.write(json.dumps(metric) + '\n')
+                # Write each metric as a separate line in JSONL, in epoch
+                # order across pods (see metric_files)
+                metrics = []
+                for pod_id, metrics_list in old_data.items():
+                    for metric in metrics_list:
+                        # Ensure pod_id is in each metric
+                        metric['pod_id'] = pod_id
+                        metrics.append(metric)
+                metrics.sort(key=lambda metric: metric.get('epoch') or 0)
+                with open(jsonl_file, 'wb') as f:
+                    for metric in metrics:
+                        f.write(fast_json.dumps_line(metric))
                 
                 # Delete the old JSON file after successful migration
                 os.remove(json_file)
@@ -163,72 +530,297 @@ class DataTracker:
                 print(f"❌ Migration failed: {e}")
                 print("   Will continue with fresh JSONL file")
     
+    def migrate_to_epoch_order(self):
+        """
+        One-time migration sorting metrics files that older versions rewrote
+        grouped by pod, since reads with a cutoff rely on epoch order (see
+        metric_files). A marker file next to the live file records that it ran.
+        """
+        marker = self.metrics_file + '.ordered'
+        if os.path.exists(marker):
+            return
+        try:
+            sorted_paths = metric_files.sort_unordered_files(self.metrics_file)
+            with open(marker, 'wb'):
+                pass
+        except OSError as e:
+            print(f"❌ Sorting metrics files by epoch failed: {e}")
+            return
+        if sorted_paths:
+            print(f"📦 Sorted {len(sorted_paths)} metrics files by epoch")
+    
     def load_data(self):
-        """Load metrics data from JSONL file."""
+        """Load metrics data: rolled-up days, then the JSONL shards and live file."""
         self.data = {}
+        self._flush_metric_writer()
         
-        if not os.path.exists(self.metrics_file):
+        # Days already rolled up into columnar snapshots come first
+        rolled: Dict[str, List[Dict]] = {}
+        rolled_days = sorted({metric_files.shard_day(path)
+                              for path in metric_files.rolled_paths(self.metrics_file)})
+        for day in rolled_days:
+            try:
+                for pod_id, metrics in metric_files.read_rolled_day(self.metrics_file, day).items():
+                    rolled.setdefault(pod_id, []).extend(metrics)
+            except (OSError, ValueError, ImportError) as e:
+                print(f"Warning: Could not read rolled-up metrics of {day}: {e}")
+        
+        # mmap can't map an empty file
+        paths = [path for path in metric_files.unrolled_paths(self.metrics_file)
+                 if os.path.getsize(path)]
+        if not paths:
+            self.data = rolled
             return
         
         try:
-            with open(self.metrics_file, 'r') as f:
-                for line_num, line in enumerate(f, 1):
-                    if line.strip():  # Skip empty lines
-                        try:
-                            metric = json.loads(line)
-                            pod_id = metric.get('pod_id')
-                            if pod_id:
-                                if pod_id not in self.data:
-                                    self.data[pod_id] = []
-                                self.data[pod_id].append(metric)
-                        except json.JSONDecodeError as e:
-                            print(f"Warning: Skipping invalid JSON at line {line_num}: {e}")
+            # Pass 1: count lines per pod at the bytes level so each list
+            # is allocated once instead of grown by append
+            counts: Dict[str, int] = {pod_id: len(metrics) for pod_id, metrics in rolled.items()}
+            for path in paths:
+                with open(path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for match in _POD_ID_PATTERN.finditer(mm):
+                        pod_id = match.group(1).decode()
+                        counts[pod_id] = counts.get(pod_id, 0) + 1
+            data = {pod_id: [None] * count for pod_id, count in counts.items()}
+            filled = dict.fromkeys(counts, 0)
+            for pod_id, metrics in rolled.items():
+                data[pod_id][:len(metrics)] = metrics
+                filled[pod_id] = len(metrics)
+            
+            # Pass 2: parse each line in place and fill by index
+            for path in paths:
+                with open(path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    find = mm.find
+                    size = len(mm)
+                    pos = 0
+                    line_num = 0
+                    while pos < size:
+                        end = find(b'\n', pos)
+                        if end == -1:
+                            end = size
+                        line_num += 1
+                        if end > pos:  # Skip empty lines without stripping
+                            line = mm[pos:end]
+                            try:
+                                metric = fast_json.loads(line)
+                            except json.JSONDecodeError as e:
+                                if line.strip():  # Whitespace-only lines are skipped quietly
+                                    print(f"Warning: Skipping invalid JSON at {path}:{line_num}: {e}")
+                            else:
+                                pod_id = metric.get('pod_id')
+                                if pod_id:
+                                    slots = data.get(pod_id)
+                                    if slots is None:
+                                        slots = data[pod_id] = []
+                                        filled[pod_id] = 0
+                                    i = filled[pod_id]
+                                    if i < len(slots):
+                                        slots[i] = metric
+                                    else:
+                                        slots.append(metric)  # Escaped pod_id, missed by pass 1
+                                    filled[pod_id] = i + 1
+                        pos = end + 1
+            
+            # Drop slots counted for lines that failed to parse
+            for pod_id, slots in data.items():
+                if filled[pod_id] < len(slots):
+                    del slots[filled[pod_id]:]
+            self.data = {pod_id: slots for pod_id, slots in data.items() if slots}
         except IOError as e:
             print(f"Warning: Could not load metrics file: {e}")
             self.data = {}
     
-    def save_data(self):
-        """This method is deprecated for JSONL. Use save_metric() for individual metrics."""
-        # For backward compatibility, we'll rewrite the entire JSONL file
-        # This should rarely be called with the new append-only approach
+    def save_data(self, wait: bool = False):
+        """
+        Persist pending state: flush buffered metric writes and the summaries cache.
+        Metrics are appended to the JSONL file as they arrive, so this never
+        rewrites the file from memory (self.data only holds the latest metric per pod).
+        
+        Args:
+            wait: Block until buffered metrics are on disk and write the
+                summaries cache on this thread instead of handing it to the
+                background writer (used at exit)
+        """
+        self._flush_metric_writer(wait=wait)  # The writer thread does the write() calls
+        
+        if wait:
+            self.flush_summaries_cache()
+        else:
+            self._request_background_save()
+    
+    def _flush_metric_writer(self, wait: bool = True):
+        """
+        Flush buffered metric writes, reporting rows the writer thread failed
+        to write instead of raising (those rows are lost either way).
+        
+        Args:
+            wait: Block until the rows are on disk
+        """
+        if not self.metric_writer:
+            return
         try:
-            with open(self.metrics_file, 'w') as f:
-                for pod_id, metrics_list in self.data.items():
-                    for metric in metrics_list:
-                        # Ensure pod_id is in each metric
-                        metric['pod_id'] = pod_id
-                        f.write(json.dumps(metric) + '\n')
+            self.metric_writer.flush(wait=wait)
+        except OSError as e:
+            print(f"❌ Error writing metrics to {self.metrics_file}: {e}")
+    
+    def _request_background_save(self):
+        """Ask the background writer to flush the summaries cache (coalesced, never blocks)."""
+        if self._save_thread is None:
+            self._save_thread = threading.Thread(target=self._writer_loop, name="data-tracker-writer",
+                                                 daemon=True)
+            self._save_thread.start()
+        try:
+            self._save_q.put_nowait(True)
+        except queue.Full:
+            pass  # A pending save will pick up the latest state
+    
+    def _writer_loop(self):
+        """Background writer: flush the summaries cache whenever a save is requested."""
+        while True:
+            self._save_q.get()
+            try:
+                self.flush_summaries_cache()
+            except Exception as e:
+                print(f"Warning: Background save failed: {e}")
+    
+    def compact_metrics_file(self, cutoff_time: float, path: Optional[str] = None) -> int:
+        """
+        Rewrite a JSONL file keeping only metrics with epoch >= cutoff_time.
+        Streams line by line and swaps the result in atomically, so history
+        that is not held in memory is preserved.
+        
+        Args:
+            cutoff_time: Unix timestamp; older metrics are dropped
+            path: File to compact (default: the live metrics file)
+            
+        Returns:
+            Number of metrics removed
+        """
+        path = path or self.metrics_file
+        tmp_file = path + '.tmp'
+        removed = 0
+        try:
+            # Buffered rows must be part of the rewrite, and rows written while
+            # it runs would be lost when the copy replaces the file
+            with self.metric_writer.paused() if self.metric_writer else contextlib.nullcontext():
+                if not os.path.exists(path):
+                    return 0
+                with open(path, 'rb') as src, open(tmp_file, 'wb', buffering=65536) as dst:
+                    for line in src:
+                        if not line.strip():
+                            continue
+                        try:
+                            epoch = fast_json.loads(line).get('epoch', 0)
+                        except json.JSONDecodeError:
+                            removed += 1
+                            continue
+                        if epoch >= cutoff_time:
+                            dst.write(line if line.endswith(b'\n') else line + b'\n')
+                        else:
+                            removed += 1
+                
+                if removed:
+                    if self.metric_writer:
+                        self.metric_writer.close(path)
+                    if path == self.metrics_file:
+                        self._close_append_fd()
+                    os.replace(tmp_file, path)
+                else:
+                    os.remove(tmp_file)
         except IOError as e:
-            print(f"Error: Could not save metrics file: {e}")
+            print(f"Error: Could not compact metrics file: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        
+        return removed
+    
+    def _rotate_metrics_file(self, epoch: float):
+        """
+        Move the live metrics file to its daily shard once a metric from a
+        later day arrives, so retention can drop whole days (see metric_files).
+        A metric well before the newest row (the clock was set back) closes
+        the file the same way, so no file goes out of epoch order.
+        
+        Args:
+            epoch: Epoch of the metric about to be appended
+        """
+        if self._live_day is None:
+            _, last_epoch = metric_files.edge_epochs(self.metrics_file)
+            self._live_day = metric_files.day_of(last_epoch if last_epoch is not None else epoch)
+            self._live_day_end = metric_files.day_end(self._live_day)
+            self._live_newest = last_epoch if last_epoch is not None else epoch
+        if self._live_newest - metric_files.EPOCH_SLACK_SECONDS <= epoch < self._live_day_end:
+            self._live_newest = max(self._live_newest, epoch)
+            return
+        
+        if self.metric_writer:
+            # Buffered rows belong to the old day and must land before the move
+            self._flush_metric_writer()
+            self.metric_writer.close(self.metrics_file)
+        self._close_append_fd()
+        if os.path.exists(self.metrics_file) and os.path.getsize(self.metrics_file):
+            shard = metric_files.shard_path(self.metrics_file, self._live_day)
+            try:
+                if os.path.exists(shard):
+                    # The clock was set back: merge into the day's shard
+                    metric_files.merge_into_shard(self.metrics_file, shard)
+                else:
+                    os.replace(self.metrics_file, shard)
+            except OSError as e:
+                print(f"Warning: Could not rotate metrics file: {e}")
+        
+        self._live_day = metric_files.day_of(epoch)
+        self._live_day_end = metric_files.day_end(self._live_day)
+        self._live_newest = epoch
     
     def save_metric(self, metric_point: Dict):
         """Append a single metric to JSONL file (efficient append-only operation)."""
+        self._rotate_metrics_file(metric_point.get('epoch') or time.time())
         if self.use_metric_writer and self.metric_writer:
             # Use MetricWriter with hooks
             success = self.metric_writer.write_metric(metric_point, self.metrics_file)
             if not success:
                 print(f"Error: MetricWriter failed to write metric")
         else:
-            # Fallback to direct write
+            # Fallback to direct write: one unbuffered O_APPEND write per row
+            # on a descriptor that stays open between saves
             try:
-                with open(self.metrics_file, 'a') as f:
-                    f.write(json.dumps(metric_point) + '\n')
-            except IOError as e:
+                if self._append_fd is None:
+                    self._append_fd = os.open(self.metrics_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                os.write(self._append_fd, fast_json.dumps_line(metric_point))
+            except OSError as e:
+                self._close_append_fd()
                 print(f"Error: Could not append metric to file: {e}")
     
+    def _close_append_fd(self):
+        """Close the direct-write descriptor; the next save reopens the live file."""
+        if self._append_fd is not None:
+            try:
+                os.close(self._append_fd)
+            except OSError:
+                pass
+            self._append_fd = None
+    
     def add_metric(self, pod_id: str, pod_data: Dict[str, Any]):
         """Add a new metric data point for a pod."""
-        timestamp = datetime.now().isoformat()
-        
-        # Extract relevant metrics
-        metric_point = {
-            "timestamp": timestamp,
-            "epoch": int(time.time()),
-            "pod_id": pod_id,
-            "name": pod_data.get("name", ""),
-            "status": pod_data.get("desiredStatus", "UNKNOWN"),
-            "cost_per_hr": pod_data.get("costPerHr", 0),
-        }
+        # One clock read for both representations
+        now = time.time()
+        timestamp = _iso_timestamp(now)
+        
+        # Extract relevant metrics into a copy of the template, which already
+        # holds every field (runtime metrics default to 0 for stopped pods)
+        metric_point = _METRIC_TEMPLATE.copy()
+        metric_point["timestamp"] = timestamp
+        metric_point["epoch"] = int(now)
+        metric_point["pod_id"] = pod_id
+        metric_point["name"] = pod_data.get("name", "")
+        status = pod_data.get("desiredStatus", "UNKNOWN")
+        # Interned, so status checks against the "RUNNING" literal are
+        # identity hits rather than character compares
+        metric_point["status"] = sys.intern(status) if type(status) is str else status
+        metric_point["cost_per_hr"] = pod_data.get("costPerHr", 0)
         
         # Add runtime metrics if available
         runtime = pod_data.get("runtime")
@@ -242,27 +834,18 @@ class DataTracker:
             # GPU metrics
             gpus = runtime.get("gpus", [])
             if gpus:
-                # Average GPU utilization across all GPUs
-                gpu_utils = [gpu.get("gpuUtilPercent", 0) for gpu in gpus]
-                gpu_memory_utils = [gpu.get("memoryUtilPercent", 0) for gpu in gpus]
+                # Average GPU utilization across all GPUs (one pass, no temp
+                # lists); the API reports null readings for some GPUs
+                util_total = memory_total = 0
+                for gpu in gpus:
+                    util_total += gpu.get("gpuUtilPercent") or 0
+                    memory_total += gpu.get("memoryUtilPercent") or 0
                 
-                metric_point["gpu_percent"] = sum(gpu_utils) / len(gpu_utils) if gpu_utils else 0
-                metric_point["gpu_memory_percent"] = sum(gpu_memory_utils) / len(gpu_memory_utils) if gpu_memory_utils else 0
-                metric_point["gpu_count"] = len(gpus)
-            else:
-                metric_point["gpu_percent"] = 0
-                metric_point["gpu_memory_percent"] = 0
-                metric_point["gpu_count"] = 0
-        else:
-            # Pod is stopped or no runtime data
-            metric_point.update({
-                "uptime_seconds": 0,
-                "cpu_percent": 0,
-                "memory_percent": 0,
-                "gpu_percent": 0,
-                "gpu_memory_percent": 0,
-                "gpu_count": 0
-            })
+                gpu_count = len(gpus)
+                metric_point["gpu_percent"] = util_total / gpu_count
+                metric_point["gpu_memory_percent"] = memory_total / gpu_count
+                metric_point["gpu_count"] = gpu_count
+        # Pods that are stopped or report no runtime/GPUs keep the template's zeros
         
         # Initialize pod data if not exists
         if pod_id not in self.data:
@@ -278,6 +861,9 @@ class DataTracker:
         
         # Add the metric point to memory (only keep last 1 for restart detection)
         self.data[pod_id] = [metric_point]  # Only keep the latest metric
+        self._pod_names[pod_id] = metric_point["name"]
+        
+        self._remember_recent(pod_id, metric_point)
         
         # Update summary cache with this new metric
         self.update_summary_cache(pod_id, metric_point)
@@ -285,20 +871,131 @@ class DataTracker:
         # Append to JSONL file (efficient append-only write)
         self.save_metric(metric_point)
     
-    def get_recent_metrics(self, pod_id: str, duration_seconds: int) -> List[Dict]:
-        """Get recent metrics for a pod within the specified duration - reads from file."""
-        # Read from per-pod file instead of memory
-        try:
-            from .pod_metrics_manager import PodMetricsManager
-        except ImportError:
-            from runpod_monitor.pod_metrics_manager import PodMetricsManager
+    def _remember_recent(self, pod_id: str, metric_point: Dict):
+        """Append a metric to the pod's in-memory recent window, trimming expired entries."""
+        epochs = self._epochs.get(pod_id)
+        if epochs is None or (epochs and metric_point["epoch"] < epochs[-1]):
+            # New pod or clock went backwards: start a fresh window
+            self._recent[pod_id] = []
+            epochs = self._epochs[pod_id] = array.array('q')
+            self._recent_since[pod_id] = metric_point["epoch"]
+        
+        self._recent[pod_id].append(metric_point)
+        epochs.append(metric_point["epoch"])
+        self._append_columns(pod_id, metric_point)
+        
+        # Trim in bulk once at least half the window has expired
+        cutoff = metric_point["epoch"] - self._recent_retention
+        idx = bisect.bisect_left(epochs, cutoff)
+        if idx and idx * 2 >= len(epochs):
+            del self._recent[pod_id][:idx]
+            del epochs[:idx]
+            self._recent_since[pod_id] = cutoff
+    
+    def _append_columns(self, pod_id: str, metric_point: Dict):
+        """Append a metric's numeric fields to the pod's ring buffer."""
+        if np is None:
+            return
+        
+        row = []
+        for _, key, null_value in COLUMN_FIELDS:
+            value = metric_point.get(key, 0)
+            row.append(null_value if value is None else value)
+        row.append(metric_point.get("status") == "RUNNING")
         
-        manager = PodMetricsManager(base_dir='./data/pods')
+        with self._rings_lock:
+            ring = self._ring(pod_id)
+            if ring is None:
+                return
+            
+            latest = ring.latest_epoch()
+            if latest is not None and latest > metric_point["epoch"]:
+                ring.clear()  # Clock went backwards: the stored window no longer lines up
+            
+            try:
+                ring.append(row)
+            except struct.error:
+                # A value that doesn't fit the record (e.g. a float epoch): a
+                # gap would make the window look complete when it isn't, so
+                # start the ring over instead
+                ring.clear()
+    
+    def _ring(self, pod_id: str) -> Optional[RingBuffer]:
+        """
+        Open (creating if needed) the pod's ring buffer, file-backed when
+        ring_dir is set. Call with _rings_lock held.
+        """
+        ring = self._rings.get(pod_id)
+        if ring is None:
+            try:
+                path = None
+                if self.ring_dir is not None:
+                    os.makedirs(self.ring_dir, exist_ok=True)
+                    path = os.path.join(self.ring_dir, f"{pod_id}.ring")
+                ring = self._rings[pod_id] = RingBuffer(path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not open ring buffer for {pod_id}: {e}")
+        return ring
+    
+    def _recent_columns(self, pod_id: str, duration_seconds: int) -> Optional[Any]:
+        """
+        Get the recent window as a structured array read from the pod's ring
+        buffer (index it by column name, e.g. rows['cpu']), or None when numpy
+        is missing or the ring doesn't reach back over the requested duration.
+        """
         cutoff_time = time.time() - duration_seconds
+        self._recent_retention = max(self._recent_retention, duration_seconds)
+        with self._rings_lock:
+            ring = self._rings.get(pod_id)
+            if ring is None:
+                return None
+            oldest = ring.oldest_epoch()
+            if oldest is None or cutoff_time < oldest:
+                return None
+            return ring.array_since(cutoff_time)
+    
+    def _close_ring(self, pod_id: str) -> None:
+        """Close the pod's ring buffer, if open, and delete its file."""
+        with self._rings_lock:
+            ring = self._rings.pop(pod_id, None)
+            if ring is not None:
+                ring.close()
+            if self.ring_dir is not None:
+                os.remove(os.path.join(self.ring_dir, f"{pod_id}.ring"))
+    
+    def get_recent_metrics(self, pod_id: str, duration_seconds: int) -> List[Dict]:
+        """Get recent metrics for a pod within the specified duration."""
+        cutoff_time = time.time() - duration_seconds
+        self._recent_retention = max(self._recent_retention, duration_seconds)
+        
+        # Serve from memory when the window covers the requested range
+        since = self._recent_since.get(pod_id)
+        if since is not None and cutoff_time >= since:
+            idx = bisect.bisect_left(self._epochs[pod_id], cutoff_time)
+            return self._recent[pod_id][idx:]
+        
+        # Otherwise (e.g. shortly after startup) read from the per-pod file
+        if self._pod_manager is None:
+            try:
+                from .pod_metrics_manager import PodMetricsManager
+            except ImportError:
+                from runpod_monitor.pod_metrics_manager import PodMetricsManager
+            self._pod_manager = PodMetricsManager(base_dir='./data/pods')
         
         # Read metrics from file with time filter
-        metrics = manager.read_metrics(pod_id, file_type="raw", start_epoch=cutoff_time)
-        return metrics if metrics else []
+        metrics = self._pod_manager.read_metrics(pod_id, file_type="raw", start_epoch=cutoff_time)
+        if since is None:
+            return metrics if metrics else []
+        
+        # Backfill the window with the older part of the file so later calls
+        # for this duration are served from memory
+        older = [m for m in metrics if m.get('epoch', 0) < since]
+        if older:
+            self._recent[pod_id][:0] = older
+            self._epochs[pod_id][:0] = array.array('q', [int(m['epoch']) for m in older])
+        self._recent_since[pod_id] = cutoff_time
+        idx = bisect.bisect_left(self._epochs[pod_id], cutoff_time)
+        return self._recent[pod_id][idx:]
     
     def check_auto_stop_conditions_fast(self, pod_id: str) -> bool:
         """
@@ -331,12 +1028,44 @@ class DataTracker:
         if excluded_pods:
             if pod_id in excluded_pods:
                 return False
-            # Also check if pod name is in excluded list (need recent metric for name)
-            recent_metrics = self.get_recent_metrics(pod_id, 300)  # Last 5 minutes
-            if recent_metrics:
-                pod_name = recent_metrics[-1].get("name", "")
-                if pod_name in excluded_pods:
+            # Also check if pod name is in excluded list
+            name = self._pod_names.get(pod_id)
+            if name is None:
+                latest = self.data.get(pod_id)  # e.g. loaded via load_data
+                name = latest[-1].get("name", "") if latest else ""
+            if name in excluded_pods:
+                return False
+        
+        max_cpu = thresholds["max_cpu_percent"]
+        max_gpu = thresholds["max_gpu_percent"]
+        max_memory = thresholds["max_memory_percent"]
+        detect_no_change = thresholds.get("detect_no_change", False)
+        
+        # Vectorized path over the numpy columns when the window is in memory
+        cols = self._recent_columns(pod_id, thresholds["duration"])
+        if cols is not None:
+            if len(cols) < 3:
+                return False
+            
+            usage = _usage_block(cols)
+            if numba is not None:
+                threshold_met, no_change_detected = _auto_stop_scan(
+                    usage, cols['running'], float(max_cpu), float(max_gpu), float(max_memory),
+                    bool(detect_no_change))
+            else:
+                if not cols['running'].all():
                     return False
+                # One broadcast comparison per check over the (n, 3) usage block
+                threshold_met = bool((usage <= (max_cpu, max_gpu, max_memory)).all())
+                # The no-change scan only matters when that check is enabled
+                no_change_detected = detect_no_change and bool((usage == usage[0]).all())
+            
+            if no_change_detected:
+                print(f"Pod {pod_id}: No change detected in metrics over {thresholds['duration']}s - stopping")
+                return True
+            
+            return threshold_met
+        
         recent_metrics = self.get_recent_metrics(pod_id, thresholds["duration"])
         
         if not recent_metrics:
@@ -346,6 +1075,18 @@ class DataTracker:
         if len(recent_metrics) < 3:
             return False
         
+        if not detect_no_change:
+            # Common case: only the thresholds matter, so the first breach or
+            # non-RUNNING sample decides and no change tracking is needed
+            for metric in recent_metrics:
+                get = metric.get
+                if (get("status") != "RUNNING" or
+                        get("cpu_percent", 0) > max_cpu or
+                        get("gpu_percent", 0) > max_gpu or
+                        get("memory_percent", 0) > max_memory):
+                    return False
+            return True
+        
         # Check if all recent metrics are below or equal to thresholds
         threshold_met = True
         no_change_detected = True
@@ -356,26 +1097,30 @@ class DataTracker:
         first_memory = first_metric.get("memory_percent", 0)
         
         for metric in recent_metrics:
+            get = metric.get
             # Skip if pod is not running
-            if metric.get("status") != "RUNNING":
+            if get("status") != "RUNNING":
                 return False
             
-            cpu = metric.get("cpu_percent", 0)
-            gpu = metric.get("gpu_percent", 0)
-            memory = metric.get("memory_percent", 0)
+            cpu = get("cpu_percent", 0)
+            gpu = get("gpu_percent", 0)
+            memory = get("memory_percent", 0)
             
             # Check thresholds (≤ instead of <)
-            if (cpu > thresholds["max_cpu_percent"] or 
-                gpu > thresholds["max_gpu_percent"] or 
-                memory > thresholds["max_memory_percent"]):
+            if threshold_met and (cpu > max_cpu or gpu > max_gpu or memory > max_memory):
                 threshold_met = False
             
             # Check for any change in metrics
-            if (cpu != first_cpu or gpu != first_gpu or memory != first_memory):
+            if no_change_detected and (cpu != first_cpu or gpu != first_gpu or memory != first_memory):
                 no_change_detected = False
+            
+            # Both outcomes are settled to "don't stop"; a later non-RUNNING
+            # sample would also return False, so the rest can be skipped
+            if not threshold_met and not no_change_detected:
+                return False
         
-        # If detect_no_change is enabled and no change detected, stop the pod
-        if thresholds.get("detect_no_change", False) and no_change_detected:
+        # No change detected over the window, stop the pod
+        if no_change_detected:
             print(f"Pod {pod_id}: No change detected in metrics over {thresholds['duration']}s - stopping")
             return True
         
@@ -388,11 +1133,9 @@ class DataTracker:
         
         cutoff_time = time.time() - window_seconds
         
-        # Keep only recent data points
-        self.data[pod_id] = [
-            metric for metric in self.data[pod_id]
-            if metric.get("epoch", 0) >= cutoff_time
-        ]
+        # Keep only recent data points (list is in epoch order, drop the prefix in place)
+        metrics = self.data[pod_id]
+        del metrics[:_epoch_index(metrics, cutoff_time)]
     
     def get_metrics_change_rate(self, pod_id: str, duration_seconds: int) -> Dict:
         """Calculate the rate of change in metrics over time."""
@@ -421,6 +1164,18 @@ class DataTracker:
     
     def clear_pod_data(self, pod_id: str):
         """Clear all historical data for a pod (e.g., when pod is terminated)."""
+        self._recent.pop(pod_id, None)
+        self._epochs.pop(pod_id, None)
+        self._recent_since.pop(pod_id, None)
+        try:
+            self._close_ring(pod_id)
+        except OSError:
+            pass
+        self._pod_names.pop(pod_id, None)
+        self._pod_summaries.pop(pod_id, None)
+        self._list_summaries.pop(pod_id, None)
+        self._summary_dirty.discard(pod_id)
+        self._summary_version += 1
         if pod_id in self.data:
             del self.data[pod_id]
             # Note: With JSONL, we only remove from memory. 
@@ -438,6 +1193,9 @@ class DataTracker:
             print(f"Warning: Invalid retention config format, skipping cleanup")
             return
             
+        # Ring buffers follow the tracked pods rather than the retention window
+        self._sweep_rings()
+        
         if retention_config.get('unit') == 'forever':
             return  # Don't clean up anything (legacy support)
         
@@ -449,32 +1207,154 @@ class DataTracker:
         value = retention_config.get('value', 30)
         unit = retention_config.get('unit', 'days')
         
-        seconds_map = {
-            'hours': 3600,
-            'days': 24 * 3600,
-            'weeks': 7 * 24 * 3600,
-            'months': 30 * 24 * 3600,
-            'years': 365 * 24 * 3600
-        }
-        
-        if unit not in seconds_map:
+        if unit not in RETENTION_UNIT_SECONDS:
             print(f"Warning: Unknown retention unit '{unit}', defaulting to days")
             unit = 'days'
         
-        cutoff_time = time.time() - (value * seconds_map[unit])
+        cutoff_time = time.time() - (value * RETENTION_UNIT_SECONDS[unit])
         
-        for pod_id in list(self.data.keys()):
+        data = self.data
+        for pod_id, metrics in list(data.items()):
             # Filter out old metrics
-            self.data[pod_id] = [
-                metric for metric in self.data[pod_id]
-                if metric.get("epoch", 0) >= cutoff_time
-            ]
+            del metrics[:_epoch_index(metrics, cutoff_time)]
             
             # Remove pod entry if no metrics remain
-            if not self.data[pod_id]:
-                del self.data[pod_id]
+            if not metrics:
+                del data[pod_id]
+        
+        # Drop expired history on disk (self.data only holds the latest metric
+        # per pod, so rewriting from memory would lose history): whole daily
+        # shards are deleted without being read
+        self._rotate_metrics_file(time.time())
+        removed_files = 0
+        for path in metric_files.rolled_paths(self.metrics_file) + metric_files.shard_paths(self.metrics_file):
+            if metric_files.day_end(metric_files.shard_day(path)) > cutoff_time:
+                continue
+            try:
+                os.remove(path)
+                removed_files += 1
+            except OSError as e:
+                print(f"Warning: Could not remove {path}: {e}")
+        if removed_files:
+            print(f"🧹 Removed {removed_files} daily metrics files older than retention window")
+        
+        # Only the oldest remaining file can still hold expired rows. It is
+        # rewritten when retention is under a day or the file spans several
+        # days (one written before daily shards)
+        retention_seconds = value * RETENTION_UNIT_SECONDS[unit]
+        paths = metric_files.metric_file_paths(self.metrics_file)
+        if paths:
+            oldest = paths[0]
+            first_epoch, _ = metric_files.edge_epochs(oldest)
+            day = self._live_day if oldest == self.metrics_file else metric_files.shard_day(oldest)
+            if (first_epoch is not None and first_epoch < cutoff_time and
+                    (retention_seconds < RETENTION_UNIT_SECONDS['days'] or
+                     first_epoch < metric_files.day_start(day))):
+                removed = self.compact_metrics_file(cutoff_time, oldest)
+                if removed:
+                    print(f"🧹 Removed {removed} metrics older than retention window")
+        
+        # Roll closed shards up into compressed columnar snapshots. Skipped
+        # for sub-day retention, where a shard is compacted and then deleted
+        # within a day anyway
+        if retention_seconds >= RETENTION_UNIT_SECONDS['days']:
+            self.roll_up_shards()
+    
+    def _sweep_rings(self):
+        """Close and delete the ring buffers of pods that no longer have a summary entry."""
+        with self._rings_lock:
+            pod_ids = set(self._rings)
+        if self.ring_dir is not None and os.path.isdir(self.ring_dir):
+            pod_ids.update(name[:-len('.ring')] for name in os.listdir(self.ring_dir)
+                           if name.endswith('.ring'))
+        
+        removed = 0
+        for pod_id in pod_ids:
+            if pod_id in self.summaries_cache:
+                continue
+            try:
+                self._close_ring(pod_id)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Could not remove ring buffer for {pod_id}: {e}")
+                continue
+            removed += 1
+        if removed:
+            print(f"🧹 Removed {removed} ring buffers of pods no longer tracked")
+    
+    def roll_up_shards(self, fmt: Optional[str] = None) -> List[str]:
+        """
+        Convert every closed daily JSONL shard into a compressed snapshot of
+        the same day (see metric_files.roll_up_shard); the live file stays JSONL.
         
-        self.save_data()
+        Args:
+            fmt: Snapshot format (default: the most compact one available)
+            
+        Returns:
+            Paths of the snapshots written
+        """
+        rolled = []
+        for path in metric_files.shard_paths(self.metrics_file):
+            try:
+                rolled.append(metric_files.roll_up_shard(path, fmt))
+            except (OSError, ValueError, ImportError) as e:
+                print(f"Warning: Could not roll up {path}: {e}")
+        if rolled:
+            print(f"📦 Rolled {len(rolled)} daily metrics files into compressed snapshots")
+        return rolled
+    
+    def _hourly_averages(self, pod_id: str, cache: Dict) -> Tuple[float, float, float]:
+        """
+        Get (cpu, gpu, memory) averages over the last hour.
+        Reduces the in-memory structured array column by column when it covers
+        the hour, otherwise falls back to the cached running averages.
+        
+        Args:
+            pod_id: Pod identifier
+            cache: The pod's summaries_cache entry
+            
+        Returns:
+            Tuple of (avg_cpu, avg_gpu, avg_memory)
+        """
+        rows = self._recent_columns(pod_id, 3600)
+        if rows is None or not len(rows):
+            return cache.get('avg_cpu', 0), cache.get('avg_gpu', 0), cache.get('avg_memory', 0)
+        
+        # nanmean skips null readings; an all-null column averages to 0
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            means = [np.nanmean(rows[column]) for column in ('cpu', 'gpu', 'mem')]
+        avg_cpu, avg_gpu, avg_memory = (0.0 if np.isnan(m) else float(m) for m in means)
+        return avg_cpu, avg_gpu, avg_memory
+    
+    def _memoized_summary(self, memo: Dict[str, Dict], builder, pod_id: str, cache: Dict) -> Dict:
+        """
+        Return a copy of the memoized summary for a pod, rebuilding it first
+        if the pod received a metric since it was built.
+        
+        Args:
+            memo: _pod_summaries or _list_summaries
+            builder: Method that builds the summary from (pod_id, cache)
+            pod_id: Pod identifier
+            cache: The pod's summaries_cache entry
+            
+        Returns:
+            A copy of the summary that the caller may modify
+        """
+        return _copy_summary(self._summary_entry(memo, builder, pod_id, cache))
+    
+    def _summary_entry(self, memo: Dict[str, Dict], builder, pod_id: str, cache: Dict) -> Dict:
+        """Get the memoized summary itself (not a copy); see _memoized_summary."""
+        if pod_id in self._summary_dirty:
+            self._summary_dirty.discard(pod_id)
+            self._pod_summaries.pop(pod_id, None)
+            self._list_summaries.pop(pod_id, None)
+        
+        summary = memo.get(pod_id)
+        if summary is None:
+            summary = memo[pod_id] = builder(pod_id, cache)
+        return summary
     
     def get_pod_summary(self, pod_id: str) -> Optional[Dict]:
         """Get summary statistics for a pod from cache."""
@@ -485,13 +1365,14 @@ class DataTracker:
         cache = self.summaries_cache[pod_id]
         if not cache or not cache.get('latest_metric'):
             return None
-            
+        
+        return self._memoized_summary(self._pod_summaries, self._build_pod_summary, pod_id, cache)
+    
+    def _build_pod_summary(self, pod_id: str, cache: Dict) -> Dict:
+        """Build the get_pod_summary result for a pod."""
         recent_metric = cache['latest_metric']
         
-        # Use cached averages instead of recalculating
-        avg_cpu = cache.get('avg_cpu', 0)
-        avg_memory = cache.get('avg_memory', 0)
-        avg_gpu = cache.get('avg_gpu', 0)
+        avg_cpu, avg_gpu, avg_memory = self._hourly_averages(pod_id, cache)
         
         return {
             "pod_id": pod_id,
@@ -499,7 +1380,7 @@ class DataTracker:
             "status": recent_metric.get("status", "UNKNOWN"),
             "total_data_points": cache.get('total_metrics', 0),
             "first_seen": None,  # Would need to track this in cache
-            "last_seen": recent_metric.get("timestamp"),
+            "last_seen": metric_timestamp(recent_metric) or None,
             "current_metrics": {
                 "cpu_percent": recent_metric.get("cpu_percent", 0),
                 "gpu_percent": recent_metric.get("gpu_percent", 0),
@@ -515,40 +1396,49 @@ class DataTracker:
     
     def get_all_summaries(self) -> List[Dict]:
         """Get summaries for all tracked pods from cache."""
-        summaries = []
-        
-        # Use cached summaries instead of loading all data
-        for pod_id, cache in self.summaries_cache.items():
-            if cache and cache.get('latest_metric'):
-                latest = cache['latest_metric']
-                summary = {
-                    'pod_id': pod_id,
-                    'name': cache.get('name', 'Unknown'),
-                    'total_metrics': cache.get('total_metrics', 0),
-                    'total_data_points': cache.get('total_metrics', 0),  # For template compatibility
-                    'latest': {
-                        'timestamp': latest.get('timestamp', ''),
-                        'status': latest.get('status', 'UNKNOWN'),
-                        'uptime_seconds': latest.get('uptime_seconds', 0),
-                        'cost_per_hr': latest.get('cost_per_hr', 0),
-                        'cpu_percent': latest.get('cpu_percent', 0),
-                        'gpu_percent': latest.get('gpu_percent', 0),
-                        'memory_percent': latest.get('memory_percent', 0),
-                    },
-                    'averages': {
-                        'cpu_percent': round(cache.get('avg_cpu', 0), 2),
-                        'gpu_percent': round(cache.get('avg_gpu', 0), 2),
-                        'memory_percent': round(cache.get('avg_memory', 0), 2),
-                    },
-                    'hourly_averages': {  # Template expects this field
-                        'cpu_percent': round(cache.get('avg_cpu', 0), 2),
-                        'gpu_percent': round(cache.get('avg_gpu', 0), 2),
-                        'memory_percent': round(cache.get('avg_memory', 0), 2),
-                    }
-                }
-                summaries.append(summary)
-        
-        return summaries
+        mirror = self._summary_list
+        if (mirror is None or mirror[0] != self._summary_version or
+                mirror[1] != self.summaries_cache.keys()):
+            # Use cached summaries instead of loading all data
+            entries = []
+            for pod_id, cache in list(self.summaries_cache.items()):
+                if cache and cache.get('latest_metric'):
+                    entries.append(self._summary_entry(self._list_summaries, self._build_list_summary,
+                                                       pod_id, cache))
+            mirror = self._summary_list = (self._summary_version, set(self.summaries_cache), entries)
+        
+        # Callers edit the returned summaries, so hand out copies
+        return [_copy_summary(summary) for summary in mirror[2]]
+    
+    def _build_list_summary(self, pod_id: str, cache: Dict) -> Dict:
+        """Build one get_all_summaries entry for a pod."""
+        latest = cache['latest_metric']
+        hourly_cpu, hourly_gpu, hourly_memory = self._hourly_averages(pod_id, cache)
+        return {
+            'pod_id': pod_id,
+            'name': cache.get('name', 'Unknown'),
+            'total_metrics': cache.get('total_metrics', 0),
+            'total_data_points': cache.get('total_metrics', 0),  # For template compatibility
+            'latest': {
+                'timestamp': metric_timestamp(latest),
+                'status': latest.get('status', 'UNKNOWN'),
+                'uptime_seconds': latest.get('uptime_seconds', 0),
+                'cost_per_hr': latest.get('cost_per_hr', 0),
+                'cpu_percent': latest.get('cpu_percent', 0),
+                'gpu_percent': latest.get('gpu_percent', 0),
+                'memory_percent': latest.get('memory_percent', 0),
+            },
+            'averages': {
+                'cpu_percent': round(cache.get('avg_cpu', 0), 2),
+                'gpu_percent': round(cache.get('avg_gpu', 0), 2),
+                'memory_percent': round(cache.get('avg_memory', 0), 2),
+            },
+            'hourly_averages': {  # Template expects this field
+                'cpu_percent': round(hourly_cpu, 2),
+                'gpu_percent': round(hourly_gpu, 2),
+                'memory_percent': round(hourly_memory, 2),
+            }
+        }
     
     def get_filtered_metrics(self, pod_id: Optional[str] = None, 
                            start_time: Optional[int] = None, 
@@ -575,24 +1465,20 @@ class DataTracker:
         # Determine which pods to process
         pod_ids = [pod_id] if pod_id else list(self.data.keys())
         
+        data = self.data
+        
         for pid in pod_ids:
-            if pid not in self.data:
+            metrics = data.get(pid)
+            if metrics is None:
                 continue
-                
-            filtered_metrics = []
-            for metric in self.data[pid]:
-                metric_time = metric.get("epoch", 0)
-                
-                # Apply time filters
-                if start_time is not None and metric_time < start_time:
-                    continue
-                if end_time is not None and metric_time > end_time:
-                    continue
-                    
-                filtered_metrics.append(metric)
             
-            if filtered_metrics:
-                result[pid] = filtered_metrics
+            # Lists are in epoch order: binary-search both bounds and slice,
+            # so the cost follows the size of the result, not the history
+            lo = _epoch_index(metrics, start_time) if start_time is not None else 0
+            hi = _epoch_index(metrics, end_time, right=True) if end_time is not None else len(metrics)
+            
+            if lo < hi:
+                result[pid] = metrics[lo:hi]
         
         return result
     
@@ -600,7 +1486,8 @@ class DataTracker:
                    pod_id: Optional[str] = None,
                    start_time: Optional[int] = None,
                    end_time: Optional[int] = None,
-                   duration_seconds: Optional[int] = None) -> str:
+                   duration_seconds: Optional[int] = None,
+                   out: Optional[Union[str, IO[str]]] = None) -> Optional[str]:
         """
         Export data in various formats.
         
@@ -610,9 +1497,12 @@ class DataTracker:
             start_time: Unix timestamp start
             end_time: Unix timestamp end
             duration_seconds: Last N seconds of data
+            out: File path or text handle to stream the export into. Without
+                it the whole export is built in memory and returned, which is
+                only suitable for small exports
             
         Returns:
-            Formatted data as string
+            Formatted data as string, or None when written to out
         """
         filtered_data = self.get_filtered_metrics(
             pod_id=pod_id,
@@ -621,46 +1511,92 @@ class DataTracker:
             duration_seconds=duration_seconds
         )
         
-        if format_type.lower() == 'csv':
-            return self._export_csv(filtered_data)
-        elif format_type.lower() == 'json':
+        fmt = format_type.lower()
+        if fmt not in ('csv', 'json'):
+            raise ValueError(f"Unsupported export format: {format_type}")
+        
+        if out is None:
+            if fmt == 'csv':
+                output = io.StringIO()
+                self._export_csv(filtered_data, output)
+                return output.getvalue()
             return json.dumps(filtered_data, indent=2)
+        
+        if isinstance(out, str):
+            with open(out, 'w', newline='', buffering=1 << 20) as f:
+                self._write_export(fmt, filtered_data, f)
         else:
-            raise ValueError(f"Unsupported export format: {format_type}")
+            self._write_export(fmt, filtered_data, out)
+        return None
     
-    def _export_csv(self, data: Dict[str, List[Dict]]) -> str:
-        """Convert metrics data to CSV format."""
-        output = io.StringIO()
-        writer = csv.writer(output)
+    def _write_export(self, format_type: str, data: Dict[str, List[Dict]], out: IO[str]):
+        """Write an export in the given format to a text handle."""
+        if format_type == 'csv':
+            self._export_csv(data, out)
+        else:
+            # Stdlib json, not orjson: exports keep its \uXXXX escapes and
+            # Infinity/NaN values
+            json.dump(data, out, indent=2)
+    
+    def _export_csv(self, data: Dict[str, List[Dict]], out: IO[str]):
+        """Write metrics data as CSV rows to a text handle."""
+        out.write(_CSV_HEADER)
+        for pod_id, metrics in data.items():
+            out.write(_csv_text(metrics, pod_id))
+    
+    def iter_export_csv(self, pod_id: Optional[str] = None,
+                        start_time: Optional[int] = None,
+                        end_time: Optional[int] = None,
+                        duration_seconds: Optional[int] = None,
+                        chunk_rows: int = 1000) -> Iterator[str]:
+        """
+        Export data as CSV in chunks, e.g. to stream an HTTP response without
+        holding the whole export in memory.
         
-        # Write header
-        header = [
-            'timestamp', 'epoch', 'pod_id', 'name', 'status', 'cost_per_hr',
-            'uptime_seconds', 'cpu_percent', 'memory_percent', 'gpu_percent',
-            'gpu_memory_percent', 'gpu_count'
-        ]
-        writer.writerow(header)
+        Args:
+            pod_id: Specific pod ID (None for all)
+            start_time: Unix timestamp start
+            end_time: Unix timestamp end
+            duration_seconds: Last N seconds of data
+            chunk_rows: Rows per yielded chunk
+            
+        Yields:
+            CSV text: the header, then up to chunk_rows rows at a time
+        """
+        filtered_data = self.get_filtered_metrics(
+            pod_id=pod_id,
+            start_time=start_time,
+            end_time=end_time,
+            duration_seconds=duration_seconds
+        )
         
-        # Write data rows
-        for pod_id, metrics in data.items():
-            for metric in metrics:
-                row = [
-                    metric.get('timestamp', ''),
-                    metric.get('epoch', 0),
-                    metric.get('pod_id', pod_id),
-                    metric.get('name', ''),
-                    metric.get('status', ''),
-                    metric.get('cost_per_hr', 0),
-                    metric.get('uptime_seconds', 0),
-                    metric.get('cpu_percent', 0),
-                    metric.get('memory_percent', 0),
-                    metric.get('gpu_percent', 0),
-                    metric.get('gpu_memory_percent', 0),
-                    metric.get('gpu_count', 0)
-                ]
-                writer.writerow(row)
-        
-        return output.getvalue()
+        yield _CSV_HEADER
+        for pod_id, metrics in filtered_data.items():
+            for i in range(0, len(metrics), chunk_rows):
+                yield _csv_text(metrics[i:i + chunk_rows], pod_id)
+    
+    def export_snapshot(self, path: str, start_time: Optional[float] = None,
+                        fmt: Optional[str] = None) -> str:
+        """
+        Write the stored metric history to a compressed snapshot
+        (see runpod_monitor.snapshot).
+        
+        Args:
+            path: Destination path without extension
+            start_time: Only include metrics with epoch >= start_time
+            fmt: Snapshot format ('npz', 'msgpack' or 'jsonl.gz'); defaults to
+                the most compact one available
+            
+        Returns:
+            The path written
+        """
+        self._flush_metric_writer()
+        
+        metrics_by_pod: Dict[str, List[Dict]] = {}
+        for metric in metric_files.iter_metrics(self.metrics_file, since=start_time):
+            metrics_by_pod.setdefault(metric.get('pod_id'), []).append(metric)
+        
+        return snapshot.write_snapshot(metrics_by_pod, path, fmt)
     
     def get_retention_info(self, retention_config: Dict) -> Dict:
         """Get human-readable retention information."""
@@ -677,32 +1613,16 @@ class DataTracker:
         value = retention_config.get('value', 0)
         unit = retention_config.get('unit', 'forever')
         
-        if unit == 'forever':
+        # 'forever' and very long retention (999 years = effectively forever)
+        if unit == 'forever' or (unit == 'years' and value >= 999):
             return {
                 'value': 999,
                 'unit': 'years',
                 'display': '999 years',
-                'seconds': 999 * 365 * 24 * 3600
+                'seconds': FOREVER_RETENTION_SECONDS
             }
         
-        # Handle very long retention (999 years = effectively forever)
-        if unit == 'years' and value >= 999:
-            return {
-                'value': 999,
-                'unit': 'years',
-                'display': '999 years',
-                'seconds': 999 * 365 * 24 * 3600
-            }
-        
-        seconds_map = {
-            'hours': 3600,
-            'days': 24 * 3600,
-            'weeks': 7 * 24 * 3600,
-            'months': 30 * 24 * 3600,
-            'years': 365 * 24 * 3600
-        }
-        
-        seconds = value * seconds_map.get(unit, 24 * 3600)
+        seconds = value * RETENTION_UNIT_SECONDS.get(unit, RETENTION_UNIT_SECONDS['days'])
         
         return {
             'value': value,
@@ -0,0 +1,136 @@
+"""
+JSON/JSONL helpers for the metric storage hot paths.
+Uses orjson when it is installed and falls back to the stdlib json module.
+Encoders return compact UTF-8 bytes, so files should be opened in binary mode.
+"""
+
+import json
+import mmap
+import os
+from typing import Any, BinaryIO, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        """Serialize obj to compact JSON bytes."""
+        return orjson.dumps(obj)
+
+    def dumps_line(obj: Any) -> bytes:
+        """Serialize obj to compact JSON bytes terminated by a newline (one JSONL line)."""
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+
+    def dumps_pretty(obj: Any) -> str:
+        """Serialize obj to a human-readable JSON string indented by 2 spaces."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+    loads = orjson.loads
+else:
+    # json.dumps builds a new encoder on every call when given separators;
+    # one shared compact encoder skips that
+    _compact_encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize obj to compact JSON bytes."""
+        return _compact_encoder.encode(obj).encode()
+
+    def dumps_line(obj: Any) -> bytes:
+        """Serialize obj to compact JSON bytes terminated by a newline (one JSONL line)."""
+        # Kept as one buffer so callers can append it with a single write()
+        return (_compact_encoder.encode(obj) + '\n').encode()
+
+    def dumps_pretty(obj: Any) -> str:
+        """Serialize obj to a human-readable JSON string indented by 2 spaces."""
+        return json.dumps(obj, indent=2)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """Parse JSON from bytes or str."""
+        return json.loads(data)
+
+
+def load_file(path: str) -> Any:
+    """
+    Parse a whole JSON file. With orjson the file is memory-mapped and parsed
+    in place, so the contents are never copied into a Python bytes object.
+    
+    Args:
+        path: JSON file path
+        
+    Returns:
+        The parsed object
+    """
+    with open(path, 'rb') as f:
+        if orjson is None or not os.fstat(f.fileno()).st_size:
+            return loads(f.read())  # mmap can't map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return orjson.loads(view)
+            finally:
+                view.release()  # The map can't close while a view is exported
+
+
+def dump_atomic(obj: Any, path: str, pretty: bool = False) -> None:
+    """
+    Write obj as JSON to path via a temp file and os.replace, so a crash
+    mid-write never leaves a truncated file behind.
+    
+    Args:
+        obj: Object to serialize
+        path: Destination file path
+        pretty: Indent the output (for debugging; compact output is about
+            half the size and faster to write)
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps_pretty(obj).encode() if pretty else dumps(obj))
+    os.replace(tmp_path, path)
+
+
+def seek_to_epoch(f: BinaryIO, cutoff: float) -> int:
+    """
+    Position a binary JSONL file at the first line whose 'epoch' is >= cutoff.
+    Binary-searches byte offsets, re-aligning each probe to the next line
+    start, so only O(log file_size) lines are parsed. The file must be in
+    epoch order across all rows (see metric_files, which keeps it that way);
+    rows before the first probe that passes the cutoff are never read, so
+    callers should search a little before the cutoff and filter what they read.
+    If a probe can't be resolved (very long or unparseable line) the search
+    stops early and leaves the file at the last known-safe line start.
+    
+    Args:
+        f: File opened in 'rb' mode
+        cutoff: Unix timestamp to search for
+        
+    Returns:
+        The byte offset the file was positioned at
+    """
+    lo, hi = 0, os.fstat(f.fileno()).st_size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid:
+            f.seek(mid - 1)
+            f.readline()  # Skip to the first line starting at or after mid
+        else:
+            f.seek(0)
+        pos = f.tell()
+        if pos >= hi:
+            break  # No line starts in [mid, hi); scan linearly from lo
+        
+        line = f.readline()
+        try:
+            epoch = loads(line).get('epoch', 0)
+        except ValueError:
+            break
+        
+        if epoch >= cutoff:
+            hi = pos
+        else:
+            lo = pos + len(line)
+    
+    f.seek(lo)
+    return lo
@@ -3,11 +3,194 @@ Hook functions for the event-based metric writer.
 These can be registered with MetricWriter to extend functionality.
 """
 
-import json
+import atexit
+import contextlib
+import functools
+import heapq
+import mmap
 import os
+import queue
+import threading
 import time
-from datetime import datetime
-from typing import Dict, Any, Optional
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import fast_json, metric_files
+
+# O_APPEND descriptors kept open by the fan-out hooks, keyed by path. Each
+# line goes out in one os.write(), which POSIX keeps whole (no interleaving
+# with other appenders) for records up to PIPE_BUF bytes.
+_fd_cache: Dict[str, int] = {}
+_fd_lock = threading.Lock()
+_daily_file: Optional[str] = None  # Path daily_rotation_hook last wrote to
+_daily_key: Optional[Tuple[str, float]] = None  # (main file, end of its day) _daily_file is valid for
+
+
+def _write_line(path: str, line: bytes) -> None:
+    """Append a serialized line to path with a single write() on a cached descriptor."""
+    with _fd_lock:
+        fd = _fd_cache.get(path)
+        if fd is None:
+            fd = _fd_cache[path] = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        except OSError:
+            del _fd_cache[path]
+            os.close(fd)
+            raise
+
+
+def _close_fh(path: str) -> None:
+    """Close the cached descriptor for path, if one is open."""
+    with _fd_lock:
+        fd = _fd_cache.pop(path, None)
+    if fd is not None:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def _fsync_dir(path: str) -> None:
+    """fsync a directory so a rename inside it survives a crash (no-op where unsupported)."""
+    try:
+        fd = os.open(path or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _close_all() -> None:
+    """Close every cached hook descriptor."""
+    for path in list(_fd_cache):
+        _close_fh(path)
+
+
+# Post-write hooks that do file I/O run on one background thread fed through
+# this bounded queue, so write_metric only pays for the put(). Items are
+# (func, metric_point, file_path, line) and run in order; line is the row
+# MetricWriter already serialized, passed only to hooks that take it. When the queue stays full
+# for HOOK_QUEUE_TIMEOUT_SECONDS the hook runs in the caller instead.
+HOOK_QUEUE_SIZE = 10000
+HOOK_QUEUE_TIMEOUT_SECONDS = 1.0
+_hook_q: queue.Queue = queue.Queue(maxsize=HOOK_QUEUE_SIZE)
+_hook_thread: Optional[threading.Thread] = None
+_hook_thread_lock = threading.Lock()
+
+
+def _hook_loop() -> None:
+    """Background hook thread: run queued hooks in order."""
+    while True:
+        func, metric_point, file_path, line = _hook_q.get()
+        try:
+            if line is None:
+                func(metric_point, file_path)
+            else:
+                func(metric_point, file_path, line=line)
+        except Exception as e:
+            print(f"❌ Error in background hook {func.__name__}: {e}")
+        finally:
+            _hook_q.task_done()
+
+
+def _in_background(func: Callable[[Dict[str, Any], str], None]) -> Callable[[Dict[str, Any], str], None]:
+    """Decorator: queue calls to a post-write hook for the background hook thread."""
+    # The wrapper copies func's signature, so MetricWriter only passes line=
+    # to wrappers of hooks that accept it
+    @functools.wraps(func)
+    def enqueue(metric_point: Dict[str, Any], file_path: str, line: Optional[bytes] = None) -> None:
+        global _hook_thread
+        if _hook_thread is None:
+            with _hook_thread_lock:
+                if _hook_thread is None:
+                    _hook_thread = threading.Thread(target=_hook_loop, name="metric-hooks", daemon=True)
+                    _hook_thread.start()
+        try:
+            _hook_q.put((func, metric_point, file_path, line), timeout=HOOK_QUEUE_TIMEOUT_SECONDS)
+        except queue.Full:
+            if line is None:
+                func(metric_point, file_path)
+            else:
+                func(metric_point, file_path, line=line)
+    return enqueue
+
+
+def wait_for_hooks() -> None:
+    """Block until every queued background hook has run."""
+    if _hook_thread is not None:
+        _hook_q.join()
+
+
+# auto_compact_hook checks the file size on the first write and then once
+# per this many writes
+COMPACT_CHECK_EVERY = 500
+_compact_check_count = 0
+
+# Fields validate_metric_hook requires, in the order they are reported
+_REQUIRED_FIELDS = ('pod_id', 'timestamp', 'epoch')
+_REQUIRED_FIELD_SET = frozenset(_REQUIRED_FIELDS)
+
+# (field, threshold, label) rules checked by alert_threshold_hook
+_ALERT_RULES = (
+    ('cpu_percent', 90, 'CPU'),
+    ('memory_percent', 90, 'Memory'),
+)
+
+# Running statistics kept in memory by statistics_hook, keyed by stats file
+# path, and written out at most every STATS_FLUSH_INTERVAL_SECONDS
+STATS_FLUSH_INTERVAL_SECONDS = 30.0
+_STATS_KEYS = ('cpu', 'memory', 'gpu')
+_stats_cache: Dict[str, Dict[str, '_PodStats']] = {}
+_stats_dirty = set()
+_stats_lock = threading.RLock()
+_stats_timer: Optional[threading.Timer] = None
+
+
+class _PodStats:
+    """
+    Running statistics for one pod. Slotted: there is one per pod for the
+    life of the process, and attribute access is cheaper than dict lookups.
+    """
+    
+    __slots__ = ('count', 'avg_cpu', 'avg_memory', 'avg_gpu',
+                 'max_cpu', 'max_memory', 'max_gpu', 'last_seen')
+    
+    def __init__(self):
+        self.count = 0
+        self.avg_cpu = self.avg_memory = self.avg_gpu = 0.0
+        self.max_cpu = self.max_memory = self.max_gpu = 0
+        self.last_seen = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> '_PodStats':
+        """Build from a statistics.json entry, turning older running totals into means."""
+        stats = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(stats, name, data[name])
+        for key in _STATS_KEYS:
+            total = data.get(f'total_{key}')
+            if total is not None:
+                setattr(stats, f'avg_{key}', total / stats.count if stats.count else 0)
+        return stats
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """statistics.json entry, with the means rounded."""
+        return {
+            'count': self.count,
+            'avg_cpu': round(self.avg_cpu, 2),
+            'avg_memory': round(self.avg_memory, 2),
+            'avg_gpu': round(self.avg_gpu, 2),
+            'max_cpu': self.max_cpu,
+            'max_memory': self.max_memory,
+            'max_gpu': self.max_gpu,
+            'last_seen': self.last_seen,
+        }
 
 
 # ============================================================================
@@ -79,7 +262,7 @@ def initialize_pod_metrics_manager_hook() -> None:
     
     # Initialize from main JSONL file if it exists
     main_jsonl = './data/pod_metrics.jsonl'
-    if os.path.exists(main_jsonl):
+    if metric_files.metric_file_paths(main_jsonl) or metric_files.rolled_paths(main_jsonl):
         pod_counts = _pod_metrics_manager.initialize_from_main_jsonl(main_jsonl)
         
         # Skip startup compaction by default - it's too slow
@@ -112,10 +295,10 @@ def validate_metric_hook(metric_point: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         The metric if valid, raises exception if invalid
     """
-    required_fields = ['pod_id', 'timestamp', 'epoch']
-    for field in required_fields:
-        if field not in metric_point:
-            raise ValueError(f"Metric missing required field: {field}")
+    # One set difference against the key view; report the first missing field
+    if not _REQUIRED_FIELD_SET <= metric_point.keys():
+        field = next(field for field in _REQUIRED_FIELDS if field not in metric_point)
+        raise ValueError(f"Metric missing required field: {field}")
     return metric_point
 
 
@@ -144,11 +327,22 @@ def round_numbers_hook(metric_point: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Metric with rounded numbers
     """
-    numeric_fields = ['cpu_percent', 'memory_percent', 'gpu_percent', 'gpu_memory_percent']
-    for field in numeric_fields:
-        if field in metric_point and isinstance(metric_point[field], (int, float)):
-            metric_point[field] = round(metric_point[field], 2)
-    return metric_point
+    # Unrolled: this runs before every write. Only floats need rounding
+    # (round() leaves ints unchanged).
+    mp = metric_point
+    v = mp.get('cpu_percent')
+    if type(v) is float:
+        mp['cpu_percent'] = round(v, 2)
+    v = mp.get('memory_percent')
+    if type(v) is float:
+        mp['memory_percent'] = round(v, 2)
+    v = mp.get('gpu_percent')
+    if type(v) is float:
+        mp['gpu_percent'] = round(v, 2)
+    v = mp.get('gpu_memory_percent')
+    if type(v) is float:
+        mp['gpu_memory_percent'] = round(v, 2)
+    return mp
 
 
 # ============================================================================
@@ -212,7 +406,8 @@ def write_to_pod_folder_hook(metric_point: Dict[str, Any], file_path: str) -> No
             raw_file = _pod_metrics_manager.get_metrics_file_path(pod_id, "raw")
             if raw_file.exists():
                 # Count lines efficiently
-                line_count = sum(1 for _ in open(raw_file))
+                with open(raw_file, 'rb') as f:
+                    line_count = sum(1 for _ in f)
                 
                 # Compact every 30 metrics (using modulo)
                 if line_count > 0 and line_count % 30 == 0:
@@ -223,89 +418,136 @@ def write_to_pod_folder_hook(metric_point: Dict[str, Any], file_path: str) -> No
                         print(f"   ✅ Created {windows_30} 30-min and {windows_60} 60-min windows")
 
 
-def auto_compact_hook(metric_point: Dict[str, Any], file_path: str) -> None:
+def auto_compact_hook(metric_point: Dict[str, Any], file_path: str, writer: Optional[Any] = None) -> None:
     """
     Compact the JSONL file if it exceeds a size threshold.
     Keeps only the most recent data for each pod.
     
+    Runs synchronously: while the file is rewritten, the MetricWriter is
+    paused (its buffered rows written out first and other writes held off),
+    so no row lands in the old file between the read and the swap.
+    
     Args:
         metric_point: The metric that was just written
         file_path: Path to the JSONL file
+        writer: The MetricWriter that wrote the metric (passed by MetricWriter)
     """
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     
-    if os.path.exists(file_path) and os.path.getsize(file_path) > MAX_FILE_SIZE:
-        print(f"📦 Auto-compacting {file_path} (size > {MAX_FILE_SIZE/1024/1024}MB)...")
-        
-        # Read all metrics
-        metrics_by_pod = {}
-        with open(file_path, 'r') as f:
-            for line in f:
-                if line.strip():
-                    metric = json.loads(line)
-                    pod_id = metric.get('pod_id')
-                    if pod_id:
-                        if pod_id not in metrics_by_pod:
-                            metrics_by_pod[pod_id] = []
-                        metrics_by_pod[pod_id].append(metric)
-        
-        # Keep only last 1000 metrics per pod
-        MAX_METRICS_PER_POD = 1000
-        compacted_count = 0
-        
-        with open(file_path + '.tmp', 'w') as f:
-            for pod_id, metrics in metrics_by_pod.items():
-                # Keep only the most recent metrics
-                recent_metrics = metrics[-MAX_METRICS_PER_POD:]
-                compacted_count += len(metrics) - len(recent_metrics)
+    # Stat the file on the first write, so a file that is already too large
+    # is compacted right away, then once every COMPACT_CHECK_EVERY writes
+    global _compact_check_count
+    count = _compact_check_count
+    _compact_check_count += 1
+    if count % COMPACT_CHECK_EVERY:
+        return
+    try:
+        file_size = os.stat(file_path).st_size
+    except OSError:
+        return
+    
+    if file_size > MAX_FILE_SIZE:
+        with writer.paused() if writer is not None else contextlib.nullcontext():
+            print(f"📦 Auto-compacting {file_path} (size > {MAX_FILE_SIZE/1024/1024}MB)...")
+            
+            # Keep only the last 1000 lines per pod in bounded deques, as byte
+            # ranges into a read-only map of the file, so nothing is copied out
+            # or re-serialized and memory stays O(pods x 1000) however large the
+            # file is. Ranges are in file order, which heapq.merge relies on.
+            MAX_METRICS_PER_POD = 1000
+            lines_by_pod = defaultdict(lambda: deque(maxlen=MAX_METRICS_PER_POD))
+            pod_counts = {}
+            with open(file_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                find = mm.find
+                size = len(mm)
+                pos = 0
+                while pos < size:
+                    end = find(b'\n', pos)
+                    if end == -1:
+                        end = size
+                    if end > pos:
+                        line = mm[pos:end]
+                        if line.strip():
+                            pod_id = fast_json.loads(line).get('pod_id')
+                            if pod_id:
+                                lines_by_pod[pod_id].append((pos, end))
+                                pod_counts[pod_id] = pod_counts.get(pod_id, 0) + 1
+                    pos = end + 1
                 
-                for metric in recent_metrics:
-                    f.write(json.dumps(metric) + '\n')
-        
-        # Replace original file
-        os.replace(file_path + '.tmp', file_path)
-        print(f"✅ Compacted {compacted_count} old metrics")
-
-
-def separate_by_pod_hook(metric_point: Dict[str, Any], file_path: str) -> None:
+                compacted_count = sum(max(0, count - MAX_METRICS_PER_POD) for count in pod_counts.values())
+                
+                # Merge the per-pod runs back by offset, preserving file (epoch)
+                # order so readers can still binary-search the file by epoch
+                # (1MB buffer so the kept lines go out in large writes, synced
+                # before the rename so a crash can't swap in a partial file)
+                with open(file_path + '.tmp', 'wb', buffering=1 << 20) as out:
+                    for start, end in heapq.merge(*lines_by_pod.values()):
+                        out.write(mm[start:end + 1])
+                        if end == size:
+                            out.write(b'\n')  # Last line of the file had no newline
+                    out.flush()
+                    os.fsync(out.fileno())
+            
+            # Replace original file, then sync the directory so the rename sticks
+            os.replace(file_path + '.tmp', file_path)
+            _fsync_dir(os.path.dirname(file_path))
+            print(f"✅ Compacted {compacted_count} old metrics")
+
+
+@_in_background
+def separate_by_pod_hook(metric_point: Dict[str, Any], file_path: str, line: Optional[bytes] = None) -> None:
     """
     Also write metrics to separate pod-specific files.
     
     Args:
         metric_point: The metric that was just written
         file_path: Path to the main JSONL file
+        line: The row as MetricWriter serialized it (serialized here if None)
     """
     pod_id = metric_point.get('pod_id')
     if not pod_id:
         return
     
-    # Create pod-specific directory
+    # Create pod-specific directory (only needed before the descriptor is opened)
     base_dir = os.path.dirname(file_path)
     pod_dir = os.path.join(base_dir, 'pods', pod_id)
-    os.makedirs(pod_dir, exist_ok=True)
+    pod_file = os.path.join(pod_dir, 'metrics.jsonl')
+    if pod_file not in _fd_cache:
+        os.makedirs(pod_dir, exist_ok=True)
     
     # Write to pod-specific file
-    pod_file = os.path.join(pod_dir, 'metrics.jsonl')
-    with open(pod_file, 'a') as f:
-        f.write(json.dumps(metric_point) + '\n')
+    _write_line(pod_file, line if line is not None else fast_json.dumps_line(metric_point))
 
 
-def daily_rotation_hook(metric_point: Dict[str, Any], file_path: str) -> None:
+@_in_background
+def daily_rotation_hook(metric_point: Dict[str, Any], file_path: str, line: Optional[bytes] = None) -> None:
     """
     Rotate files daily by creating date-stamped files.
     
     Args:
         metric_point: The metric that was just written
         file_path: Path to the main JSONL file
+        line: The row as MetricWriter serialized it (serialized here if None)
     """
-    # Create daily file
-    base_dir = os.path.dirname(file_path)
-    date_str = datetime.now().strftime('%Y-%m-%d')
-    daily_file = os.path.join(base_dir, f'pod_metrics_{date_str}.jsonl')
+    # The daily file path is cached until local midnight (or a different
+    # main file), so strftime only runs once a day
+    global _daily_file, _daily_key
+    now = time.time()
+    if _daily_key is None or now >= _daily_key[1] or file_path != _daily_key[0]:
+        date_str = metric_files.day_of(now)
+        daily_file = os.path.join(os.path.dirname(file_path), f'pod_metrics_{date_str}.jsonl')
+        
+        # Close the previous day's descriptor once the date rolls over
+        if _daily_file is not None and _daily_file != daily_file:
+            _close_fh(_daily_file)
+        _daily_file = daily_file
+        _daily_key = (file_path, metric_files.day_end(date_str))
     
     # Also write to daily file
-    with open(daily_file, 'a') as f:
-        f.write(json.dumps(metric_point) + '\n')
+    _write_line(_daily_file, line if line is not None else fast_json.dumps_line(metric_point))
 
 
 def alert_threshold_hook(metric_point: Dict[str, Any], file_path: str) -> None:
@@ -317,19 +559,14 @@ def alert_threshold_hook(metric_point: Dict[str, Any], file_path: str) -> None:
         metric_point: The metric that was just written
         file_path: Path to the JSONL file
     """
-    # Check CPU threshold
-    cpu_percent = metric_point.get('cpu_percent', 0)
-    if cpu_percent > 90:
-        pod_name = metric_point.get('name', metric_point.get('pod_id', 'Unknown'))
-        print(f"🚨 ALERT: High CPU ({cpu_percent}%) on pod {pod_name}")
-    
-    # Check memory threshold
-    memory_percent = metric_point.get('memory_percent', 0)
-    if memory_percent > 90:
-        pod_name = metric_point.get('name', metric_point.get('pod_id', 'Unknown'))
-        print(f"🚨 ALERT: High Memory ({memory_percent}%) on pod {pod_name}")
+    for field, threshold, label in _ALERT_RULES:
+        value = metric_point.get(field, 0)
+        if value > threshold:
+            pod_name = metric_point.get('name', metric_point.get('pod_id', 'Unknown'))
+            print(f"🚨 ALERT: High {label} ({value}%) on pod {pod_name}")
 
 
+@_in_background
 def statistics_hook(metric_point: Dict[str, Any], file_path: str) -> None:
     """
     Maintain running statistics in a separate file.
@@ -341,48 +578,69 @@ def statistics_hook(metric_point: Dict[str, Any], file_path: str) -> None:
     base_dir = os.path.dirname(file_path)
     stats_file = os.path.join(base_dir, 'statistics.json')
     
-    # Load existing stats or create new
-    stats = {}
-    if os.path.exists(stats_file):
-        try:
-            with open(stats_file, 'r') as f:
-                stats = json.load(f)
-        except:
+    with _stats_lock:
+        # Load existing stats once per file, then update them in memory
+        stats = _stats_cache.get(stats_file)
+        if stats is None:
             stats = {}
-    
-    # Update stats for this pod
-    pod_id = metric_point.get('pod_id', 'unknown')
-    if pod_id not in stats:
-        stats[pod_id] = {
-            'count': 0,
-            'total_cpu': 0,
-            'total_memory': 0,
-            'total_gpu': 0,
-            'max_cpu': 0,
-            'max_memory': 0,
-            'max_gpu': 0,
-            'last_seen': None
-        }
-    
-    pod_stats = stats[pod_id]
-    pod_stats['count'] += 1
-    pod_stats['total_cpu'] += metric_point.get('cpu_percent', 0)
-    pod_stats['total_memory'] += metric_point.get('memory_percent', 0)
-    pod_stats['total_gpu'] += metric_point.get('gpu_percent', 0)
-    pod_stats['max_cpu'] = max(pod_stats['max_cpu'], metric_point.get('cpu_percent', 0))
-    pod_stats['max_memory'] = max(pod_stats['max_memory'], metric_point.get('memory_percent', 0))
-    pod_stats['max_gpu'] = max(pod_stats['max_gpu'], metric_point.get('gpu_percent', 0))
-    pod_stats['last_seen'] = metric_point.get('timestamp')
-    
-    # Calculate averages
-    if pod_stats['count'] > 0:
-        pod_stats['avg_cpu'] = round(pod_stats['total_cpu'] / pod_stats['count'], 2)
-        pod_stats['avg_memory'] = round(pod_stats['total_memory'] / pod_stats['count'], 2)
-        pod_stats['avg_gpu'] = round(pod_stats['total_gpu'] / pod_stats['count'], 2)
-    
-    # Save updated stats
-    with open(stats_file, 'w') as f:
-        json.dump(stats, f, indent=2)
+            if os.path.exists(stats_file):
+                try:
+                    stats = {pod_id: _PodStats.from_dict(data)
+                             for pod_id, data in fast_json.load_file(stats_file).items()}
+                except:
+                    stats = {}
+            _stats_cache[stats_file] = stats
+        
+        # Update stats for this pod
+        pod_id = metric_point.get('pod_id', 'unknown')
+        pod_stats = stats.get(pod_id)
+        if pod_stats is None:
+            pod_stats = stats[pod_id] = _PodStats()
+        
+        pod_stats.count += 1
+        n = pod_stats.count
+        cpu = metric_point.get('cpu_percent', 0)
+        memory = metric_point.get('memory_percent', 0)
+        gpu = metric_point.get('gpu_percent', 0)
+        
+        # Incremental (Welford) running means: no growing totals to lose
+        # precision; rounded only when written out
+        pod_stats.avg_cpu += (cpu - pod_stats.avg_cpu) / n
+        pod_stats.avg_memory += (memory - pod_stats.avg_memory) / n
+        pod_stats.avg_gpu += (gpu - pod_stats.avg_gpu) / n
+        pod_stats.max_cpu = max(pod_stats.max_cpu, cpu)
+        pod_stats.max_memory = max(pod_stats.max_memory, memory)
+        pod_stats.max_gpu = max(pod_stats.max_gpu, gpu)
+        pod_stats.last_seen = metric_point.get('timestamp')
+        
+        # Saved by the flush timer (and at exit) rather than on every write
+        _stats_dirty.add(stats_file)
+        _schedule_stats_flush()
+
+
+def _schedule_stats_flush() -> None:
+    """Arm the one-shot statistics flush timer if it isn't running (call under _stats_lock)."""
+    global _stats_timer
+    if _stats_timer is None:
+        _stats_timer = threading.Timer(STATS_FLUSH_INTERVAL_SECONDS, flush_statistics)
+        _stats_timer.daemon = True
+        _stats_timer.start()
+
+
+def flush_statistics() -> None:
+    """Write every statistics file updated since the last flush."""
+    global _stats_timer
+    with _stats_lock:
+        _stats_timer = None
+        for stats_file in list(_stats_dirty):
+            try:
+                # Compact, swapped in atomically, with the means rounded
+                stats = {pod_id: pod_stats.to_dict()
+                         for pod_id, pod_stats in _stats_cache[stats_file].items()}
+                fast_json.dump_atomic(stats, stats_file)
+            except OSError as e:
+                print(f"❌ Error saving statistics to {stats_file}: {e}")
+        _stats_dirty.clear()
 
 
 # ============================================================================
@@ -446,4 +704,12 @@ def get_archival_hooks():
     return {
         'pre_write': [validate_metric_hook, round_numbers_hook, add_metadata_hook],
         'post_write': [separate_by_pod_hook, daily_rotation_hook, auto_compact_hook]
-    }
\ No newline at end of file
+    }
+
+
+@atexit.register
+def _shutdown() -> None:
+    """At exit: run the queued hooks, then write out statistics and close descriptors."""
+    wait_for_hooks()
+    flush_statistics()
+    _close_all()
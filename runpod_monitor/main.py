@@ -624,6 +624,9 @@ def monitor_pods():
                                             print(f"✗ Failed to stop pod '{pod_name}'")
                         else:
                             print(f"  ⏸️  {pod_name} ({status})")
+                    
+                    # End of polling cycle: write out buffered metrics
+                    data_tracker.save_data()
                 else:
                     print("No pods found or API error")
                 
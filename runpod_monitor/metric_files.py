@@ -0,0 +1,404 @@
+"""
+Daily shards of the main metrics JSONL file.
+New metrics are appended to the live file (e.g. pod_metrics.jsonl). When the
+day changes it is renamed to a shard named after the day of its last row
+(pod_metrics.2024-11-13.jsonl), so every row in a shard is from that day or
+earlier and retention can delete whole files instead of rewriting one.
+Every file is kept in epoch order across pods (up to EPOCH_SLACK_SECONDS of
+jitter), which lets reads with a cutoff binary-search for their start;
+files written grouped by pod by older versions are sorted once on startup
+(see sort_unordered_files).
+Closed shards can then be rolled up into compressed columnar snapshots
+(pod_metrics.2024-11-13.npz, see snapshot), leaving JSONL as the write log.
+"""
+
+import glob
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import fast_json, snapshot
+
+DAY_FORMAT = '%Y-%m-%d'
+_DAY_PATTERN = re.compile(r'\.(\d{4}-\d{2}-\d{2})\.')
+_DAY_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+
+# How far a row's epoch may fall behind the newest row before it in a file
+# that still counts as epoch-ordered (e.g. two writers a few seconds apart)
+EPOCH_SLACK_SECONDS = 300
+
+
+def day_of(epoch: float) -> str:
+    """Local calendar day ('YYYY-MM-DD') of a Unix timestamp."""
+    return time.strftime(DAY_FORMAT, time.localtime(epoch))
+
+
+def day_start(day: str) -> float:
+    """Unix timestamp of local midnight at the start of day."""
+    return datetime.strptime(day, DAY_FORMAT).timestamp()
+
+
+def day_end(day: str) -> float:
+    """Unix timestamp of local midnight at the end of day (DST-aware)."""
+    return (datetime.strptime(day, DAY_FORMAT) + timedelta(days=1)).timestamp()
+
+
+def shard_path(metrics_file: str, day: str) -> str:
+    """Path of the shard holding the rows of day for the given live file."""
+    base, ext = os.path.splitext(metrics_file)
+    return f"{base}.{day}{ext}"
+
+
+def shard_day(path: str) -> str:
+    """Day ('YYYY-MM-DD') a shard or rolled-up snapshot path is named after."""
+    return _DAY_PATTERN.findall(os.path.basename(path))[-1]
+
+
+def shard_paths(metrics_file: str) -> List[str]:
+    """Existing JSONL shards of the live file, oldest first."""
+    base, ext = os.path.splitext(metrics_file)
+    return sorted(glob.glob(f"{glob.escape(base)}.{_DAY_GLOB}{ext}"))
+
+
+def rolled_paths(metrics_file: str, since: Optional[float] = None) -> List[str]:
+    """
+    Get the shards already rolled up into snapshots, oldest first.
+
+    Args:
+        metrics_file: Path of the live file
+        since: Skip days that ended at or before this Unix timestamp
+
+    Returns:
+        List of snapshot paths
+    """
+    base, _ = os.path.splitext(metrics_file)
+    paths = []
+    for fmt in snapshot.SNAPSHOT_FORMATS:
+        paths.extend(glob.glob(f"{glob.escape(base)}.{_DAY_GLOB}.{fmt}"))
+    if since is not None:
+        paths = [path for path in paths if day_end(shard_day(path)) > since]
+    return sorted(paths, key=shard_day)
+
+
+def metric_file_paths(metrics_file: str, since: Optional[float] = None) -> List[str]:
+    """
+    Get every existing metrics file in epoch order: the shards, then the live file.
+
+    Args:
+        metrics_file: Path of the live file
+        since: Skip shards whose day ended at or before this Unix timestamp
+
+    Returns:
+        List of file paths
+    """
+    paths = shard_paths(metrics_file)
+    if since is not None:
+        paths = [path for path in paths if day_end(shard_day(path)) > since]
+    if os.path.exists(metrics_file):
+        paths.append(metrics_file)
+    return paths
+
+
+def unrolled_paths(metrics_file: str, since: Optional[float] = None) -> List[str]:
+    """
+    Like metric_file_paths, but without shards whose day also has a
+    snapshot; read those through read_rolled_day.
+
+    Args:
+        metrics_file: Path of the live file
+        since: Skip shards whose day ended at or before this Unix timestamp
+
+    Returns:
+        List of file paths
+    """
+    rolled_days = {shard_day(path) for path in rolled_paths(metrics_file, since=since)}
+    return [path for path in metric_file_paths(metrics_file, since=since)
+            if path == metrics_file or shard_day(path) not in rolled_days]
+
+
+def edge_epochs(path: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Get the epochs of the first and last parseable rows of a JSONL file,
+    reading only its head and tail.
+
+    Args:
+        path: JSONL file path
+
+    Returns:
+        Tuple of (first_epoch, last_epoch), None where no row was found
+    """
+    first = last = None
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    first = fast_json.loads(line).get('epoch')
+                    break
+                except ValueError:
+                    continue
+
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - 65536))
+            for line in reversed(f.read().splitlines()):
+                try:
+                    last = fast_json.loads(line).get('epoch')
+                    break
+                except ValueError:
+                    continue  # Blank or partial (first) line of the tail
+    except OSError:
+        pass
+    return first, last
+
+
+def _epoch_lines(path: str) -> List[Tuple[float, bytes]]:
+    """Read a JSONL file as (epoch, line) pairs, skipping blank and unparseable lines."""
+    rows = []
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                epoch = fast_json.loads(line).get('epoch') or 0
+            except ValueError:
+                continue
+            rows.append((epoch, line if line.endswith(b'\n') else line + b'\n'))
+    return rows
+
+
+def _write_lines(path: str, rows: List[Tuple[float, bytes]]) -> None:
+    """Replace path with the lines of rows via a temporary file."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb', buffering=1 << 20) as f:
+        f.writelines(line for _, line in rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def is_epoch_ordered(path: str) -> bool:
+    """
+    Check that no row of a JSONL file is more than EPOCH_SLACK_SECONDS older
+    than a row before it.
+
+    Args:
+        path: JSONL file path
+
+    Returns:
+        True if the file is in epoch order (or missing)
+    """
+    newest = float('-inf')
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    epoch = fast_json.loads(line).get('epoch') or 0
+                except ValueError:
+                    continue
+                if epoch < newest - EPOCH_SLACK_SECONDS:
+                    return False
+                newest = max(newest, epoch)
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def sort_by_epoch(path: str) -> None:
+    """
+    Rewrite a JSONL file in epoch order (stable, so rows with equal epochs
+    keep their order). Unparseable lines are dropped.
+
+    Args:
+        path: JSONL file path
+    """
+    rows = _epoch_lines(path)
+    rows.sort(key=lambda row: row[0])
+    _write_lines(path, rows)
+
+
+def merge_into_shard(path: str, shard: str) -> None:
+    """
+    Merge a JSONL file into an existing shard, keeping the shard in epoch
+    order, and remove the file.
+
+    Args:
+        path: JSONL file to merge (e.g. the live file)
+        shard: Existing shard path
+    """
+    rows = _epoch_lines(shard) + _epoch_lines(path)
+    rows.sort(key=lambda row: row[0])  # Two sorted runs: a linear merge for timsort
+    _write_lines(shard, rows)
+    os.remove(path)
+
+
+def sort_unordered_files(metrics_file: str) -> List[str]:
+    """
+    Sort every JSONL file of the live file (shards and the live file) that
+    isn't in epoch order, e.g. one rewritten grouped by pod by an older
+    version.
+
+    Args:
+        metrics_file: Path of the live file
+
+    Returns:
+        Paths of the files that were sorted
+    """
+    sorted_paths = []
+    for path in metric_file_paths(metrics_file):
+        if not is_epoch_ordered(path):
+            sort_by_epoch(path)
+            sorted_paths.append(path)
+    return sorted_paths
+
+
+def _read_shard(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Group a JSONL shard's parseable rows by pod_id (rows without one are skipped)."""
+    metrics_by_pod: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                metric = fast_json.loads(line)
+            except ValueError:
+                continue  # Blank or corrupt line
+            pod_id = metric.get('pod_id')
+            if pod_id:
+                metrics_by_pod.setdefault(pod_id, []).append(metric)
+    return metrics_by_pod
+
+
+def _merge_metrics(into: Dict[str, List[Dict[str, Any]]],
+                   extra: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Add the metrics of extra to into, skipping rows identical to one already
+    there, and keep each pod's list in epoch order.
+
+    Args:
+        into: pod_id -> metrics, updated in place
+        extra: pod_id -> metrics to add
+
+    Returns:
+        into
+    """
+    for pod_id, metrics in extra.items():
+        existing = into.setdefault(pod_id, [])
+        by_epoch: Dict[Any, List[Dict[str, Any]]] = {}
+        for metric in existing:
+            by_epoch.setdefault(metric.get('epoch'), []).append(metric)
+        added = False
+        for metric in metrics:
+            same_epoch = by_epoch.setdefault(metric.get('epoch'), [])
+            if metric not in same_epoch:
+                same_epoch.append(metric)
+                existing.append(metric)
+                added = True
+        if added:
+            existing.sort(key=lambda metric: metric.get('epoch') or 0)
+    return into
+
+
+def read_rolled_day(metrics_file: str, day: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read a rolled-up day: every snapshot of the day (one per format, normally
+    just one) plus the day's JSONL shard if one is still there, e.g. left by
+    a crash during roll_up_shard or re-created after the clock was set back.
+    Rows present in more than one of them are returned once.
+
+    Args:
+        metrics_file: Path of the live file
+        day: Day ('YYYY-MM-DD')
+
+    Returns:
+        Dict of pod_id -> metrics in epoch order
+    """
+    base, _ = os.path.splitext(metrics_file)
+    metrics_by_pod: Dict[str, List[Dict[str, Any]]] = {}
+    for fmt in snapshot.SNAPSHOT_FORMATS:
+        path = f"{base}.{day}.{fmt}"
+        if os.path.exists(path):
+            _merge_metrics(metrics_by_pod, snapshot.read_snapshot(path))
+    shard = shard_path(metrics_file, day)
+    if os.path.exists(shard):
+        _merge_metrics(metrics_by_pod, _read_shard(shard))
+    return metrics_by_pod
+
+
+def roll_up_shard(path: str, fmt: Optional[str] = None) -> str:
+    """
+    Convert a closed JSONL shard into a compressed snapshot of the same day
+    and remove the shard. A day that already has a snapshot is merged with
+    it rather than overwritten. The snapshot is read back first and the
+    shard is only removed if every metric round-trips unchanged.
+
+    Args:
+        path: JSONL shard path
+        fmt: Snapshot format (default: the most compact one available)
+
+    Returns:
+        The snapshot path written
+    """
+    base = os.path.splitext(path)[0]
+    existing = [f"{base}.{ext}" for ext in snapshot.SNAPSHOT_FORMATS
+                if os.path.exists(f"{base}.{ext}")]
+    metrics_by_pod: Dict[str, List[Dict[str, Any]]] = {}
+    for snapshot_path in existing:
+        _merge_metrics(metrics_by_pod, snapshot.read_snapshot(snapshot_path))
+    if existing:
+        _merge_metrics(metrics_by_pod, _read_shard(path))
+    else:
+        metrics_by_pod = _read_shard(path)
+
+    # Written under a temporary name and swapped in, so a crash never leaves
+    # a partial snapshot next to the shard it came from
+    tmp_path = snapshot.write_snapshot(metrics_by_pod, base + '.tmp', fmt)
+    try:
+        matches = snapshot.read_snapshot(tmp_path) == metrics_by_pod
+    except (OSError, ValueError):
+        matches = False
+    if not matches:
+        os.remove(tmp_path)
+        raise ValueError(f"snapshot of {path} did not round-trip, keeping the JSONL shard")
+    rolled_path = base + tmp_path[len(base) + len('.tmp'):]
+    os.replace(tmp_path, rolled_path)
+    # Until these are gone readers see duplicates of the new snapshot's rows,
+    # which read_rolled_day drops
+    for snapshot_path in existing:
+        if snapshot_path != rolled_path:
+            os.remove(snapshot_path)
+    os.remove(path)
+    return rolled_path
+
+
+def iter_metrics(metrics_file: str, since: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield stored metrics from rolled-up snapshots, JSONL shards and the live
+    file, oldest day first (in epoch order for each pod). Unparseable lines
+    are skipped.
+
+    Args:
+        metrics_file: Path of the live file
+        since: Only yield metrics with epoch >= since
+
+    Yields:
+        Metric dicts
+    """
+    rolled_days = sorted({shard_day(path) for path in rolled_paths(metrics_file, since=since)})
+    for day in rolled_days:
+        for metrics in read_rolled_day(metrics_file, day).values():
+            for metric in metrics:
+                if since is None or metric.get('epoch', 0) >= since:
+                    yield metric
+
+    for path in unrolled_paths(metrics_file, since=since):
+        with open(path, 'rb') as f:
+            if since is not None:
+                # Skip straight to the window; the slack covers rows that are
+                # slightly out of order around the cutoff
+                fast_json.seek_to_epoch(f, since - EPOCH_SLACK_SECONDS)
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    metric = fast_json.loads(line)
+                except ValueError:
+                    continue
+                if since is None or metric.get('epoch', 0) >= since:
+                    yield metric
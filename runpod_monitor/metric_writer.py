@@ -3,9 +3,75 @@ Event-based metric writer with hook support.
 Allows injection of custom functions into the write pipeline.
 """
 
-import json
+import atexit
+import contextlib
+import inspect
 import os
-from typing import Dict, Any, Callable, List, Optional
+import queue
+import threading
+import time
+import weakref
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import fast_json
+
+# Buffered rows are written out once they reach this size or age
+BUFFER_LIMIT_BYTES = 128 * 1024
+FLUSH_INTERVAL_SECONDS = 10.0
+
+# Chunks per vectored write (POSIX guarantees at least 16, Linux allows 1024)
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 16
+
+
+# Optional keyword arguments a post-write hook can declare to receive
+HOOK_EXTRAS = ('line', 'writer')
+
+
+# Writers holding rows that must be written out at exit; close() removes one
+_live_writers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_writers() -> None:
+    for writer in list(_live_writers):
+        try:
+            writer.flush()
+        except OSError as e:
+            print(f"❌ Error writing metrics at exit: {e}")
+
+
+def _hook_extras(func: Callable) -> Tuple[str, ...]:
+    """Which of HOOK_EXTRAS a post-write hook takes as parameters."""
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return ()
+    return tuple(name for name in HOOK_EXTRAS if name in params)
+
+
+def _write_chunks(f: IO, chunks: List[bytes]) -> None:
+    """
+    Write chunks to an unbuffered file in order: one writev() per IOV_MAX
+    chunks where the platform has it (no joined copy), else a joined write.
+    """
+    if len(chunks) > 1 and hasattr(os, 'writev'):
+        fd = f.fileno()
+        for i in range(0, len(chunks), IOV_MAX):
+            batch = chunks[i:i + IOV_MAX]
+            written = os.writev(fd, batch)
+            if written < sum(map(len, batch)):
+                # Short write: finish this batch with plain writes
+                view = memoryview(b''.join(batch))[written:]
+                while view:
+                    view = view[f.write(view):]
+        return
+    
+    view = memoryview(b''.join(chunks) if len(chunks) > 1 else chunks[0])
+    while view:
+        view = view[f.write(view):]
 
 
 class MetricWriter:
@@ -20,8 +86,29 @@ class MetricWriter:
         self.on_start_hooks: List[Callable] = []
         self.pre_write_hooks: List[Callable] = []
         self.post_write_hooks: List[Callable] = []
+        self._hook_extras: Dict[Callable, Tuple[str, ...]] = {}  # Post-write hooks taking line=/writer=
         self.write_count = 0  # Track number of writes for hooks that need it
         self.started = False
+        self._files: Dict[str, IO] = {}  # Open append handles, keyed by path
+        self._buffers: Dict[str, bytearray] = {}  # Serialized rows not yet written
+        self._last_flush: Dict[str, float] = {}  # time.monotonic() of last write per path
+        
+        # Buffers are shared with a one-shot timer thread that writes out rows
+        # left pending for FLUSH_INTERVAL_SECONDS, bounding what a crash can lose
+        self._lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
+        
+        # The write() calls themselves run on a background writer thread fed
+        # through this queue, so pollers only hand over bytes. Items are
+        # ('write', path, data), ('close', path, event) or ('sync', None, event).
+        self._write_q: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        
+        # First write error on the writer thread since it was last reported:
+        # (path, error), handed back by the next write_metric or flush
+        self._error: Optional[Tuple[str, OSError]] = None
+        self._error_lock = threading.Lock()
+        self._flush_at_exit = False  # Registered in _live_writers
         
     def add_on_start_hook(self, func: Callable[[], None]) -> None:
         """
@@ -75,11 +162,17 @@ class MetricWriter:
         
         Post-write hooks receive the metric and file path.
         They can trigger additional actions but don't modify the metric.
+        Hooks with a 'line' parameter are also passed the row as written
+        (JSON bytes ending in a newline), so they needn't serialize it again;
+        hooks with a 'writer' parameter are passed this MetricWriter.
         
         Args:
             func: Function that takes (metric_dict, file_path) and returns None
         """
         self.post_write_hooks.append(func)
+        extras = _hook_extras(func)
+        if extras:
+            self._hook_extras[func] = extras
         print(f"✅ Added post-write hook: {func.__name__}")
         
     def remove_hook(self, func: Callable) -> bool:
@@ -98,6 +191,8 @@ class MetricWriter:
             removed = True
         if func in self.post_write_hooks:
             self.post_write_hooks.remove(func)
+            if func not in self.post_write_hooks:
+                self._hook_extras.pop(func, None)
             removed = True
         
         if removed:
@@ -108,50 +203,226 @@ class MetricWriter:
         """Clear all hooks (useful for testing or reconfiguration)."""
         self.pre_write_hooks.clear()
         self.post_write_hooks.clear()
+        self._hook_extras.clear()
         print("🧹 Cleared all hooks")
         
+    def _get_file(self, file_path: str) -> IO:
+        """
+        Return an unbuffered append handle for file_path, reopening it if the
+        file was replaced or removed (e.g. by a compaction) since it was opened.
+        Only used from the writer thread.
+        """
+        f = self._files.get(file_path)
+        if f is not None:
+            try:
+                if os.stat(file_path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except OSError:
+                pass
+            f.close()
+        
+        f = open(file_path, 'ab', buffering=0)
+        self._files[file_path] = f
+        return f
+    
+    def _writer_loop(self) -> None:
+        """
+        Writer thread: perform queued writes in order. Consecutive writes to
+        the same file are gathered so each batch costs a single writev() call.
+        """
+        pending = None
+        while True:
+            op, path, payload = pending or self._write_q.get()
+            pending = None
+            try:
+                if op == 'write':
+                    chunks = [payload]
+                    while True:
+                        try:
+                            item = self._write_q.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item[0] == 'write' and item[1] == path:
+                            chunks.append(item[2])
+                        else:
+                            pending = item
+                            break
+                    
+                    _write_chunks(self._get_file(path), chunks)
+                elif op == 'close':
+                    f = self._files.pop(path, None)
+                    if f is not None:
+                        f.close()
+            except OSError as e:
+                with self._error_lock:
+                    if self._error is None:
+                        self._error = (path, e)
+            finally:
+                if op != 'write':
+                    payload.set()
+    
+    def _take_error(self) -> Optional[Tuple[str, OSError]]:
+        """Return and clear the pending writer-thread error, if any."""
+        with self._error_lock:
+            error, self._error = self._error, None
+        return error
+    
+    def _enqueue(self, op: str, path: Optional[str], payload: Any) -> None:
+        """Queue an operation for the writer thread, starting it on first use."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, name="metric-writer", daemon=True)
+            self._writer.start()
+        self._write_q.put((op, path, payload))
+    
+    def _wait_for_writer(self, op: str = 'sync', path: Optional[str] = None) -> None:
+        """Block until the writer thread has processed everything queued so far."""
+        if self._writer is None:
+            return
+        done = threading.Event()
+        self._enqueue(op, path, done)
+        done.wait()
+    
+    def _flush_path(self, file_path: str) -> None:
+        """Hand the buffered rows for one path to the writer thread."""
+        with self._lock:
+            self._last_flush[file_path] = time.monotonic()
+            buf = self._buffers.get(file_path)
+            if not buf:
+                return
+            
+            self._enqueue('write', file_path, bytes(buf))
+            buf.clear()
+    
+    def flush(self, wait: bool = True) -> None:
+        """
+        Write out all buffered rows (call at the end of a polling cycle).
+        
+        Args:
+            wait: Block until the rows are on disk (needed before reading or
+                rewriting the file)
+                
+        Raises:
+            OSError: With wait, if the writer thread failed to write rows
+                since the last error was reported
+        """
+        with self._lock:
+            for path in list(self._buffers):
+                self._flush_path(path)
+        if wait:
+            self._wait_for_writer()
+            error = self._take_error()
+            if error is not None:
+                raise error[1]
+    
+    @contextlib.contextmanager
+    def paused(self) -> Iterator[None]:
+        """
+        Context manager for rewriting a file in place: everything buffered is
+        written out first, and other threads' write_metric calls (and the
+        flush timer) wait until the block exits. The writer thread reopens
+        a replaced file on its next write.
+        """
+        with self._lock:
+            self.flush(wait=True)
+            yield
+    
+    def _schedule_flush(self) -> None:
+        """Arm the one-shot flush timer if rows are pending and it isn't running."""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(FLUSH_INTERVAL_SECONDS, self._timer_flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def _timer_flush(self) -> None:
+        """Timer callback: hand whatever is still buffered to the writer thread."""
+        with self._lock:
+            self._flush_timer = None
+            self.flush(wait=False)
+    
+    def close(self, file_path: Optional[str] = None) -> None:
+        """
+        Flush and close open append handles, waiting for the writer thread.
+        A write error stays pending for the next write_metric or flush.
+        
+        Args:
+            file_path: Only close the handle for this path (None closes all)
+        """
+        with self._lock:
+            paths = [file_path] if file_path else list(self._buffers)
+            for path in paths:
+                self._flush_path(path)
+        if file_path:
+            self._wait_for_writer('close', file_path)
+        else:
+            self._wait_for_writer()
+            for path in list(self._files):
+                self._wait_for_writer('close', path)
+            with self._lock:
+                self._flush_at_exit = False
+                _live_writers.discard(self)
+    
     def write_metric(self, metric_point: Dict[str, Any], file_path: str) -> bool:
         """
-        Write a metric with all registered hooks.
+        Write a metric with all registered hooks. The row is buffered and
+        written by the writer thread; a failure there is reported by the next
+        call (or flush), since this one returns before any I/O.
         
         Args:
             metric_point: The metric dictionary to write
             file_path: Path to the JSONL file
             
         Returns:
-            True if write was successful, False otherwise
+            True if the metric was accepted, False if a pre-write hook dropped
+            it or rows accepted earlier could not be written
         """
-        try:
-            # Execute pre-write hooks (can transform the metric)
-            for hook in self.pre_write_hooks:
-                try:
-                    metric_point = hook(metric_point)
-                    if metric_point is None:
-                        print(f"⚠️ Pre-write hook {hook.__name__} returned None, skipping write")
-                        return False
-                except Exception as e:
-                    print(f"❌ Error in pre-write hook {hook.__name__}: {e}")
-                    # Continue with other hooks but log the error
-            
-            # Perform the actual write
-            with open(file_path, 'a') as f:
-                f.write(json.dumps(metric_point) + '\n')
-            
-            self.write_count += 1
-            
-            # Execute post-write hooks (for additional actions)
-            for hook in self.post_write_hooks:
-                try:
+        error = self._take_error()
+        if error is not None:
+            print(f"❌ Error writing metrics to {error[0]}: {error[1]}")
+        
+        # Execute pre-write hooks (can transform the metric)
+        for hook in self.pre_write_hooks:
+            try:
+                metric_point = hook(metric_point)
+                if metric_point is None:
+                    print(f"⚠️ Pre-write hook {hook.__name__} returned None, skipping write")
+                    return False
+            except Exception as e:
+                print(f"❌ Error in pre-write hook {hook.__name__}: {e}")
+                # Continue with other hooks but log the error
+        
+        # Buffer the row; write the batch once it is large or old enough,
+        # otherwise make sure the timer will write it out
+        line = fast_json.dumps_line(metric_point)
+        with self._lock:
+            if not self._flush_at_exit:
+                self._flush_at_exit = True
+                _live_writers.add(self)
+            buf = self._buffers.get(file_path)
+            if buf is None:
+                buf = self._buffers[file_path] = bytearray()
+            buf += line
+            if (len(buf) >= BUFFER_LIMIT_BYTES or
+                    time.monotonic() - self._last_flush.get(file_path, float('-inf')) >= FLUSH_INTERVAL_SECONDS):
+                self._flush_path(file_path)
+            else:
+                self._schedule_flush()
+        
+        self.write_count += 1
+        
+        # Execute post-write hooks (for additional actions)
+        for hook in self.post_write_hooks:
+            try:
+                extras = self._hook_extras.get(hook)
+                if extras:
+                    available = {'line': line, 'writer': self}
+                    hook(metric_point, file_path, **{name: available[name] for name in extras})
+                else:
                     hook(metric_point, file_path)
-                except Exception as e:
-                    print(f"❌ Error in post-write hook {hook.__name__}: {e}")
-                    # Continue with other hooks but log the error
-            
-            return True
-            
-        except IOError as e:
-            print(f"❌ Error writing metric to file: {e}")
-            return False
+            except Exception as e:
+                print(f"❌ Error in post-write hook {hook.__name__}: {e}")
+                # Continue with other hooks but log the error
+        
+        return error is None
             
     def get_hook_info(self) -> Dict[str, List[str]]:
         """
@@ -3,12 +3,50 @@ Per-pod metrics storage manager.
 Handles reading and writing metrics to individual pod folders for better organization and performance.
 """
 
-import json
 import os
-from typing import Dict, Any, List, Optional, Tuple
+from collections import defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
-from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import fast_json, metric_files
+
+# Fields aggregated into compacted windows (output prefix -> raw metric key)
+AGGREGATE_FIELDS = (('cpu', 'cpu_percent'), ('memory', 'memory_percent'), ('gpu', 'gpu_percent'))
+
+
+def aggregate_window(window_metrics: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Compute avg/min/max for each aggregated field in a single pass.
+    
+    Args:
+        window_metrics: Raw metrics in one time window
+        
+    Returns:
+        Dict with <prefix>_avg, <prefix>_min and <prefix>_max for each field
+        (0 for fields with no values)
+    """
+    # prefix -> [count, total, min, max]
+    acc = {prefix: [0, 0, None, None] for prefix, _ in AGGREGATE_FIELDS}
+    for metric in window_metrics:
+        for prefix, key in AGGREGATE_FIELDS:
+            value = metric.get(key)
+            if value is None:
+                continue
+            a = acc[prefix]
+            a[0] += 1
+            a[1] += value
+            if a[2] is None or value < a[2]:
+                a[2] = value
+            if a[3] is None or value > a[3]:
+                a[3] = value
+    
+    stats = {}
+    for prefix, (count, total, low, high) in acc.items():
+        stats[f'{prefix}_avg'] = round(total / count, 2) if count else 0
+        stats[f'{prefix}_min'] = round(low, 2) if count else 0
+        stats[f'{prefix}_max'] = round(high, 2) if count else 0
+    return stats
 
 
 class PodMetricsManager:
@@ -25,6 +63,7 @@ class PodMetricsManager:
             base_dir: Base directory for pod-specific metric files
         """
         self.base_dir = Path(base_dir)
+        self._created_dirs: set = set()  # Pod directories already ensured to exist
         self.ensure_base_directory()
     
     def ensure_base_directory(self) -> None:
@@ -42,7 +81,11 @@ class PodMetricsManager:
             Path to the pod's directory
         """
         pod_dir = self.base_dir / pod_id
-        pod_dir.mkdir(parents=True, exist_ok=True)
+        # mkdir (a syscall even when the directory exists) only runs the
+        # first time each pod is seen
+        if pod_id not in self._created_dirs:
+            pod_dir.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(pod_id)
         return pod_dir
     
     def get_metrics_file_path(self, pod_id: str, file_type: str = "raw") -> Path:
@@ -103,11 +146,12 @@ class PodMetricsManager:
             metric['pod_id'] = pod_id
             
             # Append to JSONL file
-            with open(file_path, 'a') as f:
-                f.write(json.dumps(metric) + '\n')
+            with open(file_path, 'ab') as f:
+                f.write(fast_json.dumps_line(metric))
             
             return True
         except Exception as e:
+            self._created_dirs.discard(pod_id)  # Recreate the directory if it was removed
             print(f"❌ Error writing metric for pod {pod_id}: {e}")
             return False
     
@@ -135,10 +179,10 @@ class PodMetricsManager:
         
         metrics = []
         try:
-            with open(file_path, 'r') as f:
+            with open(file_path, 'rb') as f:
                 for line in f:
                     if line.strip():
-                        metric = json.loads(line)
+                        metric = fast_json.loads(line)
                         
                         # Apply time filters based on data type
                         if file_type in ["30min", "1hour", "daily"]:
@@ -233,7 +277,12 @@ class PodMetricsManager:
         if latest:
             info["pod_name"] = latest.get("name", "Unknown")
             info["last_status"] = latest.get("status", "Unknown")
-            info["last_seen"] = latest.get("timestamp", "Unknown")
+            if latest.get("timestamp"):
+                info["last_seen"] = latest["timestamp"]
+            elif latest.get("epoch"):
+                info["last_seen"] = datetime.fromtimestamp(latest["epoch"]).isoformat()
+            else:
+                info["last_seen"] = "Unknown"
         
         return info
     
@@ -243,12 +292,14 @@ class PodMetricsManager:
         Used during onStart to populate individual pod files.
         
         Args:
-            main_jsonl_path: Path to the main metrics JSONL file
+            main_jsonl_path: Path to the main metrics JSONL file (its daily
+                shards and rolled-up snapshots are read too)
             
         Returns:
             Dictionary with pod_id -> metrics_count
         """
-        if not os.path.exists(main_jsonl_path):
+        if not (metric_files.metric_file_paths(main_jsonl_path) or
+                metric_files.rolled_paths(main_jsonl_path)):
             print(f"📭 No main metrics file found at {main_jsonl_path}")
             return {}
         
@@ -257,18 +308,15 @@ class PodMetricsManager:
         pod_counts = {}
         
         try:
-            with open(main_jsonl_path, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        metric = json.loads(line)
-                        pod_id = metric.get('pod_id')
-                        
-                        if pod_id:
-                            # Write to pod-specific file
-                            self.write_metric(pod_id, metric)
-                            
-                            # Track count
-                            pod_counts[pod_id] = pod_counts.get(pod_id, 0) + 1
+            for metric in metric_files.iter_metrics(main_jsonl_path):
+                pod_id = metric.get('pod_id')
+                
+                if pod_id:
+                    # Write to pod-specific file
+                    self.write_metric(pod_id, metric)
+                    
+                    # Track count
+                    pod_counts[pod_id] = pod_counts.get(pod_id, 0) + 1
         
             # Summary
             total_metrics = sum(pod_counts.values())
@@ -301,6 +349,7 @@ class PodMetricsManager:
         cleaned_count = 0
         for pod_id in terminated_pods:
             pod_dir = self.get_pod_directory(pod_id)
+            self._created_dirs.discard(pod_id)
             
             if archive:
                 # Move to archive folder
@@ -360,14 +409,14 @@ class PodMetricsManager:
         if current_points > max_points:
             points_to_remove = current_points - max_points
             
-            # Keep only the most recent max_points
-            lines_to_keep = lines[points_to_remove:]
+            # Keep only the most recent max_points (drop the head in place)
+            del lines[:points_to_remove]
             
             # Rewrite the file with only recent data
             with open(compacted_file, 'w') as f:
-                f.writelines(lines_to_keep)
+                f.writelines(lines)
             
-            print(f"🔄 Rolled {file_type} window for {pod_id}: removed {points_to_remove} old entries, kept {len(lines_to_keep)} recent")
+            print(f"🔄 Rolled {file_type} window for {pod_id}: removed {points_to_remove} old entries, kept {len(lines)} recent")
     
     def compact_metrics(self, pod_id: str, interval_minutes: int = 30) -> Tuple[int, int]:
         """
@@ -430,11 +479,6 @@ class PodMetricsManager:
             if window_end > current_time and (current_time - window_start) < (interval_seconds * 2):
                 continue  # Skip this window, it's not complete yet
             
-            # Calculate aggregates
-            cpu_values = [m.get('cpu_percent', 0) for m in window_metrics if m.get('cpu_percent') is not None]
-            memory_values = [m.get('memory_percent', 0) for m in window_metrics if m.get('memory_percent') is not None]
-            gpu_values = [m.get('gpu_percent', 0) for m in window_metrics if m.get('gpu_percent') is not None]
-            
             # Use the first metric for metadata
             first_metric = window_metrics[0]
             last_metric = window_metrics[-1]
@@ -450,20 +494,8 @@ class PodMetricsManager:
                 'status': last_metric.get('status', 'UNKNOWN'),
                 'metrics_count': len(window_metrics),
                 
-                # CPU stats
-                'cpu_avg': round(sum(cpu_values) / len(cpu_values), 2) if cpu_values else 0,
-                'cpu_min': round(min(cpu_values), 2) if cpu_values else 0,
-                'cpu_max': round(max(cpu_values), 2) if cpu_values else 0,
-                
-                # Memory stats
-                'memory_avg': round(sum(memory_values) / len(memory_values), 2) if memory_values else 0,
-                'memory_min': round(min(memory_values), 2) if memory_values else 0,
-                'memory_max': round(max(memory_values), 2) if memory_values else 0,
-                
-                # GPU stats
-                'gpu_avg': round(sum(gpu_values) / len(gpu_values), 2) if gpu_values else 0,
-                'gpu_min': round(min(gpu_values), 2) if gpu_values else 0,
-                'gpu_max': round(max(gpu_values), 2) if gpu_values else 0,
+                # CPU / memory / GPU avg, min and max
+                **aggregate_window(window_metrics),
                 
                 # Additional info
                 'cost_per_hr': last_metric.get('cost_per_hr', 0),
@@ -472,8 +504,8 @@ class PodMetricsManager:
             }
             
             # Write aggregated metric
-            with open(compacted_file, 'a') as f:
-                f.write(json.dumps(aggregated) + '\n')
+            with open(compacted_file, 'ab') as f:
+                f.write(fast_json.dumps_line(aggregated))
             
             windows_created += 1
         
@@ -532,16 +564,25 @@ class PodMetricsManager:
         if not raw_metrics:
             return 0
         
-        # Filter to keep only recent
-        recent_metrics = [m for m in raw_metrics if m.get('epoch', 0) > cutoff_epoch]
-        removed_count = len(raw_metrics) - len(recent_metrics)
+        # Raw metrics are appended in epoch order: binary-search the first one
+        # newer than the cutoff and drop everything before it in place
+        lo, hi = 0, len(raw_metrics)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if raw_metrics[mid].get('epoch', 0) > cutoff_epoch:
+                hi = mid
+            else:
+                lo = mid + 1
+        removed_count = lo
         
         if removed_count > 0:
+            del raw_metrics[:removed_count]
+            
             # Rewrite the file with only recent metrics
             raw_file = self.get_metrics_file_path(pod_id, "raw")
-            with open(raw_file, 'w') as f:
-                for metric in recent_metrics:
-                    f.write(json.dumps(metric) + '\n')
+            with open(raw_file, 'wb') as f:
+                for metric in raw_metrics:
+                    f.write(fast_json.dumps_line(metric))
             
             print(f"🧹 Cleaned up {removed_count} old raw metrics for {pod_id}")
         
@@ -0,0 +1,153 @@
+"""
+Fixed-size, mmap-backed ring buffer of numeric metric records.
+Each pod's recent samples are packed into fixed-width slots of a memory-mapped
+file, so appends are a struct.pack_into into the mapping, the OS writes pages
+back lazily, and the window survives restarts and can be read by another
+process without parsing JSON. With numpy the slots are also readable in place
+as a structured array (RECORD_DTYPE).
+"""
+
+import mmap
+import os
+import struct
+from typing import Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# epoch, cpu, gpu, memory, gpu_memory, uptime, cost_per_hr, gpu_count, running
+RECORD_FORMAT = struct.Struct('<q4dqdqq')
+RECORD_SIZE = RECORD_FORMAT.size  # 72 bytes
+
+# The same layout as a numpy structured dtype; cpu, gpu and mem must stay
+# adjacent f8 fields (see data_tracker._usage_block)
+RECORD_DTYPE = np.dtype([
+    ('epoch', '<i8'), ('cpu', '<f8'), ('gpu', '<f8'), ('mem', '<f8'), ('gpu_mem', '<f8'),
+    ('uptime', '<i8'), ('cost', '<f8'), ('gpu_count', '<i8'), ('running', '<i8'),
+]) if np is not None else None
+
+# magic, capacity, head (next slot to write), count
+HEADER_FORMAT = struct.Struct('<8sqqq')
+HEADER_SIZE = HEADER_FORMAT.size
+MAGIC = b'RPRING01'
+
+# Slots per pod: ~68 hours at one sample per minute, 288 KiB per file
+RING_CAPACITY = 4096
+
+
+class RingBuffer:
+    """
+    Ring of RECORD_FORMAT records in a memory-mapped file. Once full, each
+    append overwrites the oldest record. Not thread-safe: callers sharing a
+    ring between threads serialize every call, close() included.
+    """
+
+    def __init__(self, path: Optional[str], capacity: int = RING_CAPACITY):
+        """
+        Open or create a ring buffer file.
+
+        Args:
+            path: File backing the ring, or None for an anonymous in-memory ring
+            capacity: Number of record slots; an existing file with a
+                different capacity or an unknown header is reset
+        """
+        self.path = path
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+
+        if path is None:
+            self._mm = mmap.mmap(-1, size)
+            self.clear()
+            return
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)  # The mapping keeps its own reference
+
+        magic, stored_capacity, self._head, self._count = HEADER_FORMAT.unpack_from(self._mm, 0)
+        if magic != MAGIC or stored_capacity != capacity:
+            self.clear()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, record: Tuple) -> None:
+        """
+        Write a record into the next slot.
+
+        Args:
+            record: Values in RECORD_FORMAT order
+        """
+        RECORD_FORMAT.pack_into(self._mm, HEADER_SIZE + self._head * RECORD_SIZE, *record)
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        HEADER_FORMAT.pack_into(self._mm, 0, MAGIC, self.capacity, self._head, self._count)
+
+    def records(self) -> List[Tuple]:
+        """
+        Get all stored records, oldest first.
+
+        Returns:
+            List of record tuples in RECORD_FORMAT order
+        """
+        start = (self._head - self._count) % self.capacity
+        end = start + self._count
+        mm = self._mm
+        if end <= self.capacity:
+            data = mm[HEADER_SIZE + start * RECORD_SIZE:HEADER_SIZE + end * RECORD_SIZE]
+        else:
+            data = (mm[HEADER_SIZE + start * RECORD_SIZE:] +
+                    mm[HEADER_SIZE:HEADER_SIZE + (end - self.capacity) * RECORD_SIZE])
+        return list(RECORD_FORMAT.iter_unpack(data))
+
+    def oldest_epoch(self) -> Optional[int]:
+        """Epoch of the oldest stored record, or None if the ring is empty."""
+        if not self._count:
+            return None
+        start = (self._head - self._count) % self.capacity
+        return struct.unpack_from('<q', self._mm, HEADER_SIZE + start * RECORD_SIZE)[0]
+
+    def latest_epoch(self) -> Optional[int]:
+        """Epoch of the newest stored record, or None if the ring is empty."""
+        if not self._count:
+            return None
+        last = (self._head - 1) % self.capacity
+        return struct.unpack_from('<q', self._mm, HEADER_SIZE + last * RECORD_SIZE)[0]
+
+    def array_since(self, epoch: float) -> Any:
+        """
+        Copy the records with epoch >= the given one out of the mapping as a
+        RECORD_DTYPE array, oldest first. Only the matching slots are copied;
+        the wrapped-around part of the ring is bisected separately.
+
+        Args:
+            epoch: Oldest epoch to include
+
+        Returns:
+            numpy structured array (RECORD_DTYPE)
+        """
+        slots = np.frombuffer(self._mm, dtype=RECORD_DTYPE, count=self.capacity, offset=HEADER_SIZE)
+        start = (self._head - self._count) % self.capacity
+        end = start + self._count
+        older, newer = slots[start:min(end, self.capacity)], slots[:max(end - self.capacity, 0)]
+        if len(newer) and newer['epoch'][0] <= epoch:
+            return newer[np.searchsorted(newer['epoch'], epoch):].copy()
+        return np.concatenate((older[np.searchsorted(older['epoch'], epoch):], newer))
+
+    def clear(self) -> None:
+        """Drop all records."""
+        self._head = self._count = 0
+        HEADER_FORMAT.pack_into(self._mm, 0, MAGIC, self.capacity, 0, 0)
+
+    def close(self) -> None:
+        """Unmap the file (its contents stay on disk)."""
+        if not self._mm.closed:
+            self._mm.close()
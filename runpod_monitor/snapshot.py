@@ -0,0 +1,256 @@
+"""
+Compressed columnar snapshots of metric history.
+With numpy the metrics are stored column-wise in a compressed .npz: epochs as
+delta-of-delta integers (a steady polling interval encodes to runs of zeros)
+and the remaining numeric fields as float columns, which deflate well because
+idle pods repeat the same values. Per-row bit masks record which schema keys
+were present, null, or integers in a float column, and anything a column
+can't hold exactly (other keys, unexpected types) is kept as per-row JSON, so
+every format round-trips the metrics unchanged. Without numpy, msgpack is
+used with one positional row per metric against a shared field schema (so
+keys aren't repeated per sample); without either a gzip-compressed JSONL
+file is written.
+"""
+
+import gzip
+from typing import Any, Dict, List, Optional
+
+from . import fast_json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Numeric fields stored as columns: (metric key, integer column?)
+NUMERIC_FIELDS = (
+    ('epoch', True),
+    ('uptime_seconds', True),
+    ('gpu_count', True),
+    ('cost_per_hr', False),
+    ('cpu_percent', False),
+    ('memory_percent', False),
+    ('gpu_percent', False),
+    ('gpu_memory_percent', False),
+)
+STRING_FIELDS = ('pod_id', 'name', 'status', 'timestamp')
+
+# Positional schema for msgpack rows
+SCHEMA_FIELDS = tuple(key for key, _ in NUMERIC_FIELDS) + STRING_FIELDS
+_SCHEMA_SET = frozenset(SCHEMA_FIELDS)
+_SCHEMA_INDEX = {key: i for i, key in enumerate(SCHEMA_FIELDS)}
+_COLUMN_KINDS = {**{key: int if is_int else float for key, is_int in NUMERIC_FIELDS},
+                 **{key: str for key in STRING_FIELDS}}
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+_EXACT_FLOAT_INT = 2 ** 53  # Largest magnitude a float64 holds every integer up to
+
+SNAPSHOT_FORMATS = ('npz', 'msgpack', 'jsonl.gz')
+
+
+def _default_format() -> str:
+    """Pick the most compact snapshot format the installed packages support."""
+    if np is not None:
+        return 'npz'
+    if msgpack is not None:
+        return 'msgpack'
+    return 'jsonl.gz'
+
+
+def _encode_row(metric: Dict[str, Any]) -> List[Any]:
+    """
+    Encode a metric as [presence_mask, *schema values, extras].
+    Bit i of the mask is set when SCHEMA_FIELDS[i] is present, so absent keys
+    and explicit nulls round-trip distinctly; non-schema keys go in extras.
+    """
+    get = metric.get
+    mask = 0
+    row = [0]
+    for i, key in enumerate(SCHEMA_FIELDS):
+        if key in metric:
+            mask |= 1 << i
+        row.append(get(key))
+    row[0] = mask
+    extras = {key: value for key, value in metric.items() if key not in _SCHEMA_SET}
+    row.append(extras or None)
+    return row
+
+
+def _decode_row(row: List[Any]) -> Dict[str, Any]:
+    """Rebuild a metric dict from a row produced by _encode_row."""
+    mask = row[0]
+    metric = {key: row[i + 1] for i, key in enumerate(SCHEMA_FIELDS) if mask >> i & 1}
+    extras = row[-1]
+    if extras:
+        metric.update(extras)
+    return metric
+
+
+def write_snapshot(metrics_by_pod: Dict[str, List[Dict[str, Any]]], path: str,
+                   fmt: Optional[str] = None) -> str:
+    """
+    Write metrics to a compressed snapshot.
+
+    Args:
+        metrics_by_pod: Dict of pod_id -> metrics in epoch order
+        path: Destination path without extension
+        fmt: One of SNAPSHOT_FORMATS (default: npz with numpy, else msgpack
+            if installed, else jsonl.gz)
+
+    Returns:
+        The path written, with the format as its extension
+    """
+    fmt = fmt or _default_format()
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unsupported snapshot format: {fmt}")
+    if fmt == 'npz' and np is None:
+        raise ImportError("numpy is required for .npz snapshots")
+    if fmt == 'msgpack' and msgpack is None:
+        raise ImportError("msgpack is required for .msgpack snapshots")
+
+    if fmt == 'msgpack':
+        path += '.msgpack'
+        payload = {
+            'schema': list(SCHEMA_FIELDS),
+            'pods': {pod_id: [_encode_row(m) for m in metrics] for pod_id, metrics in metrics_by_pod.items()},
+        }
+        with open(path, 'wb') as f:
+            f.write(msgpack.packb(payload, use_bin_type=True))
+        return path
+
+    if fmt == 'jsonl.gz':
+        path += '.jsonl.gz'
+        with gzip.open(path, 'wb') as f:
+            for pod_id, metrics in metrics_by_pod.items():
+                for metric in metrics:
+                    f.write(fast_json.dumps_line(metric if 'pod_id' in metric else {**metric, 'pod_id': pod_id}))
+        return path
+
+    rows = [(pod_id, metric) for pod_id, metrics in metrics_by_pod.items() for metric in metrics]
+    n = len(rows)
+    values = {key: [0 if kind is int else np.nan if kind is float else '' for _ in range(n)]
+              for key, kind in _COLUMN_KINDS.items()}
+    mask = [0] * n      # Bit i: SCHEMA_FIELDS[i] present and stored in its column
+    null_mask = [0] * n  # Bit i: SCHEMA_FIELDS[i] present with a null value
+    int_mask = [0] * n   # Bit i: SCHEMA_FIELDS[i] is an int stored in a float column
+    extras = []          # [row, {key: value}] for whatever the columns can't hold
+
+    for row, (pod_id, metric) in enumerate(rows):
+        values['pod_id'][row] = pod_id  # Grouping key, even if the metric lacks it
+        row_extras = {}
+        for key, value in metric.items():
+            i = _SCHEMA_INDEX.get(key)
+            if i is None:
+                row_extras[key] = value
+                continue
+            kind = _COLUMN_KINDS[key]
+            value_type = type(value)
+            if value is None:
+                null_mask[row] |= 1 << i
+            elif value_type is kind and (kind is not int or _INT64_MIN <= value <= _INT64_MAX):
+                values[key][row] = value
+                mask[row] |= 1 << i
+            elif kind is float and value_type is int and abs(value) <= _EXACT_FLOAT_INT:
+                values[key][row] = value
+                mask[row] |= 1 << i
+                int_mask[row] |= 1 << i
+            else:
+                row_extras[key] = value
+        if row_extras:
+            extras.append([row, row_extras])
+
+    columns = {}
+    for key, kind in _COLUMN_KINDS.items():
+        if kind is str:
+            columns[key] = np.array(values[key], dtype=str)
+        else:
+            columns[key] = np.array(values[key], dtype=np.int64 if kind is int else np.float64)
+
+    # Delta-of-delta: exact for integers, undone with two cumulative sums
+    columns['epoch'] = np.diff(np.diff(columns['epoch'], prepend=0), prepend=0)
+
+    columns['mask'] = np.array(mask, dtype=np.int64)
+    columns['null_mask'] = np.array(null_mask, dtype=np.int64)
+    columns['int_mask'] = np.array(int_mask, dtype=np.int64)
+    columns['extras'] = np.frombuffer(fast_json.dumps(extras), dtype=np.uint8)
+
+    path += '.npz'
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **columns)
+    return path
+
+
+def read_snapshot(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read a snapshot written by write_snapshot.
+
+    Args:
+        path: Snapshot path including its extension
+
+    Returns:
+        Dict of pod_id -> list of metrics as they were written
+    """
+    result: Dict[str, List[Dict[str, Any]]] = {}
+
+    if path.endswith('.jsonl.gz'):
+        with gzip.open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    metric = fast_json.loads(line)
+                    result.setdefault(metric.get('pod_id'), []).append(metric)
+        return result
+
+    if path.endswith('.msgpack'):
+        if msgpack is None:
+            raise ImportError("msgpack is required to read .msgpack snapshots")
+        with open(path, 'rb') as f:
+            payload = msgpack.unpackb(f.read(), raw=False)
+        if tuple(payload.get('schema', ())) != SCHEMA_FIELDS:
+            raise ValueError(f"Snapshot schema mismatch in {path}")
+        for pod_id, rows in payload['pods'].items():
+            result[pod_id] = [_decode_row(row) for row in rows]
+        return result
+
+    if np is None:
+        raise ImportError("numpy is required to read .npz snapshots")
+
+    with np.load(path) as archive:
+        columns = {key: archive[key] for key in archive.files}
+    columns['epoch'] = np.cumsum(np.cumsum(columns['epoch']))
+
+    keys = [key for key, _ in NUMERIC_FIELDS] + list(STRING_FIELDS)
+    lists = [columns[key].tolist() for key in keys]
+
+    if 'mask' not in columns:
+        # Written before the masks existed: every schema key, NaN for nulls
+        for values in zip(*lists):
+            metric = dict(zip(keys, values))
+            for key, is_int in NUMERIC_FIELDS:
+                if not is_int and metric[key] != metric[key]:  # NaN marks a null reading
+                    metric[key] = None
+            result.setdefault(metric['pod_id'], []).append(metric)
+        return result
+
+    extras = dict((row, row_extras) for row, row_extras in fast_json.loads(columns['extras'].tobytes()))
+    bits = [(1 << i, key, values) for i, (key, values) in enumerate(zip(keys, lists))]
+    pod_ids = columns['pod_id'].tolist()
+    for row, (mask, null_mask, int_mask) in enumerate(zip(columns['mask'].tolist(),
+                                                           columns['null_mask'].tolist(),
+                                                           columns['int_mask'].tolist())):
+        metric = {}
+        for bit, key, values in bits:
+            if mask & bit:
+                metric[key] = int(values[row]) if int_mask & bit else values[row]
+            elif null_mask & bit:
+                metric[key] = None
+        row_extras = extras.get(row)
+        if row_extras:
+            metric.update(row_extras)
+        result.setdefault(pod_ids[row], []).append(metric)
+
+    return result
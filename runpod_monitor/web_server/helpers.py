@@ -5,12 +5,17 @@ data loading, and HTML generation.
 """
 
 import json
-import yaml
+import os
 import time
-from typing import Optional, Dict, Any, Tuple, List
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
 from fastapi.responses import HTMLResponse
 
+from ..auto_stop_tracker import AutoStopTracker
+from ..metric_files import iter_metrics
+
 
 def save_config_to_file(config_data: Dict[str, Any], file_path: str) -> bool:
     """
@@ -94,29 +99,57 @@ def load_metrics_data() -> Dict[str, Any]:
     if data_tracker:
         return data_tracker.get_all_metrics_data()
     
-    # Fallback: try to load directly from JSONL file
-    import os
+    # Fallback: try to load directly from the JSONL files
     metrics_file = './data/pod_metrics.jsonl'
     data = {}
     
-    if os.path.exists(metrics_file):
-        try:
-            with open(metrics_file, 'r') as f:
-                for line in f:
-                    if line.strip():
-                        metric = json.loads(line)
-                        pod_id = metric.get('pod_id')
-                        if pod_id:
-                            if pod_id not in data:
-                                data[pod_id] = []
-                            data[pod_id].append(metric)
-        except (IOError, json.JSONDecodeError) as e:
-            print(f"Warning: Error loading metrics file: {e}")
-            return {}
+    try:
+        # Rolled-up days and daily shards first, then the live file
+        for metric in iter_metrics(metrics_file):
+            pod_id = metric.get('pod_id')
+            if pod_id:
+                if pod_id not in data:
+                    data[pod_id] = []
+                data[pod_id].append(metric)
+    except (IOError, ValueError, ImportError) as e:
+        print(f"Warning: Error loading metrics file: {e}")
+        return {}
     
     return data
 
 
+def get_auto_stop_tracker(data_dir: str = './data') -> Optional[AutoStopTracker]:
+    """
+    Get the auto-stop counters: the monitor's live tracker when it runs in
+    this process, otherwise a read-only tracker loaded from the counter
+    snapshot with its journal replayed. Deleting counters through the live
+    tracker keeps the journal consistent, unlike editing the snapshot file
+    directly; a read-only tracker never writes, since the monitor process
+    owns the files.
+    
+    Args:
+        data_dir: Directory holding the counter files
+        
+    Returns:
+        AutoStopTracker, or None if no counters have been saved
+    """
+    try:
+        from ..main import data_tracker
+    except ImportError:
+        try:
+            from runpod_monitor.main import data_tracker
+        except ImportError:
+            data_tracker = None
+    
+    if data_tracker and data_tracker.auto_stop_tracker:
+        return data_tracker.auto_stop_tracker
+    
+    counter_file = os.path.join(data_dir, 'auto_stop_counters.json')
+    if not (os.path.exists(counter_file) or os.path.exists(counter_file + '.log')):
+        return None
+    return AutoStopTracker(data_dir=data_dir, read_only=True)
+
+
 def get_monitoring_metrics() -> Tuple[int, int]:
     """
     Get current monitoring metrics including active pod count and pods with data.
@@ -125,9 +158,9 @@ def get_monitoring_metrics() -> Tuple[int, int]:
         Tuple of (active_pod_count, pods_with_metrics)
     """
     try:
-        from ..main import fetch_pods, data_tracker
+        from ..main import data_tracker, fetch_pods
     except ImportError:
-        from runpod_monitor.main import fetch_pods, data_tracker
+        from runpod_monitor.main import data_tracker, fetch_pods
     
     current_pods = fetch_pods()
     active_pod_count = len(current_pods) if current_pods else 0
@@ -3,18 +3,20 @@ Metrics and data visualization endpoints for the RunPod Monitor web server.
 Handles metrics display, data export, graphing, predictions, and raw data views.
 """
 
-from fastapi import APIRouter, Request, Query
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Query, Request
 from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
-from datetime import datetime
-from typing import Optional, List, Dict, Any, Tuple, Set
-import time
-import json
 
+from ..data_tracker import metric_timestamp
 from .helpers import (
+    generate_raw_data_filters_html,
+    get_auto_stop_tracker,
     get_current_config,
     load_metrics_data,
-    generate_raw_data_filters_html
 )
 
 # Create router for metrics endpoints
@@ -69,9 +71,9 @@ async def get_metrics(request: Request):
         HTML response with rendered metrics page
     """
     try:
-        from ..main import fetch_pods, data_tracker
+        from ..main import data_tracker, fetch_pods
     except ImportError:
-        from runpod_monitor.main import fetch_pods, data_tracker
+        from runpod_monitor.main import data_tracker, fetch_pods
     
     if not data_tracker:
         return HTMLResponse("<p>Data tracker not initialized</p>")
@@ -169,8 +171,8 @@ async def get_raw_data(
         HTML response with formatted table
     """
     try:
-        from runpod_monitor.pod_metrics_manager import PodMetricsManager
         from runpod_monitor.main import fetch_pods
+        from runpod_monitor.pod_metrics_manager import PodMetricsManager
     except ImportError:
         return HTMLResponse("<p>Error loading modules</p>")
     
@@ -394,7 +396,7 @@ async def get_raw_data(
             '''
         else:
             # Raw data display
-            timestamp = metric.get('timestamp', '')
+            timestamp = metric_timestamp(metric)
             try:
                 time_display = datetime.fromisoformat(timestamp).strftime('%H:%M:%S')
             except:
@@ -453,18 +455,11 @@ async def get_auto_stop_predictions(request: Request):
 
     monitor_only = current_config.get('auto_stop', {}).get('monitor_only', False)
 
-    # Read counters from file instead of loading all metrics
-    import os
-    counters_file = './data/auto_stop_counters.json'
-
-    if not os.path.exists(counters_file):
+    # Read counters from the tracker (snapshot plus journal) instead of loading all metrics
+    tracker = get_auto_stop_tracker()
+    if tracker is None:
         return HTMLResponse("<p class='text-muted'>No auto-stop tracking data available</p>")
-
-    try:
-        with open(counters_file, 'r') as f:
-            counters = json.load(f)
-    except Exception as e:
-        return HTMLResponse(f"<p class='text-muted'>Error loading counters: {e}</p>")
+    counters = dict(tracker.counters)  # The monitor thread may update it meanwhile
 
     # Get current active pods from API to filter out terminated/deleted pods
     try:
@@ -506,17 +501,14 @@ async def get_auto_stop_predictions(request: Request):
                 'avg_gpu': counter_data.get('last_metrics', {}).get('gpu', 0)
             })
 
-    # Clean up stale counters from file
-    if stale_pod_ids:
+    # Clean up stale counters (journaled through the tracker, then compacted);
+    # without the monitor in this process they are only left out above
+    if stale_pod_ids and not tracker.read_only:
         print(f"🧹 Removing {len(stale_pod_ids)} stale pod counters from tracking")
         for pod_id in stale_pod_ids:
-            del counters[pod_id]
-        try:
-            with open(counters_file, 'w') as f:
-                json.dump(counters, f, indent=2)
-            print(f"✅ Cleaned up stale counters saved to {counters_file}")
-        except Exception as e:
-            print(f"⚠️ Failed to save cleaned counters: {e}")
+            tracker.reset_counter(pod_id)
+        tracker.save_counters()
+        print("✅ Cleaned up stale counters")
     
     if not predictions:
         return HTMLResponse("<p class='text-muted'>No pods currently approaching auto-stop thresholds</p>")
@@ -752,7 +744,7 @@ async def get_graph_data(pod_id: str, timeRange: int = 3600, resolution: str = "
             gpu_data.append(metric.get('gpu_avg', 0))
         else:
             # Raw data handling
-            timestamp = metric.get('timestamp', '')
+            timestamp = metric_timestamp(metric)
             if timestamp:
                 try:
                     dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
@@ -792,9 +784,9 @@ async def export_data_endpoint():
     Returns:
         ZIP file containing the entire data directory
     """
-    import zipfile
     import io
     import os
+    import zipfile
     from pathlib import Path
     
     try:
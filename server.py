@@ -96,24 +96,23 @@ def simple_monitoring_loop():
                 
                 # Clean up auto-stop counters for non-running pods
                 try:
-                    from runpod_monitor.auto_stop_tracker import AutoStopTracker
-                    tracker = AutoStopTracker()
-                    tracker.load_counters()
+                    from runpod_monitor.web_server.helpers import get_auto_stop_tracker
+                    tracker = get_auto_stop_tracker()
 
                     # Get only RUNNING pod IDs
                     running_pod_ids = {pod['id'] for pod in pods if pod.get('desiredStatus') == 'RUNNING'}
 
                     # Find all counters that should be removed (pods that aren't RUNNING)
                     counters_to_remove = [
-                        pod_id for pod_id in tracker.counters.keys()
+                        pod_id for pod_id in list(tracker.counters.keys())
                         if pod_id not in running_pod_ids
-                    ]
+                    ] if tracker and not tracker.read_only else []
 
                     # Remove stale counters
                     if counters_to_remove:
                         for pod_id in counters_to_remove:
                             pod_name = tracker.counters[pod_id].get('pod_name', pod_id[:8])
-                            del tracker.counters[pod_id]
+                            tracker.reset_counter(pod_id)  # Journaled, so a replay can't restore it
                             print(f"   🧹 Removed counter for non-running pod '{pod_name}' ({pod_id})")
                         tracker.save_counters()
                         print(f"   ✅ Cleaned up {len(counters_to_remove)} non-running pod counters")
@@ -183,7 +182,7 @@ def simple_monitoring_loop():
                                     
                                     # Add termination record to the pod's data
                                     main_data_tracker.data[terminated_pod_id].append(termination_record)
-                                    main_data_tracker.save_data()
+                                    main_data_tracker.save_metric(termination_record)
                     
                     # Auto-cleanup exclusion list: remove pods that no longer exist
                     if exclude_pods:
@@ -259,6 +258,9 @@ def simple_monitoring_loop():
                             
                             monitored_count += 1
                     
+                    # End of polling cycle: write out buffered metrics
+                    main_data_tracker.save_data()
+                    
                     print(f"   ✅ Summary: {monitored_count} pods monitored, {excluded_count} pods excluded")
                     if exclude_pods:
                         print(f"   🛡️  Exclude list: {exclude_pods}")
@@ -0,0 +1,62 @@
+"""Tests for AutoStopTracker's counter snapshot and journal."""
+
+import os
+
+from runpod_monitor.auto_stop_tracker import JOURNAL_COMPACT_BYTES, AutoStopTracker
+
+THRESHOLDS = {'max_cpu_percent': 5, 'max_gpu_percent': 5, 'max_memory_percent': 5,
+              'duration': 600}
+
+
+def _tracker(data_dir, **kwargs):
+    tracker = AutoStopTracker(data_dir=str(data_dir), **kwargs)
+    tracker.set_thresholds(THRESHOLDS)
+    return tracker
+
+
+def _idle(pod_id, epoch):
+    return {'pod_id': pod_id, 'name': pod_id, 'epoch': epoch, 'status': 'RUNNING',
+            'cpu_percent': 1, 'gpu_percent': 0, 'memory_percent': 1}
+
+
+def test_journal_replays_updates_and_resets(tmp_path):
+    tracker = _tracker(tmp_path)
+    for epoch in range(1000, 1300, 60):
+        tracker.update_counter(_idle('a', epoch))
+        tracker.update_counter(_idle('b', epoch))
+    tracker.reset_counter('b')
+    tracker._journal.flush()
+
+    assert _tracker(tmp_path).counters == tracker.counters
+    assert set(tracker.counters) == {'a'}
+
+
+def test_journal_is_compacted_while_updating(tmp_path):
+    tracker = _tracker(tmp_path)
+    for i in range(1000):
+        tracker.update_counter(_idle(f'pod{i % 20}', 1000 + i))
+
+    assert os.path.getsize(tracker.journal_file) < JOURNAL_COMPACT_BYTES
+    tracker.compact()
+    assert _tracker(tmp_path).counters == tracker.counters
+
+
+def test_read_only_tracker_never_writes(tmp_path):
+    writer = _tracker(tmp_path)
+    for epoch in (1000, 1060):
+        writer.update_counter(_idle('a', epoch))
+    writer.compact()
+    writer.update_counter(_idle('b', 1120))
+    writer._journal.flush()
+    files = {name: (tmp_path / name).read_bytes() for name in os.listdir(tmp_path)}
+
+    reader = _tracker(tmp_path, read_only=True)
+    assert set(reader.counters) == {'a', 'b'}
+    reader.reset_counter('a')
+    reader.save_counters()
+
+    names = os.listdir(tmp_path)
+    assert {name: (tmp_path / name).read_bytes() for name in names} == files
+    writer.update_counter(_idle('c', 1180))
+    writer._journal.flush()
+    assert set(_tracker(tmp_path).counters) == {'a', 'b', 'c'}
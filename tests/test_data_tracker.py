@@ -0,0 +1,83 @@
+"""Tests for DataTracker lifecycle."""
+
+import csv
+import gc
+import io
+import json
+import os
+import threading
+import weakref
+
+from runpod_monitor import data_tracker
+from runpod_monitor.data_tracker import DataTracker
+
+
+def test_exit_save_does_not_keep_trackers_alive(tmp_path):
+    tracker = DataTracker(data_dir=str(tmp_path))
+    assert tracker in data_tracker._live_trackers
+
+    ref = weakref.ref(tracker)
+    del tracker
+    gc.collect()
+    assert ref() is None
+
+
+def test_compaction_keeps_rows_written_while_it_runs(tmp_path, monkeypatch):
+    tracker = DataTracker(data_dir=str(tmp_path))
+    writer = tracker.metric_writer
+    path = tracker.metrics_file
+    for epoch in (100, 200, 300):
+        writer.write_metric({'pod_id': 'a', 'epoch': epoch}, path)
+    writer.flush()
+
+    def write_late_row():
+        writer.write_metric({'pod_id': 'a', 'epoch': 400}, path)
+        writer.flush()
+
+    real_replace = os.replace
+    late = []
+
+    def replace(src, dst):
+        # Another poller writes between the read and the swap
+        late.append(threading.Thread(target=write_late_row))
+        late[0].start()
+        late[0].join(0.2)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', replace)
+    assert tracker.compact_metrics_file(cutoff_time=150) == 1
+    late[0].join()
+
+    with open(path) as f:
+        assert [json.loads(line)['epoch'] for line in f] == [200, 300, 400]
+
+
+def _baseline_csv(data):
+    """The export_data CSV output before the row template and epoch timestamps."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([key for key, _ in data_tracker.METRIC_FIELDS])
+    for pod_id, metrics in data.items():
+        for metric in metrics:
+            writer.writerow([metric.get(key, pod_id if key == 'pod_id' else default)
+                             for key, default in data_tracker.METRIC_FIELDS])
+    return output.getvalue()
+
+
+def test_export_output_matches_stdlib(tmp_path, monkeypatch):
+    data = {
+        'a': [{'pod_id': 'a', 'epoch': 100, 'name': 'café, "x"',
+               'cpu_percent': float('inf')},
+              {'timestamp': '2024-01-01T00:00:00', 'epoch': 160, 'name': '漢',
+               'gpu_percent': None, 'memory_percent': 12.5}],
+        'b': [{'pod_id': 'b', 'epoch': 200, 'status': 'RUNNING', 'gpu_count': 2}],
+    }
+    tracker = DataTracker(data_dir=str(tmp_path))
+    monkeypatch.setattr(tracker, 'get_filtered_metrics', lambda **kwargs: data)
+
+    assert tracker.export_data('csv') == _baseline_csv(data)
+    assert tracker.export_data('json') == json.dumps(data, indent=2)
+
+    out = tmp_path / 'export.json'
+    tracker.export_data('json', out=str(out))
+    assert out.read_text() == json.dumps(data, indent=2)
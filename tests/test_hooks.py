@@ -0,0 +1,23 @@
+"""Tests for the metric writer hooks."""
+
+import json
+
+from runpod_monitor import hooks
+
+
+def test_auto_compact_checks_size_on_first_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(hooks, '_compact_check_count', 0)
+    path = tmp_path / 'pod_metrics.jsonl'
+    pad = 'x' * 5000
+    with open(path, 'w') as f:
+        for epoch in range(1100):
+            for pod_id in ('a', 'b'):
+                row = {'pod_id': pod_id, 'epoch': epoch, 'pad': pad}
+                f.write(json.dumps(row) + '\n')
+
+    hooks.auto_compact_hook({'pod_id': 'a', 'epoch': 1100}, str(path))
+
+    with open(path) as f:
+        epochs = [json.loads(line)['epoch'] for line in f]
+    assert len(epochs) == 2000
+    assert epochs[:2] == [100, 100] and epochs[-1] == 1099
@@ -0,0 +1,79 @@
+"""Tests for the epoch-ordered JSONL metric files (metric_files)."""
+
+import json
+import os
+import time
+
+from runpod_monitor import fast_json, metric_files
+from runpod_monitor.auto_stop_tracker import AutoStopTracker
+from runpod_monitor.data_tracker import DataTracker
+
+
+def _metric(pod_id, epoch, cpu=1.0):
+    return {'pod_id': pod_id, 'epoch': epoch, 'status': 'RUNNING', 'cpu_percent': cpu,
+            'gpu_percent': 0.0, 'memory_percent': 1.0}
+
+
+def _write_jsonl(path, metrics):
+    with open(path, 'w') as f:
+        for metric in metrics:
+            f.write(json.dumps(metric) + '\n')
+
+
+def _tracker(data_dir):
+    return DataTracker(data_dir=str(data_dir), use_metric_writer=False,
+                       use_auto_stop_tracker=False, use_ring_buffer=False)
+
+
+def test_seek_to_epoch_stops_at_or_just_before_cutoff(tmp_path):
+    path = tmp_path / 'pod_metrics.jsonl'
+    _write_jsonl(path, [_metric('a', epoch) for epoch in range(1000, 2000, 10)])
+
+    with open(path, 'rb') as f:
+        fast_json.seek_to_epoch(f, 1500)
+        epochs = [fast_json.loads(line)['epoch'] for line in f]
+    # Never past the first row at the cutoff, and only a probe or two before it
+    assert epochs[-50:] == list(range(1500, 2000, 10))
+    assert len(epochs) <= 52
+
+
+def test_grouped_legacy_file_is_sorted_on_startup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    now = int(time.time())
+    # Two hours per pod, rewritten grouped by pod as older versions of
+    # save_data did; half of each pod's rows fall inside the last hour
+    grouped = [_metric(pod_id, now - 7170 + 60 * i)
+               for pod_id in 'abcd' for i in range(120)]
+    metrics_file = tmp_path / 'pod_metrics.jsonl'
+    _write_jsonl(metrics_file, grouped)
+    assert not metric_files.is_epoch_ordered(str(metrics_file))
+
+    _tracker(tmp_path)
+
+    assert metric_files.is_epoch_ordered(str(metrics_file))
+    assert os.path.exists(str(metrics_file) + '.ordered')
+    recent = list(metric_files.iter_metrics(str(metrics_file), since=now - 3600))
+    in_window = sum(metric['epoch'] >= now - 3600 for metric in grouped)
+    assert len(recent) == in_window == 240
+    assert {metric['pod_id'] for metric in recent} == set('abcd')
+
+    counters = AutoStopTracker(data_dir=str(tmp_path))
+    counters.initialize_from_jsonl(str(metrics_file), {
+        'max_cpu_percent': 5, 'max_gpu_percent': 5, 'max_memory_percent': 5,
+        'duration': 3600})
+    assert set(counters.counters) == set('abcd')
+
+
+def test_clock_set_back_keeps_every_file_ordered(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracker = _tracker(tmp_path)
+    noon = metric_files.day_start('2024-01-10') + 12 * 3600
+
+    for epoch in (noon, noon + 600, noon - 3600, noon - 3000, noon + 86400):
+        tracker.save_metric(_metric('a', epoch))
+
+    paths = metric_files.metric_file_paths(tracker.metrics_file)
+    assert all(metric_files.is_epoch_ordered(path) for path in paths)
+    metrics = metric_files.iter_metrics(tracker.metrics_file)
+    epochs = sorted(metric['epoch'] for metric in metrics)
+    assert epochs == sorted((noon, noon + 600, noon - 3600, noon - 3000, noon + 86400))
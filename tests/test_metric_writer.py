@@ -0,0 +1,41 @@
+"""Tests for MetricWriter's error reporting."""
+
+import pytest
+
+from runpod_monitor import metric_writer
+from runpod_monitor.metric_writer import MetricWriter
+
+
+def test_writer_thread_error_reaches_callers(tmp_path):
+    writer = MetricWriter()
+    # A directory can't be opened for appending, so the writer thread fails
+    path = str(tmp_path)
+
+    assert writer.write_metric({'pod_id': 'a', 'epoch': 1}, path) is True
+    with pytest.raises(OSError):
+        writer.flush()
+    writer.flush()  # Reported once
+
+    writer.write_metric({'pod_id': 'a', 'epoch': 2}, path)
+    writer.close()
+    assert writer.write_metric({'pod_id': 'a', 'epoch': 3}, path) is False
+
+    with pytest.raises(OSError):
+        writer.flush()  # The row above failed too
+
+    good = str(tmp_path / 'pod_metrics.jsonl')
+    assert writer.write_metric({'pod_id': 'a', 'epoch': 4}, good) is True
+    writer.flush()
+    with open(good) as f:
+        assert f.read().count('"epoch"') == 1
+
+
+def test_only_writers_with_rows_flush_at_exit(tmp_path):
+    writer = MetricWriter()
+    assert writer not in metric_writer._live_writers
+
+    writer.write_metric({'pod_id': 'a', 'epoch': 1}, str(tmp_path / 'm.jsonl'))
+    assert writer in metric_writer._live_writers
+
+    writer.close()
+    assert writer not in metric_writer._live_writers
@@ -0,0 +1,80 @@
+"""Tests for the per-pod ring buffers (ring_buffer and DataTracker's use of them)."""
+
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from runpod_monitor.data_tracker import DataTracker  # noqa: E402
+from runpod_monitor.ring_buffer import RECORD_DTYPE, RECORD_SIZE, RingBuffer  # noqa: E402
+
+
+def _record(epoch):
+    return (epoch, 1.0, 2.0, 3.0, 4.0, 5, 0.5, 1, 1)
+
+
+def test_record_dtype_matches_struct_layout():
+    assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+
+def test_array_since_across_wraparound(tmp_path):
+    ring = RingBuffer(str(tmp_path / 'a.ring'), capacity=5)
+    for epoch in range(1, 9):
+        ring.append(_record(epoch))
+
+    assert (ring.oldest_epoch(), ring.latest_epoch()) == (4, 8)
+    for cutoff in range(0, 10):
+        expected = [epoch for epoch in range(4, 9) if epoch >= cutoff]
+        assert ring.array_since(cutoff)['epoch'].tolist() == expected
+    ring.close()
+
+
+def test_ring_survives_reopen(tmp_path):
+    path = str(tmp_path / 'a.ring')
+    ring = RingBuffer(path, capacity=8)
+    for epoch in range(3):
+        ring.append(_record(epoch))
+    ring.close()
+
+    assert [record[0] for record in RingBuffer(path, capacity=8).records()] == [0, 1, 2]
+
+
+def test_clear_waits_for_a_read_in_progress(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracker = DataTracker(data_dir=str(tmp_path), use_metric_writer=False,
+                          use_auto_stop_tracker=False)
+    tracker._remember_recent('a', {'epoch': int(time.time()) - 60, 'status': 'RUNNING'})
+
+    reading, proceed = threading.Event(), threading.Event()
+    array_since = RingBuffer.array_since
+
+    def slow_array_since(ring, epoch):
+        view = np.frombuffer(ring._mm, dtype=np.uint8)  # Exported while "reading"
+        reading.set()
+        proceed.wait(1)
+        del view
+        return array_since(ring, epoch)
+
+    monkeypatch.setattr(RingBuffer, 'array_since', slow_array_since)
+    errors = []
+
+    def run(func, *args):
+        try:
+            func(*args)
+        except Exception as e:  # pragma: no cover - the failure being tested
+            errors.append(e)
+
+    reader = threading.Thread(target=run, args=(tracker._recent_columns, 'a', 30))
+    reader.start()
+    assert reading.wait(1)
+    closer = threading.Thread(target=run, args=(tracker.clear_pod_data, 'a'))
+    closer.start()
+    closer.join(0.2)
+    proceed.set()
+    reader.join()
+    closer.join()
+
+    assert not errors
+    assert 'a' not in tracker._rings
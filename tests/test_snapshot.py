@@ -0,0 +1,100 @@
+"""Tests for compressed snapshots (snapshot) and rolling shards up into them."""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from runpod_monitor import metric_files, snapshot
+from runpod_monitor.data_tracker import DataTracker
+
+DAY = '2024-01-10'
+NOON = int(metric_files.day_start(DAY)) + 12 * 3600
+
+
+def _metrics():
+    return {
+        'a': [
+            {'timestamp': 't0', 'epoch': NOON, 'pod_id': 'a', 'name': 'n',
+             'status': 'RUNNING', 'cost_per_hr': 0.5, 'uptime_seconds': None,
+             'cpu_percent': 3, 'memory_percent': 12.5,
+             'gpu_percent': 0.0, 'gpu_memory_percent': 0, 'gpu_count': 1},
+            # A termination record as server.py writes it
+            {'timestamp': 't1', 'epoch': NOON + 60, 'pod_id': 'a', 'name': 'n',
+             'status': 'TERMINATED', 'cost_per_hr': None, 'action': 'terminate',
+             'reason': {'idle_minutes': [30, 45]}},
+        ],
+        'b': [{'pod_id': 'b', 'epoch': NOON + 61.5, 'cpu_percent': 'n/a',
+               'gpu_count': True, 'name': None}],
+    }
+
+
+def _write_shard(path, metrics_by_pod):
+    with open(path, 'a') as f:
+        for metrics in metrics_by_pod.values():
+            for metric in metrics:
+                f.write(json.dumps(metric) + '\n')
+
+
+@pytest.mark.parametrize('fmt', ['npz', 'jsonl.gz'])
+def test_snapshot_round_trips_metrics_unchanged(tmp_path, fmt):
+    if fmt == 'npz':
+        pytest.importorskip('numpy')
+    path = snapshot.write_snapshot(_metrics(), str(tmp_path / 'day'), fmt)
+
+    restored = snapshot.read_snapshot(path)
+
+    assert restored == _metrics()
+    first = restored['a'][0]
+    original = _metrics()['a'][0]
+    assert all(type(first[key]) is type(value) for key, value in original.items())
+
+
+def test_roll_up_merges_into_existing_snapshot(tmp_path):
+    metrics_file = str(tmp_path / 'pod_metrics.jsonl')
+    shard = metric_files.shard_path(metrics_file, DAY)
+    earlier = {'a': [{'pod_id': 'a', 'epoch': NOON}]}
+    later = {'a': [{'pod_id': 'a', 'epoch': NOON + 60}]}
+    _write_shard(shard, earlier)
+    metric_files.roll_up_shard(shard, 'jsonl.gz')
+    # The clock was set back and the day's shard was written again
+    _write_shard(shard, later)
+
+    metric_files.roll_up_shard(shard, 'jsonl.gz')
+
+    assert not os.path.exists(shard)
+    epochs = [m['epoch'] for m in metric_files.iter_metrics(metrics_file)]
+    assert epochs == [NOON, NOON + 60]
+
+
+def test_shard_left_next_to_its_snapshot_is_read_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    metrics_file = str(tmp_path / 'pod_metrics.jsonl')
+    shard = metric_files.shard_path(metrics_file, DAY)
+    metrics = {'a': [{'pod_id': 'a', 'epoch': NOON + i} for i in range(3)]}
+    _write_shard(shard, metrics)
+    kept = str(tmp_path / 'kept.jsonl')
+    shutil.copy(shard, kept)
+    metric_files.roll_up_shard(shard, 'jsonl.gz')
+    # A crash between writing the snapshot and removing the shard
+    shutil.copy(kept, shard)
+    os.remove(kept)
+
+    assert len(list(metric_files.iter_metrics(metrics_file))) == 3
+    tracker = DataTracker(data_dir=str(tmp_path), use_metric_writer=False,
+                          use_auto_stop_tracker=False, use_ring_buffer=False)
+    tracker.load_data()
+    assert len(tracker.data['a']) == 3
+
+
+def test_roll_up_keeps_shard_when_snapshot_does_not_round_trip(tmp_path):
+    pytest.importorskip('numpy')
+    shard = str(tmp_path / f'pod_metrics.{DAY}.jsonl')
+    # numpy strips trailing NULs from string columns
+    _write_shard(shard, {'a': [{'pod_id': 'a', 'epoch': NOON, 'name': 'x\x00'}]})
+
+    with pytest.raises(ValueError):
+        metric_files.roll_up_shard(shard, 'npz')
+
+    assert os.listdir(tmp_path) == [os.path.basename(shard)]